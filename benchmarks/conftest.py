@@ -0,0 +1,123 @@
+"""
+基准测试的公共配置
+
+除了 pytest-benchmark 自带的统计外，每个用例还会记录“每轮框架开销”
+（总耗时减去模型本身耗时）和单轮峰值内存分配，并可以与保存的基线比较:
+
+    # 保存基线
+    pytest benchmarks --overhead-save benchmarks/baseline.json
+    # 超过基线 25% 时失败
+    pytest benchmarks --overhead-baseline benchmarks/baseline.json --overhead-tolerance 0.25
+"""
+
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+from fake_model import ScriptedChatModel
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+# 小于这些绝对值的增长视为噪声，不判定为回退
+MIN_REGRESSION_US = 20.0
+MIN_REGRESSION_KIB = 16.0
+
+_results: Dict[str, Dict[str, float]] = {}
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("overhead", "框架开销基线")
+    group.addoption("--overhead-baseline", default=None, help="与该 JSON 基线比较，超出容差时用例失败")
+    group.addoption("--overhead-save", default=None, help="把本次结果保存为 JSON 基线")
+    group.addoption("--overhead-tolerance", type=float, default=0.25, help="允许超出基线的比例，默认 0.25")
+    parser.addoption("--large-stores", action="store_true", default=False, help="记忆存储基准测试包括 100 万条的规模（需要数 GB 内存）")
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: List[pytest.Item]) -> None:
+    if config.getoption("--large-stores"):
+        return
+    skip = pytest.mark.skip(reason="需要 --large-stores")
+    for item in items:
+        if "large_store" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line("markers", "large_store: 100 万条规模的记忆存储基准测试")
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    path = session.config.getoption("--overhead-save")
+    if path and _results:
+        Path(path).write_text(json.dumps(_results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def measure_peak_alloc(func: Callable[[], Any]) -> float:
+    """
+    测量单次调用的峰值内存分配。
+
+    Returns:
+        峰值分配（KiB）
+    """
+    func()  # 预热，排除首次调用的缓存和导入
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+@pytest.fixture(scope="session")
+def raw_model_seconds() -> float:
+    """直接调用假模型一次的耗时中位数，作为“模型本身耗时”"""
+    model = ScriptedChatModel(script=[AIMessage(content="完成")])
+    messages = [HumanMessage(content="你好")]
+    samples: List[float] = []
+    for _ in range(200):
+        start = time.perf_counter()
+        model.invoke(messages)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+@pytest.fixture()
+def overhead(request: pytest.FixtureRequest, benchmark: Any, raw_model_seconds: float) -> Callable[..., None]:
+    """
+    记录并检查当前用例的框架开销。
+
+    用法: 在 benchmark(...) 之后调用 overhead(model_calls=2, func=run_once)。
+    """
+    baseline_path = request.config.getoption("--overhead-baseline")
+    tolerance = request.config.getoption("--overhead-tolerance")
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8")) if baseline_path else {}
+    name = request.node.name
+
+    def record(model_calls: int, func: Callable[[], Any]) -> None:
+        if benchmark.stats is None:  # --benchmark-disable 时没有统计数据
+            return
+        median = benchmark.stats.stats.median
+        result = {
+            "overhead_us": max(median - model_calls * raw_model_seconds, 0.0) * 1e6,
+            "peak_kib": measure_peak_alloc(func),
+        }
+        _results[name] = result
+        benchmark.extra_info.update(result)
+
+        expected = baseline.get(name)
+        if not expected:
+            return
+        failures = []
+        for metric, floor in (("overhead_us", MIN_REGRESSION_US), ("peak_kib", MIN_REGRESSION_KIB)):
+            limit = expected[metric] * (1 + tolerance)
+            if result[metric] > limit and result[metric] - expected[metric] > floor:
+                failures.append(f"{metric}: {result[metric]:.1f} > 基线 {expected[metric]:.1f} (+{tolerance:.0%})")
+        if failures:
+            pytest.fail("框架开销超过基线: " + "; ".join(failures))
+
+    return record
@@ -0,0 +1,74 @@
+"""
+基准测试使用的确定性聊天模型
+
+按脚本依次返回预先写好的消息（包括工具调用），不发起任何网络请求，
+因此测得的时间就是框架本身的开销。
+"""
+
+import itertools
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    循环返回脚本中消息的聊天模型。
+
+    Attributes:
+        script: 依次返回的消息，用完后从头开始
+    """
+
+    script: List[AIMessage]
+
+    _cursor: Iterator[int] = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        self.reset()
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def reset(self) -> None:
+        """回到脚本开头，保证每轮基准测试的输入完全一致"""
+        self._cursor = itertools.cycle(range(len(self.script)))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        with self._lock:
+            message = self.script[next(self._cursor)]
+        return ChatResult(generations=[ChatGeneration(message=message.model_copy())])
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+        # 脚本中已经写好了工具调用，绑定工具不改变行为
+        return self
+
+
+def tool_call_script(tool_name: str, args: Dict[str, Any], answer: str = "完成") -> List[AIMessage]:
+    """
+    生成一轮智能体对话的脚本：先调用一次工具，再给出最终回答。
+
+    Args:
+        tool_name: 要调用的工具名
+        args: 工具参数
+        answer: 最终回答
+
+    Returns:
+        两条消息组成的脚本
+    """
+    return [
+        AIMessage(content="", tool_calls=[{"name": tool_name, "args": args, "id": "call_0", "type": "tool_call"}]),
+        AIMessage(content=answer),
+    ]
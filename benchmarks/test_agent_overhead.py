@@ -0,0 +1,223 @@
+"""
+智能体框架开销基准测试
+
+使用脚本化的假模型驱动 create_agent 图、条件路由和 LCEL 工具链，
+测量每轮对话在模型耗时之外的开销，以及它随历史长度和工具数量的变化。
+"""
+
+import time
+from typing import List
+
+import pytest
+from fake_model import ScriptedChatModel, tool_call_script
+
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.checkpoint.memory import InMemorySaver
+from langchain_learning.examples.advanced_agent import (
+    create_conditional_agent,
+    create_memory_agent,
+    create_tool_chain,
+)
+from langchain_learning.utils.agent_stream import AgentStream
+from langchain_learning.utils.checkpointer import SQLiteCheckpointer
+from langchain_learning.utils.intent import NGramIntentClassifier
+from langchain_learning.utils.tool_cache import ToolResultCache, cached_tool
+from langchain_learning.utils.tool_execution import ToolExecutionMiddleware
+
+
+def _history(turns: int) -> List[BaseMessage]:
+    """生成指定轮数的历史对话"""
+    messages: List[BaseMessage] = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"第{i}个问题: 北京今天天气怎么样?"))
+        messages.append(AIMessage(content=f"第{i}个回答: 北京当前天气晴朗。"))
+    return messages
+
+
+def _make_tools(count: int) -> List[BaseTool]:
+    """生成指定数量的简单工具"""
+
+    def lookup(query: str) -> str:
+        return f"结果: {query}"
+
+    return [
+        StructuredTool.from_function(func=lookup, name=f"tool_{i}", description=f"第{i}个查询工具")
+        for i in range(count)
+    ]
+
+
+def test_raw_model_call(benchmark):
+    """假模型本身的调用耗时，作为其他用例的参照"""
+    model = ScriptedChatModel(script=[AIMessage(content="完成")])
+    messages = [HumanMessage(content="你好")]
+    benchmark(model.invoke, messages)
+
+
+@pytest.mark.parametrize("history_turns", [0, 10, 100, 1000])
+def test_memory_agent_turn(benchmark, overhead, history_turns):
+    """create_memory_agent 一轮对话（一次工具调用 + 一次回答）的开销随历史长度的变化"""
+    model = ScriptedChatModel(script=tool_call_script("weather_search", {"location": "北京"}))
+    agent, _ = create_memory_agent(llm=model)
+    inputs = {"messages": [*_history(history_turns), HumanMessage(content="北京今天天气怎么样?")]}
+
+    def run_once():
+        model.reset()
+        return agent.invoke(inputs)
+
+    result = benchmark(run_once)
+    assert result["messages"][-1].content == "完成"
+    overhead(model_calls=2, func=run_once)
+
+
+@pytest.mark.parametrize("saver", ["sqlite", "in_memory"])
+def test_checkpointed_turn(benchmark, tmp_path, saver):
+    """带检查点的会话已有 100 轮历史时，只发送新消息的一轮对话；sqlite 每步只写入新增的消息"""
+    checkpointer = SQLiteCheckpointer(tmp_path / "checkpoints.sqlite") if saver == "sqlite" else InMemorySaver()
+    model = ScriptedChatModel(script=tool_call_script("weather_search", {"location": "北京"}))
+    agent, _ = create_memory_agent(llm=model, checkpointer=checkpointer)
+    config = {"configurable": {"thread_id": "benchmark"}}
+    agent.update_state(config, {"messages": _history(100)})
+
+    def run_once():
+        model.reset()
+        return agent.invoke({"messages": [HumanMessage(content="北京今天天气怎么样?")]}, config)
+
+    result = benchmark.pedantic(run_once, rounds=50, warmup_rounds=1)
+    assert result["messages"][-1].content == "完成"
+    if saver == "sqlite":
+        stats = checkpointer.storage_stats()
+        benchmark.extra_info.update(stats)
+        assert stats["delta_blobs"] > 0
+
+
+@pytest.mark.parametrize("mode", ["single_pass", "token_events", "stream_then_invoke"])
+def test_streamed_turn(benchmark, mode):
+    """
+    流式展示并取得最终回复：AgentStream 只执行一次，旧写法先 stream 再 invoke 会执行两次；
+    token_events 为额外打开消息流逐 token 输出的开销
+    """
+    model = ScriptedChatModel(script=tool_call_script("tool_0", {"query": "北京"}))
+    agent = create_agent(model=model, tools=_make_tools(1), system_prompt="你是一个助手。")
+    inputs = {"messages": [HumanMessage(content="查询北京")]}
+
+    def run_once():
+        model.reset()
+        if mode == "single_pass":
+            run = AgentStream(agent, inputs)
+            updates = sum(1 for _ in run)
+            return updates, run.final_text
+        if mode == "token_events":
+            run = AgentStream(agent, inputs)
+            events = [event.kind for event in run.events()]
+            return events.count("tool_call") + events.count("tool_result") + 1, run.final_text
+        updates = sum(1 for _ in agent.stream(inputs, stream_mode="updates"))
+        model.reset()
+        return updates, agent.invoke(inputs)["messages"][-1].text
+
+    updates, text = benchmark(run_once)
+    assert updates == 3 and text == "完成"
+
+
+@pytest.mark.parametrize("tool_count", [1, 4, 16, 64])
+def test_agent_tool_count(benchmark, overhead, tool_count):
+    """create_agent 一轮对话的开销随工具数量的变化"""
+    model = ScriptedChatModel(script=tool_call_script("tool_0", {"query": "北京"}))
+    agent = create_agent(model=model, tools=_make_tools(tool_count), system_prompt="你是一个助手。")
+    inputs = {"messages": [HumanMessage(content="查询北京")]}
+
+    def run_once():
+        model.reset()
+        return agent.invoke(inputs)
+
+    result = benchmark(run_once)
+    assert result["messages"][-1].content == "完成"
+    overhead(model_calls=2, func=run_once)
+
+
+@pytest.mark.parametrize("fast_path", [True, False], ids=["fast_path", "llm_intent"])
+def test_conditional_router(benchmark, overhead, fast_path):
+    """create_conditional_agent 的意图分类 + 分派开销（本地快速路径或 LLM 意图分类）"""
+    script = [AIMessage(content="北京今天晴朗。")]
+    if not fast_path:
+        script.insert(0, AIMessage(content="weather"))
+    model = ScriptedChatModel(script=script)
+    chain = create_conditional_agent(llm=model, fast_path=fast_path)
+    inputs = {"input": "北京明天会下雨吗，气温多少度?"}
+
+    def run_once():
+        model.reset()
+        return chain.invoke(inputs)
+
+    result = benchmark(run_once)
+    assert result == "北京今天晴朗。"
+    overhead(model_calls=len(script), func=run_once)
+
+
+def test_intent_fast_path(benchmark):
+    """本地意图分类器单次判断的耗时"""
+    classifier = NGramIntentClassifier()
+    assert benchmark(classifier.predict, "北京明天会下雨吗，气温多少度?") == "weather"
+
+
+def test_tool_chain(benchmark, overhead):
+    """create_tool_chain 的 LCEL 管道开销"""
+    model = ScriptedChatModel(script=[AIMessage(content="产品B销量最高。")])
+    chain = create_tool_chain(llm=model)
+    text = "请分析这组销售数据: 产品A:100件, 产品B:200件, 产品C:150件"
+
+    def run_once():
+        model.reset()
+        return chain.invoke(text)
+
+    result = benchmark(run_once)
+    assert result == "产品B销量最高。"
+    overhead(model_calls=1, func=run_once)
+
+
+@pytest.mark.parametrize("limit", [None, 1], ids=["parallel", "serial"])
+def test_parallel_tool_step(benchmark, limit):
+    """模型一次返回 4 个工具调用（每个耗时 20ms）时一轮对话的耗时；limit=1 时退化为串行执行"""
+
+    def slow_lookup(query: str) -> str:
+        time.sleep(0.02)
+        return f"结果: {query}"
+
+    tool = StructuredTool.from_function(func=slow_lookup, name="slow_lookup", description="耗时 20ms 的查询工具")
+    calls = [
+        {"name": "slow_lookup", "args": {"query": f"城市{i}"}, "id": f"call_{i}", "type": "tool_call"}
+        for i in range(4)
+    ]
+    model = ScriptedChatModel(script=[AIMessage(content="", tool_calls=calls), AIMessage(content="完成")])
+    middleware = ToolExecutionMiddleware(default_limit=limit, default_timeout=5.0)
+    agent = create_agent(model=model, tools=[tool], middleware=[middleware])
+    inputs = {"messages": [HumanMessage(content="查询四个城市")]}
+
+    def run_once():
+        model.reset()
+        return agent.invoke(inputs)
+
+    result = benchmark(run_once)
+    # 工具结果按调用顺序返回
+    assert [m.content for m in result["messages"][2:6]] == [f"结果: 城市{i}" for i in range(4)]
+    step = middleware.steps[-1]
+    assert len(step.calls) == 4
+    if limit is None:
+        assert step.saved_time > 0.04
+    else:
+        assert step.saved_time < 0.01
+
+
+@pytest.mark.parametrize("tier", ["memory", "shared"])
+def test_tool_cache_hit(benchmark, tier):
+    """cached_tool 命中时的开销（参数规范化 + 缓存键计算 + 查找），shared 为内存层被淘汰后从共享后端读取"""
+
+    @cached_tool(ttl=None, max_size=0 if tier == "shared" else 16, backend=ToolResultCache())
+    def lookup(location: str) -> str:
+        return f"{location}当前天气: 晴朗"
+
+    lookup(" 北京 ")
+    assert benchmark(lookup, "北京") == "北京当前天气: 晴朗"
+    info = lookup.cache_info()
+    assert info["misses"] == 1
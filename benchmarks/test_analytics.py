@@ -0,0 +1,45 @@
+"""
+数据分析基准测试
+
+测量 analyze_data 流式解析 10 万行 JSON 数组和 CSV 并计算各列统计量的耗时，
+以及一次性 json.loads 同样数据的耗时作为参照。
+"""
+
+import json
+import random
+from typing import Dict, List
+
+import pytest
+
+from langchain_learning.utils.analytics import analyze_data
+
+ROWS = 100_000
+
+
+def _records(count: int) -> List[Dict[str, object]]:
+    rng = random.Random(0)
+    regions = ["华东", "华北", "华南", "西南"]
+    return [
+        {"product": f"产品{i}", "region": rng.choice(regions), "sales": rng.randint(1, 1000), "price": round(rng.uniform(1, 99), 2)}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def datasets() -> Dict[str, str]:
+    records = _records(ROWS)
+    lines = ["product,region,sales,price"] + [f"{r['product']},{r['region']},{r['sales']},{r['price']}" for r in records]
+    return {"json": json.dumps(records, ensure_ascii=False), "csv": "\n".join(lines)}
+
+
+@pytest.mark.parametrize("format", ["json", "csv"])
+def test_analyze_data(benchmark, datasets, format):
+    """流式解析 + 列统计"""
+    summary = benchmark.pedantic(analyze_data, args=(datasets[format],), rounds=3)
+    assert summary.rows == ROWS
+    assert summary.numeric["sales"]["count"] == ROWS
+
+
+def test_json_loads_reference(benchmark, datasets):
+    """一次性解析整个 JSON 数组（不计算统计量）"""
+    assert len(benchmark.pedantic(json.loads, args=(datasets["json"],), rounds=3)) == ROWS
@@ -0,0 +1,49 @@
+"""
+批量执行基准测试
+
+用脚本化的假模型驱动 chat 流水线处理 1000 行提示词，测量 run_batch 自身的吞吐
+（读取输入、调度协程、逐行写入并刷新输出），以及断点续跑时跳过已完成行的耗时。
+"""
+
+import json
+
+import pytest
+from fake_model import ScriptedChatModel
+
+from langchain_core.messages import AIMessage
+from langchain_learning.cli import build_pipeline
+from langchain_learning.utils.batch import run_batch
+
+ROWS = 1000
+
+
+@pytest.fixture
+def prompts(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(ROWS):
+            f.write(json.dumps({"id": f"row-{i}", "prompt": f"第{i}个问题: 北京今天天气怎么样?"}, ensure_ascii=False) + "\n")
+    return path
+
+
+@pytest.mark.parametrize("concurrency", [1, 16])
+def test_batch_chat(benchmark, tmp_path, prompts, concurrency):
+    """chat 流水线从头处理 1000 行"""
+    pipeline = build_pipeline("chat", ScriptedChatModel(script=[AIMessage(content="完成")]))
+    output = tmp_path / "results.jsonl"
+
+    report = benchmark.pedantic(
+        run_batch, args=(pipeline, prompts, output), kwargs={"concurrency": concurrency, "resume": False}, rounds=5
+    )
+    assert report.succeeded == ROWS
+    benchmark.extra_info["rows_per_s"] = round(report.rows_per_second, 1)
+
+
+def test_batch_resume(benchmark, tmp_path, prompts):
+    """输出文件中已有全部结果时，断点续跑读取进度并跳过所有行"""
+    pipeline = build_pipeline("chat", ScriptedChatModel(script=[AIMessage(content="完成")]))
+    output = tmp_path / "results.jsonl"
+    run_batch(pipeline, prompts, output, concurrency=16)
+
+    report = benchmark(run_batch, pipeline, prompts, output)
+    assert report.skipped == ROWS and report.processed == 0
@@ -0,0 +1,51 @@
+"""
+安全计算器基准测试
+
+测量单个表达式首次编译（解析 + 校验 + 生成闭包）和命中编译缓存时的耗时，
+以及 1 万个结构相同、常量不同的表达式逐个求值与批量向量化求值的对比。
+"""
+
+import random
+from typing import List
+
+import pytest
+
+from langchain_learning.utils.calculator import CalculatorError, SafeCalculator, compile_expression
+
+EXPRESSION = "(12.5 + 3) * 4 ** 2 - 7 // 2"
+
+
+def _expressions(count: int) -> List[str]:
+    """生成结构相同、常量不同的表达式"""
+    rng = random.Random(0)
+    return [f"({rng.randint(1, 999)} + {rng.uniform(0, 100):.2f}) * {rng.randint(1, 9)} ** 2 - {rng.randint(0, 50)} // 3" for _ in range(count)]
+
+
+@pytest.mark.parametrize("cached", [False, True], ids=["cold", "cached"])
+def test_calculator_single(benchmark, cached):
+    """单个表达式求值，cold 在每轮之前清空编译缓存"""
+    calculator = SafeCalculator()
+    setup = None if cached else (lambda: compile_expression.cache_clear())
+    result = benchmark.pedantic(calculator.evaluate, args=(EXPRESSION,), setup=setup, rounds=200)
+    assert result == eval(EXPRESSION)
+
+
+@pytest.mark.parametrize("mode", ["scalar", "batch"])
+def test_calculator_batch(benchmark, mode):
+    """1 万个表达式的求值吞吐（编译缓存已预热）"""
+    calculator = SafeCalculator()
+    texts = _expressions(10_000)
+
+    def scalar() -> List[object]:
+        results: List[object] = []
+        for text in texts:
+            try:
+                results.append(calculator.evaluate(text))
+            except CalculatorError as e:
+                results.append(e)
+        return results
+
+    run = scalar if mode == "scalar" else (lambda: calculator.evaluate_batch(texts))
+    run()
+    results = benchmark(run)
+    assert results[:100] == [eval(text) for text in texts[:100]]
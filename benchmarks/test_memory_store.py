@@ -0,0 +1,111 @@
+"""
+记忆存储基准测试
+
+测量本地字符 n-gram 嵌入的批量吞吐，MatrixStore 与 LangGraph 自带 InMemoryStore
+在 1千/10万/100万 条记忆规模下的语义搜索耗时（100 万条需要 --large-stores），
+以及 SQLiteStore 在 1 万条记忆时的冷启动耗时。
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pytest
+
+from langchain_learning.models.embeddings import HashedNGramEmbeddings
+from langchain_learning.utils.matrix_store import MatrixStore
+from langchain_learning.utils.sqlite_store import SQLiteStore
+from langgraph.store.base import BaseStore, PutOp
+from langgraph.store.memory import InMemoryStore
+
+DIMS = 64
+NAMESPACE = ("demo_user", "memories")
+
+_stores: Dict[Tuple[str, int], Tuple[BaseStore, List[float]]] = {}
+
+
+def _texts(count: int):
+    """生成指定数量的中文记忆文本"""
+    return [f"第{i}条记忆: 用户喜欢在周末学习LangChain和Python，关注第{i % 97}个主题" for i in range(count)]
+
+
+def _populated_store(kind: str, size: int) -> Tuple[BaseStore, List[float]]:
+    """
+    构建写满 size 条记忆的存储，并返回一个查询向量。
+
+    记忆的文本就是它的编号，嵌入函数直接返回预先生成的随机向量，避免嵌入耗时干扰测量。
+    同一进程中按 (kind, size) 复用。
+    """
+    if (kind, size) in _stores:
+        return _stores[(kind, size)]
+    _stores.clear()  # 同时只保留一个大存储
+    vectors = np.random.default_rng(0).standard_normal((size, DIMS), dtype=np.float32)
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        if len(texts) == 1 and not texts[0].isdigit():
+            return [vectors[0].tolist()]  # 查询文本
+        return vectors[[int(text) for text in texts]].tolist()
+
+    index = {"embed": embed, "dims": DIMS, "fields": ["text"]}
+    store: BaseStore = MatrixStore(index=index) if kind == "matrix" else InMemoryStore(index=index)
+    for start in range(0, size, 50_000):
+        store.batch([PutOp(NAMESPACE, f"m{i}", {"text": str(i)}) for i in range(start, min(start + 50_000, size))])
+    _stores[(kind, size)] = (store, vectors[0].tolist())
+    return _stores[(kind, size)]
+
+
+@pytest.mark.parametrize("count", [100, 10_000])
+def test_local_embedding_batch(benchmark, count):
+    """本地嵌入一批文本的耗时"""
+    embeddings = HashedNGramEmbeddings()
+    texts = _texts(count)
+    matrix = benchmark(embeddings.embed_array, texts)
+    assert matrix.shape == (count, embeddings.dims)
+
+
+@pytest.mark.parametrize(
+    "size",
+    [1_000, 100_000, pytest.param(1_000_000, marks=pytest.mark.large_store)],
+)
+@pytest.mark.parametrize("kind", ["matrix", "in_memory"])
+def test_store_search(benchmark, kind, size):
+    """MatrixStore 与 InMemoryStore 的 top-10 语义搜索耗时"""
+    store, _ = _populated_store(kind, size)
+    results = benchmark(store.search, NAMESPACE, query="查询", limit=10)
+    # 查询向量就是第 0 条记忆的向量
+    assert results[0].key == "m0"
+
+
+def test_matrix_store_search_with_local_embeddings(benchmark):
+    """使用本地 n-gram 嵌入时，1000 条记忆的 MatrixStore 语义搜索耗时（包括查询嵌入）"""
+    embeddings = HashedNGramEmbeddings()
+    store = MatrixStore(index={"embed": embeddings, "dims": embeddings.dims})
+    store.batch([PutOp(NAMESPACE, f"m{i}", {"text": text}) for i, text in enumerate(_texts(1000))])
+
+    results = benchmark(store.search, NAMESPACE, query="第42条记忆", limit=5)
+    assert results[0].key == "m42"
+
+
+@pytest.fixture(scope="module")
+def sqlite_store_path(tmp_path_factory):
+    """写入 1 万条记忆的 SQLite 数据库文件"""
+    path = tmp_path_factory.mktemp("sqlite_store") / "memories.sqlite"
+    embeddings = HashedNGramEmbeddings()
+    store = SQLiteStore(path, index={"embed": embeddings, "dims": embeddings.dims})
+    store.batch([PutOp(NAMESPACE, f"m{i}", {"text": text}) for i, text in enumerate(_texts(10_000))])
+    store.close()
+    return path
+
+
+def test_sqlite_store_cold_start(benchmark, sqlite_store_path):
+    """打开已有 1 万条记忆的 SQLiteStore 并完成第一次语义搜索的耗时（从数据库加载向量，不重新嵌入）"""
+    embeddings = HashedNGramEmbeddings()
+
+    def cold_start():
+        store = SQLiteStore(sqlite_store_path, index={"embed": embeddings, "dims": embeddings.dims})
+        try:
+            return store.search(NAMESPACE, query="第42条记忆", limit=5)
+        finally:
+            store.close()
+
+    results = benchmark(cold_start)
+    assert results[0].key == "m42"
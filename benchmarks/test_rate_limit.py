@@ -0,0 +1,42 @@
+"""
+客户端限流基准测试
+
+通过 httpx.MockTransport 发送聊天请求（不经过网络），测量限流传输层给每个请求增加的开销：
+解析请求体估计 token、令牌桶预扣、并发名额的获取与交回，以及按 usage 校正配额。
+"""
+
+import json
+
+import httpx
+import pytest
+
+from langchain_learning.models.rate_limit import RateLimitConfig, RateLimitedTransport, RateLimiterGroup
+
+BODY = {
+    "model": "Qwen/Qwen3-8B",
+    "messages": [{"role": "system", "content": "你是一个助手。"}, {"role": "user", "content": "北京今天天气怎么样?" * 20}],
+}
+RESPONSE = json.dumps({"choices": [{"message": {"content": "晴"}}], "usage": {"total_tokens": 300}}).encode()
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, headers={"content-type": "application/json"}, content=RESPONSE)
+
+
+@pytest.mark.parametrize("limited", [False, True], ids=["plain", "rate_limited"])
+def test_transport_overhead(benchmark, limited):
+    """单个请求经过限流传输层与直接发送的对比（配额足够，不会等待）"""
+    transport: httpx.BaseTransport = httpx.MockTransport(_handler)
+    if limited:
+        limiters = RateLimiterGroup(RateLimitConfig(requests_per_minute=None, tokens_per_minute=None))
+        transport = RateLimitedTransport(transport, limiters)
+    client = httpx.Client(transport=transport)
+    content = json.dumps(BODY, ensure_ascii=False).encode()
+
+    def send():
+        return client.post("http://stub/v1/chat/completions", content=content, headers={"content-type": "application/json"})
+
+    response = benchmark(send)
+    assert response.status_code == 200
+    if limited:
+        assert limiters.stats()["Qwen/Qwen3-8B"]["in_flight"] == 0
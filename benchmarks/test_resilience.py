@@ -0,0 +1,72 @@
+"""
+时限、重试与对冲基准测试
+
+通过 httpx.MockTransport 发送聊天请求（不经过网络）：测量时限与重试传输层给每个请求增加的开销，
+以及在少量请求特别慢的情况下，对冲请求对尾延迟的改善。
+"""
+
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+import pytest
+
+from langchain_learning.models.metadata import ResiliencePolicy
+from langchain_learning.models.resilience import AsyncResilientTransport, ResilienceGroup, ResilientTransport
+from langchain_learning.utils.metrics import summarize
+
+BODY = json.dumps({"model": "THUDM/glm-4-9b-chat", "messages": [{"role": "user", "content": "北京今天天气怎么样?"}]}).encode()
+RESPONSE = json.dumps({"choices": [{"message": {"content": "晴"}}], "usage": {"total_tokens": 30}}).encode()
+HEADERS = {"content-type": "application/json"}
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, headers=HEADERS, content=RESPONSE)
+
+
+@pytest.mark.parametrize("resilient", [False, True], ids=["plain", "resilient"])
+def test_transport_overhead(benchmark, resilient):
+    """单个请求经过时限与重试传输层与直接发送的对比（不触发重试和对冲）"""
+    transport: httpx.BaseTransport = httpx.MockTransport(_handler)
+    if resilient:
+        transport = ResilientTransport(transport, ResilienceGroup(lambda model: ResiliencePolicy()))
+    client = httpx.Client(transport=transport)
+
+    def send():
+        return client.post("http://stub/v1/chat/completions", content=BODY, headers=HEADERS)
+
+    response = benchmark(send)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("hedge", [False, True], ids=["no_hedge", "hedge"])
+def test_hedged_tail_latency(benchmark, hedge):
+    """每 40 个请求中有 1 个慢 200ms：对比 200 个顺序请求的 p95 和最大延迟"""
+    group = ResilienceGroup(lambda model: ResiliencePolicy(hedge=hedge, hedge_min_delay=0.01))
+    latencies = []
+
+    async def run():
+        counter = itertools.count()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.2 if next(counter) % 40 == 39 else 0.002)
+            return httpx.Response(200, headers=HEADERS, content=RESPONSE)
+
+        transport = AsyncResilientTransport(httpx.MockTransport(handler), group)
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(200):
+                start = time.perf_counter()
+                await client.post("http://stub/v1/chat/completions", content=BODY, headers=HEADERS)
+                latencies.append(time.perf_counter() - start)
+
+    benchmark.pedantic(lambda: asyncio.run(run()), rounds=1, iterations=1)
+    stats = group.stats()["THUDM/glm-4-9b-chat"]
+    latency = summarize(latencies)
+    benchmark.extra_info.update(p95=latency["p95"], max=latency["max"], hedges=stats["hedges"], extra_tokens=stats["extra_tokens"])
+    if hedge:
+        # 前 20 个样本之后每个慢请求都被对冲
+        assert stats["hedge_wins"] == stats["hedges"] > 0
+        assert stats["extra_tokens"] > 0
+        assert latency["max"] < 0.2
@@ -0,0 +1,146 @@
+"""
+langchain-learning 命令行入口
+
+    langchain-learning batch prompts.jsonl -o results.jsonl --pipeline tools --concurrency 16
+
+batch 子命令用选定的流水线并发处理 JSONL 提示词文件，结果随完成随写入输出文件，
+中断后重新运行同一条命令会跳过已经成功的行。批量模式不使用 Rich 渲染，进度按固定间隔输出到 stderr。
+"""
+
+import argparse
+import sys
+from typing import Any, Awaitable, Callable, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage
+
+from langchain_learning.models import configure_pool, get_chat_model, get_pool_config
+from langchain_learning.utils.batch import BatchReport, run_batch
+
+# 可选的流水线
+PIPELINES = ("chat", "tools", "conditional", "tool_chain")
+
+
+def build_pipeline(name: str, llm: Optional[BaseChatModel] = None) -> Callable[[str], Awaitable[Any]]:
+    """
+    创建对单个提示词执行流水线的异步函数。
+
+    Args:
+        name: 流水线名称: chat（直接对话）、tools（create_agent_with_tools）、
+            conditional（create_conditional_agent）或 tool_chain（create_tool_chain）
+        llm: 使用的聊天模型，None 表示使用各流水线的默认模型
+
+    Returns:
+        接收提示词、返回回复文本的异步函数
+
+    Raises:
+        ValueError: 未知的流水线名称
+    """
+    if name == "chat":
+        chat_model = llm or get_chat_model()
+
+        async def chat(prompt: str) -> str:
+            return (await chat_model.ainvoke([HumanMessage(content=prompt)])).text
+
+        return chat
+
+    if name == "tools":
+        from langchain_learning.examples.agent_with_tools import create_agent_with_tools
+
+        agent = create_agent_with_tools(llm=llm)
+
+        async def tools(prompt: str) -> str:
+            result = await agent.ainvoke({"messages": [HumanMessage(content=prompt)]})
+            return result["messages"][-1].text
+
+        return tools
+
+    if name == "conditional":
+        from langchain_learning.examples.advanced_agent import create_conditional_agent
+
+        chain = create_conditional_agent(llm=llm)
+
+        async def conditional(prompt: str) -> str:
+            return await chain.ainvoke({"input": prompt})
+
+        return conditional
+
+    if name == "tool_chain":
+        from langchain_learning.examples.advanced_agent import create_tool_chain
+
+        chain = create_tool_chain(llm=llm)
+
+        async def tool_chain(prompt: str) -> str:
+            return await chain.ainvoke(prompt)
+
+        return tool_chain
+
+    raise ValueError(f"未知的流水线: {name}，可选: {', '.join(PIPELINES)}")
+
+
+def _print_progress(report: BatchReport) -> None:
+    print(
+        f"已执行 {report.processed} 行 (失败 {report.failed}, 跳过 {report.skipped}), {report.rows_per_second:.1f} 行/s",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def _batch(args: argparse.Namespace) -> int:
+    # 保持空闲的连接数不少于并发数，避免每批请求都重新建立连接
+    pool = get_pool_config()
+    configure_pool(
+        max_connections=max(pool.max_connections, args.concurrency),
+        max_keepalive_connections=max(pool.max_keepalive_connections, args.concurrency),
+    )
+    llm = get_chat_model(args.model, temperature=args.temperature) if args.model else None
+    pipeline = build_pipeline(args.pipeline, llm)
+
+    report = run_batch(
+        pipeline,
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        resume=not args.restart,
+        progress=None if args.quiet else _print_progress,
+        progress_interval=args.progress_interval,
+    )
+    print(report.summary())
+    return 1 if report.failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口。
+
+    Args:
+        argv: 命令行参数，None 表示使用 sys.argv
+
+    Returns:
+        退出码：批量执行中有失败的行时为 1
+    """
+    parser = argparse.ArgumentParser(prog="langchain-learning", description="LangChain 学习项目命令行工具")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    batch = subcommands.add_parser("batch", help="并发执行 JSONL 文件中的提示词")
+    batch.add_argument("input", help="输入 JSONL，每行为 {\"id\": ..., \"prompt\": ...} 或一个字符串")
+    batch.add_argument("-o", "--output", required=True, help="输出 JSONL，同时作为断点续跑的进度记录")
+    batch.add_argument("-p", "--pipeline", choices=PIPELINES, default="chat", help="使用的流水线")
+    batch.add_argument("-c", "--concurrency", type=int, default=8, help="同时执行的最大行数")
+    batch.add_argument("--model", default=None, help="模型名称，默认使用各流水线的默认模型")
+    batch.add_argument("--temperature", type=float, default=0.7, help="指定 --model 时的采样温度")
+    batch.add_argument("--restart", action="store_true", help="清空输出文件，从头执行所有行")
+    batch.add_argument("--progress-interval", type=float, default=2.0, help="进度输出的间隔（秒）")
+    batch.add_argument("-q", "--quiet", action="store_true", help="不输出进度，只在结束时输出统计")
+    batch.set_defaults(handler=_batch)
+
+    args = parser.parse_args(argv)
+    load_dotenv()
+    if getattr(args, "concurrency", 1) < 1:
+        parser.error("--concurrency 必须大于 0")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,9 +9,7 @@
 5. 流式处理
 """
 
-import os
 import random
-import json
 import time
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
@@ -26,19 +24,27 @@ from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import tool
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda, RunnableBranch
+from langchain_core.runnables import RunnableConfig, RunnablePassthrough, RunnableLambda
 from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.language_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
-# LangChain OpenAI 集成
-from langchain_openai import ChatOpenAI
-
-# 获取API密钥
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY", "")
-if not SILICONFLOW_API_KEY:
-    raise ValueError("未找到 SILICONFLOW_API_KEY 环境变量，请检查 .env 文件")
+# 共享连接池的模型工厂
+from langchain_learning.models import get_chat_model
+from langchain_learning.utils.agent_stream import AgentStream
+from langchain_learning.utils.analytics import analyze_data, detect_format
+from langchain_learning.utils.checkpointer import get_checkpointer
+from langchain_learning.utils.intent import NGramIntentClassifier, parse_intent
+from langchain_learning.utils.llm_cache import get_response_cache
+from langchain_learning.utils.speculation import IntentSpeculator, SpeculativeRouter
+from langchain_learning.utils.tool_cache import cached_tool, get_tool_cache, tool_cache_stats
+from langchain_learning.utils.tool_execution import ToolExecutionMiddleware
 
 # 高级工具定义
+# 查询类工具的结果只取决于参数（天气、新闻变化较慢），按参数缓存并通过共享后端跨会话复用；
+# 参数中的首尾空白和连续空白在计算缓存键前会被规范化
 @tool
+@cached_tool(ttl=600, max_size=512, backend=get_tool_cache)
 def weather_search(location: str) -> str:
     """模拟天气搜索工具"""
     # 模拟不同城市的天气数据
@@ -63,6 +69,7 @@ def weather_search(location: str) -> str:
         return f"{location}当前天气: 温度{temp}°C, {condition}, 湿度{humidity}%, 风速{wind}km/h"
 
 @tool
+@cached_tool(ttl=300, max_size=512, backend=get_tool_cache)
 def news_search(topic: str) -> str:
     """模拟新闻搜索工具"""
     news_templates = [
@@ -75,20 +82,19 @@ def news_search(topic: str) -> str:
     return random.choice(news_templates)
 
 @tool
+@cached_tool(ttl=3600, max_size=128, normalize={"data": lambda data: data})  # 空白会影响字符数，不做规范化
 def data_analysis(data: str) -> str:
-    """数据分析工具"""
+    """数据分析工具：统计 JSON、JSON Lines、CSV 或“名称:数值”数据各列的总和、均值、分位数和排名"""
+    # 流式解析并用 NumPy 计算统计量，只把紧凑的摘要交给模型
+    if detect_format(data) == "text":
+        # 简单文本分析
+        char_count = len(data)
+        word_count = len(data.split())
+        return f"文本分析结果: 字符数{char_count}, 单词数{word_count}"
     try:
-        # 尝试解析JSON数据
-        if data.startswith('{') or data.startswith('['):
-            parsed_data = json.loads(data)
-            return f"数据分析结果: 已解析JSON数据，包含{len(parsed_data)}个元素"
-        else:
-            # 简单文本分析
-            char_count = len(data)
-            word_count = len(data.split())
-            return f"文本分析结果: 字符数{char_count}, 单词数{word_count}"
-    except json.JSONDecodeError:
-        return f"数据分析结果: 无法解析为JSON，但包含{len(data)}个字符"
+        return analyze_data(data).summary()
+    except ValueError as e:
+        return f"数据分析结果: 无法解析数据（{e}），包含{len(data)}个字符"
 
 @tool
 def task_scheduler(task: str, priority: str = "medium") -> str:
@@ -105,6 +111,10 @@ def task_scheduler(task: str, priority: str = "medium") -> str:
     
     return f"任务已调度: ID={task_id}, 任务={task}, 优先级={priority}, 调度时间={scheduled_time}"
 
+# 每个工具的并发上限和超时（秒）：查询类工具可以并行，任务调度涉及写入，一次只执行一个
+TOOL_LIMITS = {"weather_search": 4, "news_search": 4, "data_analysis": 2, "task_scheduler": 1}
+TOOL_TIMEOUTS = {"weather_search": 10.0, "news_search": 10.0, "data_analysis": 30.0, "task_scheduler": 5.0}
+
 # 自定义记忆类
 class SimpleMemory:
     """简单的记忆实现"""
@@ -129,15 +139,23 @@ class SimpleMemory:
         self.chat_history.clear()
 
 # 创建带有记忆的智能体
-def create_memory_agent():
-    """创建带有记忆功能的智能体"""
+def create_memory_agent(
+    llm: Optional[BaseChatModel] = None,
+    tool_execution: Optional[ToolExecutionMiddleware] = None,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+):
+    """创建带有记忆功能的智能体
+    
+    模型一次返回的多个工具调用会并行执行，结果按调用顺序返回。
+    传入 checkpointer 后按 config 中的 thread_id 保存对话状态，每轮只需要发送新消息。
+    
+    Args:
+        llm: 使用的聊天模型，默认使用共享的硅基流动模型
+        tool_execution: 工具并发上限、超时和耗时追踪中间件，默认按 TOOL_LIMITS 和 TOOL_TIMEOUTS 创建
+        checkpointer: 检查点存储，例如 get_checkpointer() 返回的 SQLite 存储；None 表示不保存状态
+    """
     # 初始化模型
-    llm = ChatOpenAI(
-        model="THUDM/GLM-Z1-9B-0414",
-        base_url="https://api.siliconflow.cn/v1",
-        api_key=SILICONFLOW_API_KEY,
-        temperature=0.7
-    )
+    llm = llm or get_chat_model("THUDM/GLM-Z1-9B-0414", temperature=0.7)
     
     # 定义工具列表
     tools = [weather_search, news_search, data_analysis, task_scheduler]
@@ -154,10 +172,14 @@ def create_memory_agent():
 请用中文回复。"""
     
     # 使用LangChain 1.0的新API创建智能体
+    if tool_execution is None:
+        tool_execution = ToolExecutionMiddleware(limits=TOOL_LIMITS, timeouts=TOOL_TIMEOUTS)
     agent = create_agent(
         model=llm,
         tools=tools,
-        system_prompt=system_prompt
+        system_prompt=system_prompt,
+        middleware=[tool_execution],
+        checkpointer=checkpointer,
     )
     
     # 创建记忆实例
@@ -166,15 +188,28 @@ def create_memory_agent():
     return agent, memory
 
 # 创建条件路由智能体
-def create_conditional_agent():
-    """创建带有条件路由的智能体"""
-    # 初始化模型
-    llm = ChatOpenAI(
-        model="THUDM/GLM-Z1-9B-0414",
-        base_url="https://api.siliconflow.cn/v1",
-        api_key=SILICONFLOW_API_KEY,
-        temperature=0.3
-    )
+def create_conditional_agent(
+    llm: Optional[BaseChatModel] = None,
+    classifier: Optional[NGramIntentClassifier] = None,
+    fast_path: bool = True,
+    speculator: Optional[IntentSpeculator] = None,
+):
+    """创建带有条件路由的智能体
+    
+    Args:
+        llm: 使用的聊天模型，默认使用共享的硅基流动模型
+        classifier: 本地意图分类器，可传入自己的实例以读取快速路径命中率
+        fast_path: 是否先用本地分类器判断意图，没有把握时才调用 LLM 分类
+        speculator: 推测策略，传入时在 LLM 分类的同时推测执行最可能的处理链
+    """
+    # 初始化模型；低温度下意图分类结果基本确定，只给分类调用挂上响应缓存避免重复请求，
+    # 各处理链生成的回答不缓存
+    if llm is None:
+        llm = get_chat_model("THUDM/GLM-Z1-9B-0414", temperature=0.3)
+        intent_llm = get_chat_model("THUDM/GLM-Z1-9B-0414", temperature=0.3, cache=get_response_cache())
+    else:
+        intent_llm = llm
+    classifier = classifier or NGramIntentClassifier()
     
     # 创建意图分类提示
     intent_prompt = ChatPromptTemplate.from_template("""
@@ -191,7 +226,7 @@ def create_conditional_agent():
     """)
     
     # 创建意图分类链
-    intent_chain = intent_prompt | llm | StrOutputParser()
+    intent_chain = intent_prompt | intent_llm | StrOutputParser()
     
     # 创建不同意图的处理链
     weather_chain = ChatPromptTemplate.from_template("你是一个天气助手，请回答关于天气的问题: {input}") | llm | StrOutputParser()
@@ -200,37 +235,64 @@ def create_conditional_agent():
     task_chain = ChatPromptTemplate.from_template("你是一个任务管理助手，请回答关于任务调度的问题: {input}") | llm | StrOutputParser()
     general_chain = ChatPromptTemplate.from_template("你是一个通用助手，请回答用户的问题: {input}") | llm | StrOutputParser()
     
-    # 创建条件路由
-    chain = RunnableBranch(
-        (lambda x: "weather" in x["intent"], weather_chain),
-        (lambda x: "news" in x["intent"], news_chain),
-        (lambda x: "data" in x["intent"], data_chain),
-        (lambda x: "task" in x["intent"], task_chain),
-        general_chain,
-    )
+    # 意图到处理链的分派表
+    routes = {
+        "weather": weather_chain,
+        "news": news_chain,
+        "data": data_chain,
+        "task": task_chain,
+        "general": general_chain,
+    }
     
-    # 组合链
-    full_chain = {
-        "intent": intent_chain,
-        "input": lambda x: x["input"]
-    } | chain
+    if speculator is not None:
+        # 推测模式：本地分类器有把握时直接分派，否则 LLM 分类与推测的处理链并行执行
+        router = SpeculativeRouter(intent_chain | RunnableLambda(parse_intent), routes, speculator)
+        
+        def route(x: Dict[str, Any]) -> Any:
+            intent = classifier.predict(x["input"]) if fast_path else None
+            if intent is None:
+                return router
+            speculator.record(intent)
+            return routes.get(intent, general_chain)
+        
+        return RunnableLambda(route)
+    
+    # 意图分类：本地分类器有把握时直接返回，否则回退到 LLM 分类
+    def classify(x: Dict[str, Any], config: RunnableConfig) -> str:
+        intent = classifier.predict(x["input"]) if fast_path else None
+        return intent or parse_intent(intent_chain.invoke(x, config))
+    
+    async def aclassify(x: Dict[str, Any], config: RunnableConfig) -> str:
+        intent = classifier.predict(x["input"]) if fast_path else None
+        return intent or parse_intent(await intent_chain.ainvoke(x, config))
+    
+    # 组合链：先确定意图，再直接按分派表选择处理链
+    full_chain = RunnablePassthrough.assign(
+        intent=RunnableLambda(classify, afunc=aclassify)
+    ) | RunnableLambda(lambda x: routes.get(x["intent"], general_chain))
     
     return full_chain
 
+# 总结提示词中原始输入最多保留的字符数
+EXCERPT_CHARS = 300
+
+def _excerpt(text: str) -> str:
+    """截取原始输入的开头部分，大数据集不必整份发送给模型"""
+    return text if len(text) <= EXCERPT_CHARS else f"{text[:EXCERPT_CHARS]}...（共{len(text)}个字符）"
+
 # 创建工具链组合示例
-def create_tool_chain():
-    """创建工具链组合示例"""
+def create_tool_chain(llm: Optional[BaseChatModel] = None):
+    """创建工具链组合示例
+    
+    Args:
+        llm: 使用的聊天模型，默认使用共享的硅基流动模型
+    """
     # 初始化模型
-    llm = ChatOpenAI(
-        model="THUDM/GLM-Z1-9B-0414",
-        base_url="https://api.siliconflow.cn/v1",
-        api_key=SILICONFLOW_API_KEY,
-        temperature=0.5
-    )
+    llm = llm or get_chat_model("THUDM/GLM-Z1-9B-0414", temperature=0.5)
     
-    # 创建数据处理链
+    # 创建数据处理链：统计量由 data_analysis 算好，提示词中只放原始输入的开头部分
     process_chain = (
-        RunnableLambda(lambda x: {"input": x})
+        RunnableLambda(lambda x: {"input": x, "excerpt": _excerpt(x)})
         | RunnablePassthrough.assign(
             processed=RunnableLambda(lambda x: data_analysis.invoke({"data": x["input"]}))
         )
@@ -238,9 +300,9 @@ def create_tool_chain():
     
     # 创建总结链
     summary_prompt = ChatPromptTemplate.from_template("""
-    基于以下信息和数据处理结果，请提供一个简洁的总结:
+    基于以下信息和数据处理结果，请提供一个简洁的总结（统计量已经计算好，不需要重新计算）:
     
-    原始输入: {input}
+    原始输入（节选）: {excerpt}
     数据处理结果: {processed}
     
     总结:
@@ -253,6 +315,9 @@ def create_tool_chain():
     
     return full_chain
 
+# 记忆智能体演示使用的会话ID
+MEMORY_THREAD_ID = "memory_agent_demo"
+
 # 记忆智能体演示
 def memory_agent_demo():
     """记忆智能体演示"""
@@ -261,7 +326,12 @@ def memory_agent_demo():
     print("输入 'quit' 或 'exit' 退出")
     print("-" * 50)
     
-    agent, memory = create_memory_agent()
+    # 对话状态按会话ID增量保存在 SQLite 中，重新运行演示会接着上次的对话
+    agent, memory = create_memory_agent(checkpointer=get_checkpointer())
+    config = {"configurable": {"thread_id": MEMORY_THREAD_ID}}
+    history = agent.get_state(config).values.get("messages", [])
+    if history:
+        print(f"已恢复会话 {MEMORY_THREAD_ID} 的 {len(history)} 条历史消息")
     
     while True:
         try:
@@ -270,9 +340,9 @@ def memory_agent_demo():
                 print("再见!")
                 break
             
-            # 使用智能体处理输入
+            # 使用智能体处理输入：只发送新消息，历史由检查点存储提供
             inputs = {"messages": [HumanMessage(content=user_input)]}
-            result = agent.invoke(inputs)
+            result = agent.invoke(inputs, config)
             
             # 提取AI回复
             if "messages" in result and result["messages"]:
@@ -292,6 +362,20 @@ def memory_agent_demo():
             break
         except Exception as e:
             print(f"发生错误: {str(e)}")
+    
+    # 显示工具结果缓存的命中情况
+    for name, stats in tool_cache_stats().items():
+        hits = stats["hits"] + stats["shared_hits"]
+        print(f"工具缓存 {name}: 命中 {hits} 次, 未命中 {stats['misses']} 次, 命中率 {stats['hit_rate']:.0%}")
+
+# 条件路由演示的输入，每一条都应当由本地意图分类器直接分派
+CONDITIONAL_DEMO_INPUTS = [
+    "北京今天天气怎么样?",
+    "最近有什么科技新闻?",
+    "请分析这段数据: {'sales': [100, 200, 150], 'profit': [10, 20, 15]}",
+    "帮我安排一个明天上午的会议",
+    "你好，请介绍一下你自己",
+]
 
 # 条件路由智能体演示
 def conditional_agent_demo():
@@ -300,18 +384,11 @@ def conditional_agent_demo():
     print("这个演示展示了基于意图的条件路由功能")
     print("-" * 50)
     
-    chain = create_conditional_agent()
-    
-    # 示例输入
-    test_inputs = [
-        "北京今天天气怎么样?",
-        "最近有什么科技新闻?",
-        "请分析这段数据: {'sales': [100, 200, 150], 'profit': [10, 20, 15]}",
-        "帮我安排一个明天上午的会议",
-        "你好，请介绍一下你自己"
-    ]
+    classifier = NGramIntentClassifier()
+    speculator = IntentSpeculator()
+    chain = create_conditional_agent(classifier=classifier, speculator=speculator)
     
-    for test_input in test_inputs:
+    for test_input in CONDITIONAL_DEMO_INPUTS:
         print(f"\n用户: {test_input}")
         try:
             result = chain.invoke({"input": test_input})
@@ -319,6 +396,13 @@ def conditional_agent_demo():
         except Exception as e:
             print(f"错误: {str(e)}")
         print("-" * 30)
+    
+    intent_stats = classifier.stats
+    print(f"本地意图分类: 命中{intent_stats['ngram_hits'] + intent_stats['embedding_hits']}次, 回退LLM{intent_stats['fallbacks']}次, 命中率{intent_stats['hit_rate']:.0%}")
+    speculation_stats = speculator.stats
+    print(f"推测执行: {speculation_stats['speculations']}次, 命中率{speculation_stats['hit_rate']:.0%}, 浪费约{speculation_stats['wasted_tokens']} tokens")
+    stats = get_response_cache().stats
+    print(f"响应缓存: 内存命中{stats['memory_hits']}次, 磁盘命中{stats['disk_hits']}次, 未命中{stats['misses']}次, 命中率{stats['hit_rate']:.0%}")
 
 # 工具链组合演示
 def tool_chain_demo():
@@ -342,16 +426,20 @@ def tool_chain_demo():
         print(f"错误: {str(e)}")
 
 # 流式处理演示
+# 流式演示中工具返回只显示开头部分
+TOOL_RESULT_PREVIEW_CHARS = 80
+
 def streaming_demo():
     """流式处理演示"""
     print("\n=== 流式处理演示 ===")
     print("这个演示展示了流式处理功能")
     print("-" * 50)
     
-    # 创建智能体
-    agent, _ = create_memory_agent()
+    # 创建智能体，记录工具并行执行的耗时
+    tool_execution = ToolExecutionMiddleware(limits=TOOL_LIMITS, timeouts=TOOL_TIMEOUTS)
+    agent, _ = create_memory_agent(tool_execution=tool_execution)
     
-    # 示例输入
+    # 示例输入：天气查询和任务调度互不依赖，模型会在同一步中同时调用两个工具
     test_input = "请帮我查询北京的天气，然后安排一个明天下午的任务"
     
     print(f"输入: {test_input}")
@@ -359,13 +447,25 @@ def streaming_demo():
     
     try:
         inputs = {"messages": [HumanMessage(content=test_input)]}
-        # 使用流式输出
-        for chunk in agent.stream(inputs):
-            if "messages" in chunk and chunk["messages"]:
-                latest_message = chunk["messages"][-1]
-                if hasattr(latest_message, "content") and latest_message.content:
-                    print(latest_message.content, end="", flush=True)
+        # 逐 token 输出模型回复，工具调用和工具返回穿插显示
+        run = AgentStream(agent, inputs)
+        mid_line = False
+        for event in run.events():
+            if event.kind == "token":
+                print(event.text, end="", flush=True)
+                mid_line = True
+                continue
+            if mid_line:
+                print()
+                mid_line = False
+            if event.kind == "tool_call":
+                print(f"[调用工具] {event.name}({event.args})", flush=True)
+            else:
+                print(f"[工具返回] {event.name}: {event.text[:TOOL_RESULT_PREVIEW_CHARS]}", flush=True)
         print()  # 换行
+        print(f"\n{run.stats().summary()}")
+        print("\n工具执行耗时:")
+        print(tool_execution.summary())
     except Exception as e:
         print(f"错误: {str(e)}")
 
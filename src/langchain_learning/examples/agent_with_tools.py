@@ -6,8 +6,8 @@
 """
 
 # 导入必要的库
-import os
 import random
+import re
 import time
 from datetime import datetime
 from typing import Dict, List, Any, Optional
@@ -23,18 +23,18 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import tool
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.runnables import RunnablePassthrough
+from langchain_core.language_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
-# LangChain OpenAI 集成
-from langchain_openai import ChatOpenAI
+# 共享连接池的模型工厂
+from langchain_learning.models import get_chat_model
+from langchain_learning.utils.agent_stream import AgentStream
+from langchain_learning.utils.calculator import CalculatorError, SafeCalculator
+from langchain_learning.utils.checkpointer import get_checkpointer
 
 # 简单的内存存储
 memory_store = {}
 
-# 获取API密钥
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY", "")
-if not SILICONFLOW_API_KEY:
-    raise ValueError("未找到 SILICONFLOW_API_KEY 环境变量，请检查 .env 文件")
-
 @tool
 def generate_random_number(min_val: int = 1, max_val: int = 100) -> str:
     """生成一个指定范围内的随机数"""
@@ -61,29 +61,40 @@ def get_current_time() -> str:
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     return f"当前时间是: {now}"
 
+# 基于 AST 的计算器：表达式按文本缓存编译结果，限制整数位数、指数和耗时
+_calculator = SafeCalculator()
+
 @tool
 def calculator(expression: str) -> str:
-    """执行简单的数学计算"""
+    """执行简单的数学计算，多个表达式可以用分号或换行分隔"""
+    parts = [part.strip() for part in re.split(r"[;\n]", expression) if part.strip()]
+    if len(parts) > 1:
+        # 多个表达式批量计算，结构相同的表达式一次完成
+        lines = []
+        for part, result in zip(parts, _calculator.evaluate_batch(parts)):
+            if isinstance(result, CalculatorError):
+                lines.append(f"{part}: 计算错误: {result}")
+            else:
+                lines.append(f"{part} = {result}")
+        return "计算结果:\n" + "\n".join(lines)
     try:
-        # 安全地评估表达式
-        allowed_chars = "0123456789+-*/(). "
-        if all(c in allowed_chars for c in expression):
-            result = eval(expression)
-            return f"计算结果: {result}"
-        else:
-            return "错误: 表达式包含不允许的字符"
+        result = _calculator.evaluate(expression)
+        return f"计算结果: {result}"
     except Exception as e:
         return f"计算错误: {str(e)}"
 
-def create_agent_with_tools():
-    """创建带有工具的智能体"""
+def create_agent_with_tools(
+    llm: Optional[BaseChatModel] = None,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+):
+    """创建带有工具的智能体
+    
+    Args:
+        llm: 使用的聊天模型，默认使用共享的硅基流动模型
+        checkpointer: 检查点存储，按 config 中的 thread_id 保存对话状态；None 表示不保存状态
+    """
     # 初始化模型
-    llm = ChatOpenAI(
-        model="THUDM/GLM-Z1-9B-0414",
-        base_url="https://api.siliconflow.cn/v1",
-        api_key=SILICONFLOW_API_KEY,  # 直接使用字符串而不是环境变量
-        temperature=0.7
-    )
+    llm = llm or get_chat_model("THUDM/GLM-Z1-9B-0414", temperature=0.7)
     
     # 定义工具列表
     tools = [generate_random_number, memory_write, memory_read, get_current_time, calculator]
@@ -104,7 +115,8 @@ def create_agent_with_tools():
     agent = create_agent(
         model=llm,
         tools=tools,
-        system_prompt=system_prompt
+        system_prompt=system_prompt,
+        checkpointer=checkpointer,
     )
     
     return agent
@@ -116,7 +128,9 @@ def interactive_agent():
     print("可用工具: 生成随机数, 内存读写, 获取时间, 计算器")
     print("-" * 50)
     
-    agent = create_agent_with_tools()
+    # 对话状态保存在 SQLite 检查点中，重新运行时接着上次的对话
+    agent = create_agent_with_tools(checkpointer=get_checkpointer())
+    config = {"configurable": {"thread_id": "interactive_agent"}}
     
     while True:
         try:
@@ -127,7 +141,7 @@ def interactive_agent():
             
             # 使用新的API调用智能体
             inputs = {"messages": [HumanMessage(content=user_input)]}
-            result = agent.invoke(inputs)
+            result = agent.invoke(inputs, config)
             
             # 提取AI回复
             if "messages" in result and result["messages"]:
@@ -150,12 +164,7 @@ def structured_output_demo():
     print("\n=== 结构化输出演示 ===")
     
     # 初始化模型
-    llm = ChatOpenAI(
-        model="THUDM/GLM-Z1-9B-0414",
-        base_url="https://api.siliconflow.cn/v1",
-        api_key=SILICONFLOW_API_KEY,  # 直接使用字符串而不是环境变量
-        temperature=0.3
-    )
+    llm = get_chat_model("THUDM/GLM-Z1-9B-0414", temperature=0.3)
     
     # 创建解析器
     parser = JsonOutputParser()
@@ -202,19 +211,19 @@ def middleware_demo():
     print("\n处理过程:")
     
     try:
-        # 使用流式输出展示处理过程
+        # 使用流式输出展示处理过程，同一次执行结束后直接得到最终状态，不再重复调用
         inputs = {"messages": [HumanMessage(content=test_input)]}
-        for chunk in agent.stream(inputs, stream_mode="updates"):
-            print(f"更新: {chunk}")
+        run = AgentStream(agent, inputs)
+        for node, update in run:
+            print(f"更新 [{node}]: {update}")
         
         # 获取最终结果
-        result = agent.invoke(inputs)
-        if "messages" in result and result["messages"]:
-            ai_message = result["messages"][-1]
-            if isinstance(ai_message, AIMessage):
-                print(f"\n最终回复: {ai_message.content}")
-            else:
-                print(f"\n最终回复: {ai_message}")
+        ai_message = run.final_message
+        if isinstance(ai_message, AIMessage):
+            print(f"\n最终回复: {ai_message.content}")
+        elif ai_message is not None:
+            print(f"\n最终回复: {ai_message}")
+        print(f"共 {run.steps} 个步骤，耗时 {run.elapsed:.2f} 秒")
     except Exception as e:
         print(f"处理错误: {str(e)}")
 
@@ -10,26 +10,22 @@ from pathlib import Path
 # 添加项目根目录到 Python 路径
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "src"))
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 
+from langchain_learning.models import get_chat_model
+
 # 加载环境变量
 load_dotenv()
 
 def initialize_siliconflow_model():
     """初始化硅基流动模型"""
-    return ChatOpenAI(
-        model="Qwen/Qwen3-8B",
-        api_key=os.getenv("SILICONFLOW_API_KEY"),
-        base_url="https://api.siliconflow.cn/v1",
-        temperature=0.7,
-        max_tokens=1024
-    )
+    return get_chat_model("Qwen/Qwen3-8B", temperature=0.7, max_tokens=1024)
 
 def demo_conversation():
     """演示对话功能"""
@@ -5,25 +5,30 @@
 它展示了如何使用LangGraph的内存存储来存储、检索和搜索内存。
 """
 
-import os
-from typing import List, Dict, Any
+from typing import Optional, Union
 import json
 from datetime import datetime
+from pathlib import Path
 
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain.embeddings import init_embeddings
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_chroma import Chroma
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langgraph.store.memory import InMemoryStore
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 from rich.prompt import Prompt
 
+from langchain_learning.models.embeddings import HashedNGramEmbeddings, get_embeddings
+from langchain_learning.utils.ingestion import sync_documents
+from langchain_learning.utils.matrix_store import MatrixStore
+from langchain_learning.utils.paths import get_cache_dir
+from langchain_learning.utils.sqlite_store import SQLiteStore
+
 # 加载环境变量
 load_dotenv()
 
@@ -31,26 +36,33 @@ load_dotenv()
 console = Console()
 
 
-def setup_memory_store():
+def setup_memory_store(
+    embeddings: Optional[Embeddings] = None,
+    dims: Optional[int] = None,
+    path: Optional[Union[str, Path]] = None,
+):
     """
     设置一个内存存储用于演示。
-    在生产环境中，您将使用持久化存储。
-    """
-    # 初始化嵌入
-    embeddings = OpenAIEmbeddings(
-        model="BAAI/bge-large-zh-v1.5",
-        base_url="https://api.siliconflow.cn/v1",
-        api_key=os.getenv("SILICONFLOW_API_KEY")
-    )
+    给定 path 时使用 SQLite 持久化存储，记忆和向量在进程退出后仍然保留。
     
-    # 创建带有嵌入的内存存储
-    # 注意：在实际应用中，您将使用适当的嵌入函数
-    # 对于此演示，我们将使用简单的模拟嵌入函数
-    def embed(texts: List[str]) -> List[List[float]]:
-        # 模拟嵌入函数 - 在生产环境中使用真实嵌入
-        return [[hash(text) % 1000 / 1000.0 for _ in range(10)] for text in texts]
-    
-    store = InMemoryStore(index={"embed": embed, "dims": 10})
+    Args:
+        embeddings: 嵌入客户端，例如 get_embeddings() 返回的带缓存客户端（与 Chroma 共用缓存）；
+            None 表示使用本地的字符 n-gram 哈希嵌入，不请求 API，结果跨进程稳定
+        dims: 嵌入向量维度，默认本地嵌入为其自身维度，远程 bge-large-zh-v1.5 为 1024
+        path: SQLite 文件路径，None 表示只保存在内存中
+    """
+    if embeddings is None:
+        embeddings = HashedNGramEmbeddings(dims=dims or 256)
+    if dims is None:
+        dims = getattr(embeddings, "dims", 1024)
+    
+    index = {"embed": embeddings, "dims": dims}
+    if path is not None:
+        # 向量以 float32 保存在数据库中，重启后按命名空间懒加载到矩阵索引，不需要重新嵌入
+        return SQLiteStore(path, index=index)
+    
+    # 与 InMemoryStore 接口相同，向量保存在连续矩阵中，语义搜索是一次矩阵-向量乘积
+    store = MatrixStore(index=index)
     return store
 
 
@@ -60,8 +72,8 @@ def basic_memory_operations():
     """
     console.print(Panel.fit("💾 基本内存操作", style="bold blue"))
     
-    # 设置内存存储
-    store = setup_memory_store()
+    # 设置持久化存储，重复运行时已有记忆不会重新嵌入
+    store = setup_memory_store(path=get_cache_dir() / "basic_memory.sqlite")
     console.print("[green]✓ 内存存储已初始化[/green]")
     
     # 定义用户内存的命名空间
@@ -187,12 +199,8 @@ def vector_memory_demo():
     """
     console.print(Panel.fit("🔍 向量内存演示", style="bold blue"))
     
-    # 初始化嵌入
-    embeddings = OpenAIEmbeddings(
-        model="BAAI/bge-large-zh-v1.5",
-        base_url="https://api.siliconflow.cn/v1",
-        api_key=os.getenv("SILICONFLOW_API_KEY")
-    )
+    # 初始化嵌入：批量并发请求，向量按内容缓存在磁盘上，重复运行不再请求 API
+    embeddings = get_embeddings()
     
     # 使用Chroma创建简单的向量存储
     vector_store = Chroma(
@@ -212,11 +220,11 @@ def vector_memory_demo():
         "LangGraph提供了一个用于构建代理的低级编排框架。"
     ]
     
-    # 添加带有ID的文档
+    # 增量导入带有ID的文档：只嵌入新增或内容变化的文档，重复运行不会重新计算嵌入
     ids = [f"doc_{i}" for i in range(len(documents))]
-    vector_store.add_texts(texts=documents, ids=ids)
+    report = sync_documents(vector_store, documents, ids, source="vector_memory_demo")
     
-    console.print(f"[green]✓ 已向向量存储添加 {len(documents)} 个文档[/green]")
+    console.print(f"[green]✓ 向量存储已同步: {report.summary()}[/green]")
     
     # 搜索相似文档
     query = "如何在LangChain中创建代理？"
@@ -228,6 +236,9 @@ def vector_memory_demo():
     for i, (doc, score) in enumerate(results):
         console.print(f"[bold]结果 {i+1}[/bold] (得分: {score:.4f}):")
         console.print(f"  {doc.page_content}\n")
+    
+    stats = embeddings.stats
+    console.print(f"[dim]嵌入: 请求 {stats['requests']} 次, 缓存命中 {stats['cache_hits']} 条, 新计算 {stats['embedded']} 条[/dim]")
 
 
 def long_term_memory_demo():
@@ -238,7 +249,7 @@ def long_term_memory_demo():
     
     # 初始化模型和内存存储
     model = init_chat_model("gpt-4o-mini", model_provider="openai")
-    store = setup_memory_store()
+    store = setup_memory_store(path=get_cache_dir() / "long_term_memory.sqlite")
     
     # 创建用户档案
     user_id = "demo_user"
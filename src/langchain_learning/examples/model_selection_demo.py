@@ -6,11 +6,15 @@
 
 import sys
 import os
+import asyncio
+import time
 from pathlib import Path
+from typing import Any, Dict, List
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).resolve().parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "src"))
 
 # 加载环境变量
 from dotenv import load_dotenv
@@ -25,17 +29,29 @@ from langchain_core.messages import HumanMessage
 # 导入我们的模型选择函数
 sys.path.append(str(Path(__file__).resolve().parent))
 from simple_chatbot import list_available_models, initialize_siliconflow_model
+from langchain_learning.utils.metrics import summarize
 
 console = Console()
 
-def compare_models():
+# 测试问题
+TEST_QUESTION = "请用中文解释什么是机器学习，并给出一个简单的例子。"
+
+def compare_models(concurrent: bool = False, repetitions: int = 1, max_concurrency: int = 4):
     """
     比较不同模型的响应
+    
+    Args:
+        concurrent: 是否同时请求所有模型并统计延迟和吞吐指标
+        repetitions: 并发模式下每个模型的重复次数，用于计算 p50/p95
+        max_concurrency: 并发模式下同时进行的最大请求数
     """
+    if concurrent:
+        asyncio.run(compare_models_concurrent(repetitions, max_concurrency))
+        return
+    
     console.print(Panel.fit("🔍 模型比较演示", style="bold blue"))
     
-    # 测试问题
-    test_question = "请用中文解释什么是机器学习，并给出一个简单的例子。"
+    test_question = TEST_QUESTION
     
     models = list_available_models()
     
@@ -70,6 +86,114 @@ def compare_models():
     
     console.print("\n[bold green]演示完成！[/bold green]")
 
+async def _measure_once(model_id: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """
+    流式请求一次模型并记录时间指标
+    
+    Args:
+        model_id: 模型ID
+        semaphore: 限制并发请求数的信号量
+    
+    Returns:
+        包含首 token 时间、总延迟、token 用量和响应文本的字典
+    """
+    async with semaphore:
+        llm = initialize_siliconflow_model(model_id)
+        parts: List[str] = []
+        usage = None
+        first_token = None
+        start = time.perf_counter()
+        async for chunk in llm.astream([HumanMessage(content=TEST_QUESTION)]):
+            if chunk.content:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(chunk.content)
+            if chunk.usage_metadata:
+                usage = chunk.usage_metadata
+        latency = time.perf_counter() - start
+    
+    output_tokens = usage["output_tokens"] if usage else len(parts)
+    return {
+        "ttft": first_token if first_token is not None else latency,
+        "latency": latency,
+        "input_tokens": usage["input_tokens"] if usage else 0,
+        "output_tokens": output_tokens,
+        "tokens_per_second": output_tokens / latency if latency > 0 else 0.0,
+        "text": "".join(parts),
+    }
+
+async def compare_models_concurrent(repetitions: int = 1, max_concurrency: int = 4):
+    """
+    同时请求所有模型，比较首 token 时间、总延迟和吞吐
+    
+    Args:
+        repetitions: 每个模型的重复次数
+        max_concurrency: 同时进行的最大请求数
+    """
+    console.print(Panel.fit("⚡ 并发模型比较演示", style="bold blue"))
+    
+    models = list_available_models()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    console.print(f"发送问题: {TEST_QUESTION}")
+    console.print(f"每个模型请求 {repetitions} 次，最大并发 {max_concurrency}")
+    
+    # 所有模型和重复次数的请求一起发出，由信号量控制并发
+    jobs = [(model, _measure_once(model['id'], semaphore)) for model in models for _ in range(repetitions)]
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(job for _, job in jobs), return_exceptions=True)
+    wall_time = time.perf_counter() - start
+    
+    results: Dict[str, List[Dict[str, Any]]] = {model['id']: [] for model in models}
+    errors: Dict[str, List[str]] = {model['id']: [] for model in models}
+    for (model, _), outcome in zip(jobs, outcomes):
+        if isinstance(outcome, BaseException):
+            errors[model['id']].append(str(outcome))
+        else:
+            results[model['id']].append(outcome)
+    
+    # 创建比较表格
+    table = Table(title=f"模型性能比较 (重复 {repetitions} 次)")
+    table.add_column("模型", style="cyan", no_wrap=True)
+    table.add_column("成功", justify="right")
+    table.add_column("首token p50/p95 (s)", justify="right")
+    table.add_column("总延迟 p50/p95 (s)", justify="right")
+    table.add_column("输出 tok/s", justify="right")
+    table.add_column("平均token 输入/输出", justify="right")
+    table.add_column("响应", style="green")
+    
+    for model in models:
+        runs = results[model['id']]
+        if not runs:
+            message = errors[model['id']][0] if errors[model['id']] else "无结果"
+            table.add_row(model['name'], f"0/{repetitions}", "-", "-", "-", "-", f"[red]错误: {message}[/red]")
+            continue
+        
+        ttft = summarize([run["ttft"] for run in runs])
+        latency = summarize([run["latency"] for run in runs])
+        throughput = summarize([run["tokens_per_second"] for run in runs])
+        avg_input = sum(run["input_tokens"] for run in runs) / len(runs)
+        avg_output = sum(run["output_tokens"] for run in runs) / len(runs)
+        text = runs[-1]["text"]
+        
+        table.add_row(
+            model['name'],
+            f"{len(runs)}/{repetitions}",
+            f"{ttft['p50']:.2f} / {ttft['p95']:.2f}",
+            f"{latency['p50']:.2f} / {latency['p95']:.2f}",
+            f"{throughput['p50']:.1f}",
+            f"{avg_input:.0f} / {avg_output:.0f}",
+            text[:100] + "..." if len(text) > 100 else text,
+        )
+    
+    # 显示比较表格
+    console.print("\n")
+    console.print(table)
+    
+    serial_time = sum(run["latency"] for runs in results.values() for run in runs)
+    console.print(f"\n总耗时: {wall_time:.2f}s (顺序执行约需 {serial_time:.2f}s)")
+    console.print("\n[bold green]演示完成！[/bold green]")
+
 def interactive_model_selection():
     """
     交互式模型选择演示
@@ -114,11 +238,15 @@ if __name__ == "__main__":
     console.print("选择演示模式:")
     console.print("1. 模型响应比较")
     console.print("2. 交互式模型选择")
+    console.print("3. 并发模型性能比较")
     
-    mode = console.input("\n[bold]输入选择 (1-2):[/bold] ")
+    mode = console.input("\n[bold]输入选择 (1-3):[/bold] ")
     
     if mode == "1":
         compare_models()
+    elif mode == "3":
+        repetitions = console.input("[bold]每个模型重复次数 (默认 3):[/bold] ")
+        compare_models(concurrent=True, repetitions=int(repetitions) if repetitions.isdigit() else 3)
     elif mode == "2":
         interactive_model_selection()
     else:
@@ -5,7 +5,6 @@
 
 import os
 import sys
-import requests
 from pathlib import Path
 
 # 添加项目根目录到 Python 路径
@@ -14,8 +13,12 @@ sys.path.insert(0, str(project_root / "src"))
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 import langchain
+from rich.console import Console
+
+from langchain_learning.models import get_api_key, get_chat_model
+from langchain_learning.models.catalog import get_model_catalog
+from langchain_learning.utils.streaming import StreamRenderer
 
 # 加载环境变量
 load_dotenv()
@@ -26,45 +29,26 @@ def print_langchain_version():
     print(f"LangChain 核心包版本: {langchain.__version__}")
 
 def list_available_models():
-    """列出硅基流动平台上可用的模型"""
-    api_key = os.getenv("SILICONFLOW_API_KEY")
-    
-    if not api_key:
-        raise ValueError("未找到 SILICONFLOW_API_KEY 环境变量，请检查 .env 文件")
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    """列出硅基流动平台上可用的模型（目录缓存有效期内不请求网络）"""
+    get_api_key()
     
-    try:
-        response = requests.get("https://api.siliconflow.cn/v1/models", headers=headers)
-        if response.status_code == 200:
-            models = response.json().get("data", [])
-            print("\n=== 可用模型列表 ===")
-            for model in models:
-                print(f"- {model.get('id')}")
-            return models
-        else:
-            print(f"获取模型列表失败: {response.status_code} - {response.text}")
+    catalog = get_model_catalog()
+    models = catalog.list_models(include_remote_only=True, block=True)
+    if catalog.last_error:
+        print(f"获取模型列表失败: {catalog.last_error}")
+        if catalog.remote_ids() is None:
             return []
-    except Exception as e:
-        print(f"获取模型列表时出错: {str(e)}")
-        return []
+    
+    print("\n=== 可用模型列表 ===")
+    for model in models:
+        print(f"- {model.id}")
+    return models
 
 def setup_siliconflow_qwen():
     """设置硅基流动的 Qwen3-8B 模型"""
-    api_key = os.getenv("SILICONFLOW_API_KEY")
-    
-    if not api_key:
-        raise ValueError("未找到 SILICONFLOW_API_KEY 环境变量，请检查 .env 文件")
-    
-    # 使用 ChatOpenAI 类连接硅基流动的 API
-    # 硅基流动兼容 OpenAI API 格式
-    model = ChatOpenAI(
-        model="Qwen/Qwen3-8B",  # 使用硅基流动平台上的确切模型名称
-        openai_api_base="https://api.siliconflow.cn/v1",
-        openai_api_key=api_key,
+    # 硅基流动兼容 OpenAI API 格式，模型实例和连接池由工厂统一管理
+    model = get_chat_model(
+        "Qwen/Qwen3-8B",  # 使用硅基流动平台上的确切模型名称
         temperature=0.7,
         max_tokens=1024,
     )
@@ -109,12 +93,7 @@ def test_qwen_model():
         ]
         
         print("用户: 请写一首关于春天的短诗")
-        print("模型: ", end="", flush=True)
-        
-        for chunk in model.stream(stream_messages):
-            if chunk.content:
-                print(chunk.content, end="", flush=True)
-        print()  # 换行
+        StreamRenderer(Console(), prefix="模型: ").render(model.stream(stream_messages))
         
     except Exception as e:
         print(f"✗ 模型测试失败: {str(e)}")
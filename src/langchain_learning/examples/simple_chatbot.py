@@ -7,11 +7,11 @@
 
 import os
 import sys
+from dataclasses import asdict
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from rich.console import Console
 from rich.panel import Panel
@@ -21,6 +21,11 @@ from rich.text import Text
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root / "src"))
 
+from langchain_learning.models import get_chat_model, get_model_metadata
+from langchain_learning.models.catalog import get_model_catalog
+from langchain_learning.utils.history import TokenBudgetHistory
+from langchain_learning.utils.streaming import StreamRenderer
+
 # 加载环境变量
 load_dotenv()
 
@@ -38,20 +43,13 @@ def initialize_siliconflow_model(model: str = "Qwen/Qwen3-8B"):
     Returns:
         初始化后的聊天模型
     """
-    api_key = os.getenv("SILICONFLOW_API_KEY")
-    
-    if not api_key:
-        raise ValueError("未找到 SILICONFLOW_API_KEY 环境变量，请检查 .env 文件")
-    
-    # 使用 ChatOpenAI 类连接硅基流动的 API
-    # 硅基流动兼容 OpenAI API 格式
-    chat_model = ChatOpenAI(
-        model=model,
-        openai_api_base="https://api.siliconflow.cn/v1",
-        openai_api_key=api_key,
+    # 硅基流动兼容 OpenAI API 格式，模型实例和连接池由工厂统一管理
+    chat_model = get_chat_model(
+        model,
         temperature=0.7,
-        max_tokens=1024,
+        max_tokens=get_model_metadata(model).default_max_tokens,
         streaming=True,  # 启用流式响应
+        stream_usage=True,  # 流式响应中返回 token 用量
     )
     
     return chat_model
@@ -61,15 +59,13 @@ def list_available_models():
     """
     列出所有可用的模型选项。
     
+    模型来自共享的模型目录：本地登记的模型中服务端确实提供的那些，
+    目录缓存过期时在后台刷新，不会阻塞启动。
+    
     Returns:
-        包含模型ID和显示名称的字典列表
+        包含模型ID、显示名称、上下文窗口等元数据的字典列表
     """
-    return [
-        {"id": "Qwen/Qwen3-8B", "name": "通义千问 Qwen3-8B (默认)"},
-        {"id": "deepseek-ai/DeepSeek-R1-0528-Qwen3-8B", "name": "DeepSeek-R1-0528-Qwen3-8B"},
-        {"id": "THUDM/GLM-Z1-9B-0414", "name": "清华 GLM-Z1-9B-0414"},
-        {"id": "THUDM/glm-4-9b-chat", "name": "清华 GLM-4-9B-Chat"}
-    ]
+    return [asdict(model) for model in get_model_catalog().list_models()]
 
 
 def select_model():
@@ -106,9 +102,12 @@ def select_model():
             console.print("[red]请输入有效的数字[/red]")
 
 
-def chinese_chat():
+def chinese_chat(history_budget: Optional[int] = None):
     """
     运行一个中文聊天会话。
+    
+    Args:
+        history_budget: 每次请求的提示 token 预算，默认为 DEFAULT_PROMPT_TOKENS，不超过模型上下文窗口
     """
     console.print(Panel.fit("🤖 中文聊天助手", style="bold blue"))
     
@@ -124,13 +123,18 @@ def chinese_chat():
         console.print("[red]请确保您已在 .env 文件中设置了 SILICONFLOW_API_KEY[/red]")
         return
     
+    renderer = StreamRenderer(console, prefix="[bold green]助手:[/bold green] ")
+    
     # 开始聊天会话
     console.print("\n[bold green]聊天已开始！输入 '退出' 或 'quit' 结束对话。[bold green]\n")
     
-    # 初始化消息历史
-    messages: List = [
-        SystemMessage(content="你是一个友好的中文助手，请用中文回答问题，保持简洁和礼貌。")
-    ]
+    # 初始化消息历史：保留系统提示，最近的轮次放进 token 预算，更早的轮次压缩成摘要
+    history = TokenBudgetHistory.for_model(
+        selected_model,
+        "你是一个友好的中文助手，请用中文回答问题，保持简洁和礼貌。",
+        max_prompt_tokens=history_budget,
+        summarizer=model,
+    )
     
     while True:
         # 获取用户输入
@@ -141,24 +145,20 @@ def chinese_chat():
             break
         
         # 添加用户消息到历史
-        messages.append(HumanMessage(content=user_input))
+        history.add_user_message(user_input)
         
         try:
-            # 显示助手正在思考的提示
-            console.print("[bold green]助手:[/bold green]", end=" ")
-            
-            # 流式获取模型响应
-            full_response = ""
-            for chunk in model.stream(messages):
-                if hasattr(chunk, 'content') and chunk.content:
-                    console.print(chunk.content, end="")
-                    full_response += chunk.content
+            # 流式获取模型响应，后台线程读取、限帧渲染，结束时显示首 token 时间和生成速度
+            result = renderer.render(model.stream(history.messages()))
             
             # 添加完整响应到历史
-            messages.append(AIMessage(content=full_response))
+            history.add_ai_message(result.text)
             
-            # 添加换行符
-            console.print()
+            # 报告本轮提示大小
+            console.print(
+                f"[dim]本轮提示: {history.last_prompt_tokens} tokens / 预算 {history.max_prompt_tokens}"
+                f"，已淘汰 {history.evicted_turns} 轮[/dim]"
+            )
         except Exception as e:
             console.print(f"\n[red]错误: {e}[/red]")
 
@@ -225,13 +225,9 @@ def streaming_demo():
     console.print("\n[bold green]流式响应:[/bold green]\n")
     
     # 流式获取响应
-    full_response = ""
-    for chunk in model.stream([HumanMessage(content=prompt)]):
-        if hasattr(chunk, 'content') and chunk.content:
-            console.print(chunk.content, end="")
-            full_response += chunk.content
+    StreamRenderer(console).render(model.stream([HumanMessage(content=prompt)]))
     
-    console.print("\n\n[bold]完整响应已接收！[bold]")
+    console.print("\n[bold]完整响应已接收！[bold]")
 
 
 def show_models():
@@ -246,7 +242,8 @@ def show_models():
     
     for i, model in enumerate(models, 1):
         console.print(f"{i}. [bold cyan]{model['id']}[/bold cyan]")
-        console.print(f"   {model['name']}\n")
+        reasoning = "，推理模型" if model['reasoning'] else ""
+        console.print(f"   {model['name']} (上下文 {model['context_window'] // 1024}K{reasoning})\n")
     
     console.print("[green]提示: 在选择示例时，您可以选择使用任何这些模型。[/green]")
 
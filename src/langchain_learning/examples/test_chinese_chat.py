@@ -10,10 +10,12 @@ from pathlib import Path
 # 添加项目根目录到 Python 路径
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "src"))
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+
+from langchain_learning.models import get_chat_model
 
 # 加载环境变量
 load_dotenv()
@@ -25,13 +27,7 @@ def test_chinese_chat():
     
     # 初始化模型
     try:
-        model = ChatOpenAI(
-            model="Qwen/Qwen3-8B",
-            api_key=os.getenv("SILICONFLOW_API_KEY"),
-            base_url="https://api.siliconflow.cn/v1",
-            temperature=0.7,
-            max_tokens=1024
-        )
+        model = get_chat_model("Qwen/Qwen3-8B", temperature=0.7, max_tokens=1024)
         print("✓ 已连接到硅基流动 Qwen3-8B 模型")
     except Exception as e:
         print(f"✗ 模型初始化失败: {e}")
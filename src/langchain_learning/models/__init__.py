@@ -1 +1,64 @@
-"""Data models for LangChain learning."""
\ No newline at end of file
+"""Data models for LangChain learning."""
+
+from langchain_learning.models.catalog import ModelCatalog, get_model_catalog
+from langchain_learning.models.client import (
+    DEFAULT_BASE_URL,
+    DEFAULT_MODEL,
+    PoolConfig,
+    aclose_clients,
+    close_clients,
+    configure_pool,
+    configure_rate_limit,
+    configure_resilience,
+    get_api_key,
+    get_async_http_client,
+    get_base_url,
+    get_chat_model,
+    get_http_client,
+    get_pool_config,
+    rate_limit_stats,
+    resilience_stats,
+)
+from langchain_learning.models.embeddings import (
+    DEFAULT_EMBEDDING_MODEL,
+    BatchedEmbeddings,
+    HashedNGramEmbeddings,
+    get_embeddings,
+)
+from langchain_learning.models.metadata import MODEL_METADATA, ModelMetadata, ResiliencePolicy, get_model_metadata
+from langchain_learning.models.rate_limit import AdaptiveRateLimiter, RateLimitConfig, RateLimiterGroup
+from langchain_learning.models.resilience import DeadlineExceeded, ResilienceGroup
+
+__all__ = [
+    "AdaptiveRateLimiter",
+    "BatchedEmbeddings",
+    "DEFAULT_BASE_URL",
+    "DEFAULT_EMBEDDING_MODEL",
+    "DEFAULT_MODEL",
+    "DeadlineExceeded",
+    "HashedNGramEmbeddings",
+    "MODEL_METADATA",
+    "ModelCatalog",
+    "ModelMetadata",
+    "PoolConfig",
+    "RateLimitConfig",
+    "RateLimiterGroup",
+    "ResilienceGroup",
+    "ResiliencePolicy",
+    "aclose_clients",
+    "close_clients",
+    "configure_pool",
+    "configure_rate_limit",
+    "configure_resilience",
+    "get_api_key",
+    "get_async_http_client",
+    "get_base_url",
+    "get_chat_model",
+    "get_embeddings",
+    "get_http_client",
+    "get_model_catalog",
+    "get_model_metadata",
+    "get_pool_config",
+    "rate_limit_stats",
+    "resilience_stats",
+]
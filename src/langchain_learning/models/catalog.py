@@ -0,0 +1,186 @@
+"""
+模型目录服务
+
+通过共享连接池请求 /v1/models，把结果缓存在磁盘上，过期后用 ETag / Last-Modified
+条件请求重新验证，并与本地模型元数据合并。读取目录时不会等待网络：
+缓存过期时在后台线程刷新，期间先返回磁盘缓存或本地元数据。
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from langchain_learning.models.client import get_api_key, get_base_url, get_http_client
+from langchain_learning.models.metadata import MODEL_METADATA, ModelMetadata, get_model_metadata
+from langchain_learning.utils.paths import get_cache_dir
+
+# 目录缓存的默认有效期（秒）
+DEFAULT_CATALOG_TTL = 6 * 3600
+
+# 请求模型列表的超时时间（秒），目录不值得等待太久
+CATALOG_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+
+class ModelCatalog:
+    """
+    带磁盘缓存的模型目录。
+
+    Args:
+        path: 缓存文件路径，默认为缓存目录下的 model_catalog.json
+        ttl: 缓存有效期（秒），过期后需要重新验证
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = DEFAULT_CATALOG_TTL):
+        self.path = Path(path) if path is not None else get_cache_dir() / "model_catalog.json"
+        self.ttl = ttl
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._refreshing: Optional[threading.Thread] = None
+        self._cache: Optional[Dict[str, Any]] = None
+
+    def list_models(self, include_remote_only: bool = False, block: bool = False) -> List[ModelMetadata]:
+        """
+        列出可用的模型。
+
+        服务端列表已知时，只返回服务端确实提供的模型；未知时返回全部本地元数据。
+
+        Args:
+            include_remote_only: 是否包括本地没有元数据的模型（使用默认元数据）
+            block: 缓存过期时是否等待重新验证完成，默认在后台刷新
+
+        Returns:
+            模型元数据列表，本地登记的模型在前
+        """
+        if not self.is_fresh():
+            if block:
+                self.refresh()
+            else:
+                self.refresh_in_background()
+
+        remote_ids = self.remote_ids()
+        if remote_ids is None:
+            return list(MODEL_METADATA)
+
+        available = set(remote_ids)
+        models = [metadata for metadata in MODEL_METADATA if metadata.id in available]
+        if include_remote_only:
+            local_ids = {metadata.id for metadata in MODEL_METADATA}
+            models.extend(get_model_metadata(model_id) for model_id in remote_ids if model_id not in local_ids)
+        return models
+
+    def remote_ids(self) -> Optional[List[str]]:
+        """服务端提供的模型ID，从未成功获取时返回 None"""
+        cache = self._load()
+        if cache is None:
+            return None
+        return [item["id"] for item in cache["data"] if "id" in item]
+
+    def is_fresh(self) -> bool:
+        """缓存是否存在且在有效期内"""
+        cache = self._load()
+        return cache is not None and time.time() - cache["fetched_at"] < self.ttl
+
+    def refresh(self) -> bool:
+        """
+        立即请求模型列表，有缓存时使用条件请求。
+
+        Returns:
+            是否成功（包括 304 未修改）
+        """
+        cache = self._load()
+        try:
+            headers = {"Authorization": f"Bearer {get_api_key()}"}
+            if cache is not None:
+                if cache.get("etag"):
+                    headers["If-None-Match"] = cache["etag"]
+                if cache.get("last_modified"):
+                    headers["If-Modified-Since"] = cache["last_modified"]
+            response = get_http_client().get(f"{get_base_url()}/models", headers=headers, timeout=CATALOG_TIMEOUT)
+            if response.status_code == 304 and cache is not None:
+                cache = dict(cache, fetched_at=time.time())
+            else:
+                response.raise_for_status()
+                cache = {
+                    "base_url": get_base_url(),
+                    "fetched_at": time.time(),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "data": response.json().get("data", []),
+                }
+        except (httpx.HTTPError, ValueError) as e:
+            self.last_error = str(e)
+            return False
+
+        self.last_error = None
+        self._save(cache)
+        return True
+
+    def refresh_in_background(self) -> threading.Thread:
+        """
+        在后台线程刷新目录，已有刷新在进行时不重复启动。
+
+        Returns:
+            执行刷新的线程
+        """
+        with self._lock:
+            if self._refreshing is None or not self._refreshing.is_alive():
+                self._refreshing = threading.Thread(target=self.refresh, daemon=True)
+                self._refreshing.start()
+            return self._refreshing
+
+    def clear(self) -> None:
+        """删除磁盘缓存"""
+        with self._lock:
+            self._cache = None
+            self.path.unlink(missing_ok=True)
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """读取缓存，API 地址不同的缓存视为不存在"""
+        with self._lock:
+            if self._cache is None and self.path.exists():
+                try:
+                    self._cache = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    self._cache = None
+            cache = self._cache
+        if cache is None or cache.get("base_url") != get_base_url():
+            return None
+        return cache
+
+    def _save(self, cache: Dict[str, Any]) -> None:
+        """原子地写入缓存文件；临时文件名每次不同，多个进程同时刷新也不会互相覆盖写到一半的文件"""
+        with self._lock:
+            self._cache = cache
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=self.path.parent, prefix=f"{self.path.name}.", suffix=".tmp", delete=False
+            ) as tmp:
+                tmp.write(json.dumps(cache, ensure_ascii=False))
+            try:
+                os.replace(tmp.name, self.path)
+            except OSError:
+                os.unlink(tmp.name)
+                raise
+
+
+_catalog: Optional[ModelCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_model_catalog() -> ModelCatalog:
+    """
+    获取进程内共享的模型目录。
+
+    Returns:
+        缓存在缓存目录下的模型目录
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ModelCatalog()
+        return _catalog
@@ -0,0 +1,457 @@
+"""
+硅基流动聊天模型客户端工厂
+
+所有示例都通过这里获取 ChatOpenAI 实例，而不是各自新建。
+同一组 (model, temperature, max_tokens) 参数只会创建一次模型实例，
+所有实例共享同一个 keep-alive 的 httpx 连接池，避免每个智能体
+都重新建立 HTTP 客户端、TLS 握手和连接池。连接池外面包着按模型的自适应限流层
+（见 rate_limit.py），同一进程中所有示例的请求共用一份配额和并发上限；
+最外层按模型的策略处理调用时限、重试和对冲请求（见 resilience.py）。
+异步连接绑定在创建它们的事件循环上，异步客户端为每个事件循环各建一个连接池，
+多次 asyncio.run 可以共用同一个模型实例。
+"""
+
+import asyncio
+import json
+import os
+import threading
+import weakref
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from langchain_learning.models.metadata import ResiliencePolicy, get_model_metadata
+from langchain_learning.models.rate_limit import (
+    AsyncRateLimitedTransport,
+    RateLimitConfig,
+    RateLimitedTransport,
+    RateLimiterGroup,
+)
+from langchain_learning.models.resilience import (
+    AsyncResilientTransport,
+    ResilienceGroup,
+    ResilientTransport,
+)
+
+# 硅基流动 API 地址，可通过环境变量覆盖（例如指向本地测试服务）
+DEFAULT_BASE_URL = "https://api.siliconflow.cn/v1"
+
+# 默认使用的模型
+DEFAULT_MODEL = "Qwen/Qwen3-8B"
+
+# 由共享连接池提供、不能通过 get_chat_model 的 kwargs 指定的 ChatOpenAI 参数
+_MANAGED_KWARGS = ("http_client", "http_async_client")
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """
+    共享连接池的配置。
+
+    Attributes:
+        max_connections: 连接池允许的最大连接数
+        max_keepalive_connections: 保持空闲 keep-alive 的最大连接数
+        keepalive_expiry: 空闲连接的保活时间（秒）
+        connect_timeout: 建立连接的超时时间（秒）
+        read_timeout: 读取响应的超时时间（秒），需要覆盖较长的生成时间
+        write_timeout: 发送请求的超时时间（秒）
+        pool_timeout: 等待连接池空闲连接的超时时间（秒）
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+
+    def limits(self) -> httpx.Limits:
+        """转换为 httpx 的连接池限制"""
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        """转换为 httpx 的超时配置"""
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    按事件循环分别创建底层传输层的异步传输层。
+
+    httpcore 的异步连接只能在创建它的事件循环中使用，在这一层按当前运行的事件循环
+    取各自的连接池，上层的限流和重试状态仍然全进程共享。事件循环关闭后对应的连接池随之丢弃。
+
+    Args:
+        factory: 创建底层传输层的函数
+    """
+
+    def __init__(self, factory: Callable[[], httpx.AsyncBaseTransport]):
+        self._factory = factory
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncBaseTransport]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _current(self) -> httpx.AsyncBaseTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                for closed in [other for other in self._transports if other.is_closed()]:
+                    del self._transports[closed]
+                transport = self._transports[loop] = self._factory()
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._current().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环的连接池，其他事件循环的连接池直接丢弃"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+            self._transports.clear()
+        if transport is not None:
+            await transport.aclose()
+
+
+_lock = threading.Lock()
+_pool_config = PoolConfig()
+_rate_limit_config: Optional[RateLimitConfig] = RateLimitConfig()
+_rate_limit_per_model: Dict[str, RateLimitConfig] = {}
+_rate_limiters: Optional[RateLimiterGroup] = None
+_resilience_enabled = True
+_resilience_per_model: Dict[str, ResiliencePolicy] = {}
+_resilience: Optional[ResilienceGroup] = None
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_chat_models: Dict[Tuple[Hashable, ...], ChatOpenAI] = {}
+
+
+def get_api_key() -> str:
+    """
+    读取硅基流动 API 密钥。
+
+    Returns:
+        API 密钥
+
+    Raises:
+        ValueError: 未设置 SILICONFLOW_API_KEY 环境变量
+    """
+    api_key = os.getenv("SILICONFLOW_API_KEY", "")
+    if not api_key:
+        raise ValueError("未找到 SILICONFLOW_API_KEY 环境变量，请检查 .env 文件")
+    return api_key
+
+
+def get_base_url() -> str:
+    """
+    获取 API 地址，优先使用 SILICONFLOW_BASE_URL 环境变量。
+
+    Returns:
+        OpenAI 兼容接口的 base_url
+    """
+    return os.getenv("SILICONFLOW_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+
+def get_pool_config() -> PoolConfig:
+    """返回当前的连接池配置"""
+    return _pool_config
+
+
+def configure_pool(config: Optional[PoolConfig] = None, **overrides: Any) -> PoolConfig:
+    """
+    调整共享连接池的限制和超时。
+
+    之后的调用将使用新配置创建客户端和模型实例；已经取得的模型实例继续使用旧的客户端，不会被关闭。
+
+    Args:
+        config: 完整的连接池配置，不传则在当前配置上修改
+        **overrides: 需要覆盖的 PoolConfig 字段，例如 max_connections=50
+
+    Returns:
+        生效后的连接池配置
+    """
+    global _pool_config
+    with _lock:
+        _pool_config = replace(config or _pool_config, **overrides)
+        _detach_locked()
+    return _pool_config
+
+
+def configure_rate_limit(
+    config: Optional[RateLimitConfig] = None,
+    enabled: bool = True,
+    per_model: Optional[Dict[str, RateLimitConfig]] = None,
+    **overrides: Any,
+) -> Optional[RateLimitConfig]:
+    """
+    调整共享的限流配置。
+
+    之后的调用将使用新配置和新的限流状态；已经取得的模型实例继续使用旧的客户端和限流状态。
+
+    Args:
+        config: 完整的默认限流配置，不传则在当前配置上修改
+        enabled: False 表示关闭限流
+        per_model: 模型名称到单独限流配置的映射，不传则保持不变
+        **overrides: 需要覆盖的 RateLimitConfig 字段，例如 requests_per_minute=500
+
+    Returns:
+        生效后的默认限流配置，关闭时为 None
+    """
+    global _rate_limit_config, _rate_limit_per_model
+    with _lock:
+        _rate_limit_config = replace(config or _rate_limit_config or RateLimitConfig(), **overrides) if enabled else None
+        if per_model is not None:
+            _rate_limit_per_model = dict(per_model)
+        _detach_locked()
+    return _rate_limit_config
+
+
+def _get_rate_limiters_locked() -> Optional[RateLimiterGroup]:
+    """在持有锁的情况下获取同步和异步客户端共用的限流器"""
+    global _rate_limiters
+    if _rate_limiters is None and _rate_limit_config is not None:
+        _rate_limiters = RateLimiterGroup(_rate_limit_config, _rate_limit_per_model)
+    return _rate_limiters
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    共享限流层的实时状态。
+
+    Returns:
+        模型名称到并发上限、正在执行和排队中的请求数等统计的映射，未启用限流时为空
+    """
+    with _lock:
+        limiters = _rate_limiters
+    return limiters.stats() if limiters is not None else {}
+
+
+def configure_resilience(enabled: bool = True, per_model: Optional[Dict[str, ResiliencePolicy]] = None) -> None:
+    """
+    调整共享的时限、重试与对冲策略。
+
+    默认使用 MODEL_METADATA 中每个模型的 resilience 策略。之后的调用将使用新的策略和延迟统计；
+    已经取得的模型实例继续使用旧的客户端。
+
+    Args:
+        enabled: False 表示关闭这一层，改回由模型客户端自己重试
+        per_model: 模型名称到策略的映射，覆盖模型元数据中的策略，不传则保持不变
+    """
+    global _resilience_enabled, _resilience_per_model
+    with _lock:
+        _resilience_enabled = enabled
+        if per_model is not None:
+            _resilience_per_model = dict(per_model)
+        _detach_locked()
+
+
+def _resilience_policy(model: str) -> ResiliencePolicy:
+    policy = _resilience_per_model.get(model)
+    return policy if policy is not None else get_model_metadata(model).resilience
+
+
+def _get_resilience_locked() -> Optional[ResilienceGroup]:
+    """在持有锁的情况下获取同步和异步客户端共用的策略和统计"""
+    global _resilience
+    if _resilience is None and _resilience_enabled:
+        _resilience = ResilienceGroup(_resilience_policy)
+    return _resilience
+
+
+def resilience_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    共享的重试与对冲统计。
+
+    Returns:
+        模型名称到调用数、重试数、对冲次数、对冲额外消耗的 token 数等统计的映射，未启用时为空
+    """
+    with _lock:
+        group = _resilience
+    return group.stats() if group is not None else {}
+
+
+def get_sdk_max_retries() -> int:
+    """
+    模型客户端自身的重试次数。
+
+    Returns:
+        启用时限与重试层时为 0（避免两层叠加重试），否则为 OpenAI SDK 的默认值 2
+    """
+    return 0 if _resilience_enabled else 2
+
+
+def get_http_client() -> httpx.Client:
+    """
+    获取共享的同步 HTTP 客户端。
+
+    Returns:
+        所有同步请求共用的 httpx.Client
+    """
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            # 使用自定义传输层时连接池限制要设置在传输层上
+            transport: httpx.BaseTransport = httpx.HTTPTransport(limits=_pool_config.limits())
+            limiters = _get_rate_limiters_locked()
+            if limiters is not None:
+                transport = RateLimitedTransport(transport, limiters)
+            resilience = _get_resilience_locked()
+            if resilience is not None:
+                transport = ResilientTransport(transport, resilience)
+            _http_client = httpx.Client(transport=transport, timeout=_pool_config.timeout())
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    获取共享的异步 HTTP 客户端。
+
+    客户端可以在多个事件循环中使用（例如多次 asyncio.run），每个事件循环使用各自的连接池。
+
+    Returns:
+        所有异步请求共用的 httpx.AsyncClient
+    """
+    global _http_async_client
+    with _lock:
+        if _http_async_client is None:
+            limits = _pool_config.limits()
+            transport: httpx.AsyncBaseTransport = _LoopLocalTransport(lambda: httpx.AsyncHTTPTransport(limits=limits))
+            limiters = _get_rate_limiters_locked()
+            if limiters is not None:
+                transport = AsyncRateLimitedTransport(transport, limiters)
+            resilience = _get_resilience_locked()
+            if resilience is not None:
+                transport = AsyncResilientTransport(transport, resilience)
+            _http_async_client = httpx.AsyncClient(transport=transport, timeout=_pool_config.timeout())
+        return _http_async_client
+
+
+def get_chat_model(
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    **kwargs: Any,
+) -> ChatOpenAI:
+    """
+    获取连接到硅基流动的聊天模型。
+
+    相同参数返回同一个实例，所有实例共享连接池。
+
+    Args:
+        model: 模型名称
+        temperature: 采样温度
+        max_tokens: 最大生成 token 数，None 表示使用服务端默认值
+        **kwargs: 其他传给 ChatOpenAI 的参数（例如 streaming=True），也会参与实例复用的判断；
+            不指定 max_retries 时使用 get_sdk_max_retries()，指定 base_url 或 api_key 时覆盖环境变量
+
+    Returns:
+        共享连接池的 ChatOpenAI 实例
+
+    Raises:
+        ValueError: 未设置 SILICONFLOW_API_KEY 环境变量，或者指定了由共享连接池提供的 http_client / http_async_client
+    """
+    managed = [name for name in _MANAGED_KWARGS if name in kwargs]
+    if managed:
+        raise ValueError(f"{', '.join(managed)} 由共享连接池提供，不能单独指定")
+    api_key = kwargs.pop("api_key", None) or get_api_key()
+    base_url = (kwargs.pop("base_url", None) or get_base_url()).rstrip("/")
+    kwargs.setdefault("max_retries", get_sdk_max_retries())
+    key = (model, temperature, max_tokens, base_url, api_key, *_kwargs_key(kwargs))
+
+    with _lock:
+        chat_model = _chat_models.get(key)
+        if chat_model is not None:
+            return chat_model
+
+    chat_model = ChatOpenAI(
+        model=model,
+        base_url=base_url,
+        api_key=api_key,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        **kwargs,
+    )
+
+    with _lock:
+        return _chat_models.setdefault(key, chat_model)
+
+
+def _kwargs_key(kwargs: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    """
+    模型参数在实例缓存中的键。
+
+    model_kwargs、extra_body 等字典或列表参数不可哈希，按排序后的 JSON 比较内容；
+    无法序列化的对象（例如回调处理器）按对象本身区分。
+    """
+    items = tuple(sorted(kwargs.items()))
+    try:
+        hash(items)
+    except TypeError:
+        return (json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=_identity),)
+    return items
+
+
+def _identity(value: object) -> str:
+    return f"{type(value).__qualname__}@{id(value):x}"
+
+
+def close_clients() -> None:
+    """
+    关闭共享的同步 HTTP 客户端并清空模型缓存。
+
+    已经取得的模型实例随之不可用，只在不再使用它们时调用（例如进程退出前）。
+    异步客户端只能在事件循环中关闭，请在异步代码中改用 aclose_clients。
+    """
+    with _lock:
+        client, _ = _detach_locked()
+    if client is not None:
+        client.close()
+
+
+async def aclose_clients() -> None:
+    """
+    关闭共享的同步和异步 HTTP 客户端并清空模型缓存。
+
+    需要在使用异步客户端的事件循环中调用；已经取得的模型实例随之不可用。
+    """
+    with _lock:
+        client, async_client = _detach_locked()
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
+
+
+def _detach_locked() -> Tuple[Optional[httpx.Client], Optional[httpx.AsyncClient]]:
+    """
+    在持有锁的情况下丢弃客户端、限流器和模型缓存，之后的调用会重新创建。
+
+    不关闭客户端：已经取得的模型实例还引用着它们。
+
+    Returns:
+        被丢弃的同步和异步客户端
+    """
+    global _http_client, _http_async_client, _rate_limiters, _resilience
+    clients = (_http_client, _http_async_client)
+    _http_client = None
+    _http_async_client = None
+    _rate_limiters = None
+    _resilience = None
+    _chat_models.clear()
+    return clients
@@ -0,0 +1,342 @@
+"""
+批量、并发、带缓存的嵌入客户端
+
+在任意 LangChain Embeddings 外面包一层：同一次调用中相同的文本只嵌入一次，
+先查按内容寻址的磁盘缓存，剩下的文本按 token 上限打包成批，并发请求，
+结果写回缓存。Chroma 和 InMemoryStore 共用同一个缓存，重复运行示例时不再请求 API。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from langchain_learning.models.client import (
+    get_api_key,
+    get_async_http_client,
+    get_base_url,
+    get_http_client,
+    get_sdk_max_retries,
+)
+from langchain_learning.utils.embedding_cache import EmbeddingCache, embedding_key, get_embedding_cache
+from langchain_learning.utils.tokens import estimate_tokens
+
+# 默认的中文嵌入模型
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-large-zh-v1.5"
+
+
+def pack_batches(texts: List[str], max_batch_tokens: int, max_batch_size: int) -> List[List[int]]:
+    """
+    按 token 上限和条数上限把文本打包成批。
+
+    Args:
+        texts: 文本
+        max_batch_tokens: 每批的 token 上限（单条超过上限的文本单独成批）
+        max_batch_size: 每批的最大条数
+
+    Returns:
+        每批文本在 texts 中的下标
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    去重、缓存、批量并发的嵌入包装器。
+
+    Args:
+        embeddings: 实际计算嵌入的客户端
+        model: 模型名称，参与缓存键
+        cache: 嵌入缓存，None 表示不缓存
+        max_batch_tokens: 每个请求的 token 上限
+        max_batch_size: 每个请求的最大条数
+        max_concurrency: 同时进行的请求数
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        cache: Optional[EmbeddingCache] = None,
+        max_batch_tokens: int = 8192,
+        max_batch_size: int = 32,
+        max_concurrency: int = 4,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._stats = {"texts": 0, "duplicates": 0, "cache_hits": 0, "embedded": 0, "requests": 0}
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """文本数、重复数、缓存命中数、实际嵌入数、请求数和缓存命中率"""
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+        unique = stats["texts"] - stats["duplicates"]
+        stats["hit_rate"] = stats["cache_hits"] / unique if unique else 0.0
+        return stats
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        嵌入一组文本。
+
+        Args:
+            texts: 文本
+
+        Returns:
+            与 texts 一一对应的向量
+
+        Raises:
+            ValueError: 嵌入客户端返回的向量数与请求的文本数不一致
+        """
+        unique, keys, vectors = self._prepare(texts)
+        missing = [text for text in unique if keys[text] not in vectors]
+        batches = [[missing[i] for i in batch] for batch in pack_batches(missing, self.max_batch_tokens, self.max_batch_size)]
+
+        if len(batches) == 1:
+            results = [self.embeddings.embed_documents(batches[0])]
+        elif batches:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = list(executor.map(self.embeddings.embed_documents, batches))
+        else:
+            results = []
+        return self._finish(texts, keys, vectors, batches, results)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        异步嵌入一组文本。
+
+        Args:
+            texts: 文本
+
+        Returns:
+            与 texts 一一对应的向量
+
+        Raises:
+            ValueError: 嵌入客户端返回的向量数与请求的文本数不一致
+        """
+        unique, keys, vectors = self._prepare(texts)
+        missing = [text for text in unique if keys[text] not in vectors]
+        batches = [[missing[i] for i in batch] for batch in pack_batches(missing, self.max_batch_tokens, self.max_batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.embeddings.aembed_documents(batch)
+
+        results = await asyncio.gather(*(embed(batch) for batch in batches))
+        return self._finish(texts, keys, vectors, batches, list(results))
+
+    def embed_query(self, text: str) -> List[float]:
+        """嵌入查询文本（与文档共用缓存）"""
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """异步嵌入查询文本"""
+        return (await self.aembed_documents([text]))[0]
+
+    def _prepare(self, texts: List[str]) -> Tuple[List[str], Dict[str, str], Dict[str, List[float]]]:
+        """去重并查询缓存，返回唯一文本、文本到缓存键的映射和已命中的向量"""
+        unique = list(dict.fromkeys(texts))
+        keys = {text: embedding_key(self.model, text) for text in unique}
+        vectors = self.cache.get_many(list(keys.values())) if self.cache is not None else {}
+        with self._lock:
+            self._stats["texts"] += len(texts)
+            self._stats["duplicates"] += len(texts) - len(unique)
+            self._stats["cache_hits"] += len(vectors)
+        return unique, keys, vectors
+
+    def _finish(
+        self,
+        texts: List[str],
+        keys: Dict[str, str],
+        vectors: Dict[str, List[float]],
+        batches: List[List[str]],
+        results: List[List[List[float]]],
+    ) -> List[List[float]]:
+        """合并新计算的向量、写回缓存，并按输入顺序返回"""
+        for batch, batch_vectors in zip(batches, results):
+            if len(batch_vectors) != len(batch):
+                raise ValueError(f"嵌入模型 {self.model} 为 {len(batch)} 条文本返回了 {len(batch_vectors)} 个向量")
+        # 统一按 float32 精度返回，保证命中缓存与否结果完全一致
+        computed = [
+            (keys[text], np.asarray(vector, dtype=np.float32).tolist())
+            for batch, batch_vectors in zip(batches, results)
+            for text, vector in zip(batch, batch_vectors)
+        ]
+        if computed and self.cache is not None:
+            self.cache.put_many(computed)
+        vectors.update(computed)
+        with self._lock:
+            self._stats["embedded"] += len(computed)
+            self._stats["requests"] += len(batches)
+        return [vectors[keys[text]] for text in texts]
+
+
+_embeddings: Dict[Tuple[str, bool, str], Tuple[object, BatchedEmbeddings]] = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(model: str = DEFAULT_EMBEDDING_MODEL, cache: bool = True, **kwargs: object) -> BatchedEmbeddings:
+    """
+    获取连接到硅基流动的嵌入客户端。
+
+    相同参数返回同一个实例，请求走共享连接池，向量缓存在共享的嵌入缓存中。
+
+    Args:
+        model: 嵌入模型名称
+        cache: 是否使用磁盘缓存
+        **kwargs: 其他传给 BatchedEmbeddings 的参数（例如 max_concurrency），只在首次创建时生效
+
+    Returns:
+        批量、并发、带缓存的嵌入客户端
+
+    Raises:
+        ValueError: 未设置 SILICONFLOW_API_KEY 环境变量
+    """
+    api_key = get_api_key()
+    base_url = get_base_url()
+    http_client = get_http_client()
+    key = (model, cache, base_url)
+    with _embeddings_lock:
+        entry = _embeddings.get(key)
+        # 连接池被 configure_pool / close_clients 重建后需要重新创建客户端
+        if entry is not None and entry[0] is http_client:
+            return entry[1]
+
+    client = OpenAIEmbeddings(
+        model=model,
+        base_url=base_url,
+        api_key=api_key,
+        http_client=http_client,
+        http_async_client=get_async_http_client(),
+        max_retries=get_sdk_max_retries(),
+        # 批次由 BatchedEmbeddings 控制；bge 等模型不使用 tiktoken 分词，直接发送原文
+        chunk_size=kwargs.get("max_batch_size", 32),  # type: ignore[arg-type]
+        check_embedding_ctx_length=False,
+    )
+    embeddings = BatchedEmbeddings(client, model, cache=get_embedding_cache() if cache else None, **kwargs)  # type: ignore[arg-type]
+
+    with _embeddings_lock:
+        entry = _embeddings.get(key)
+        if entry is not None and entry[0] is http_client:
+            return entry[1]
+        _embeddings[key] = (http_client, embeddings)
+        return embeddings
+
+
+class HashedNGramEmbeddings(Embeddings):
+    """
+    基于字符 n-gram 哈希的本地嵌入。
+
+    每个字符 n-gram 哈希到固定维度中的一个位置并带上正负号，计数后做 L2 归一化。
+    中文没有空格分词，字符 n-gram 能直接捕捉词语重叠；整个批次在 NumPy 中一次计算，
+    结果只取决于文本内容，跨进程稳定，适合离线运行记忆示例和测试。
+
+    Args:
+        dims: 向量维度
+        ngram_range: n-gram 长度范围（包含两端）
+        lowercase: 是否先转为小写
+        batch_size: 每次向量化计算的文本数，限制中间数组的大小
+    """
+
+    def __init__(
+        self,
+        dims: int = 256,
+        ngram_range: Tuple[int, int] = (1, 3),
+        lowercase: bool = True,
+        batch_size: int = 4096,
+    ):
+        self.dims = dims
+        self.ngram_range = ngram_range
+        self.lowercase = lowercase
+        self.batch_size = batch_size
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        """可以直接作为 InMemoryStore(index={"embed": ...}) 的嵌入函数"""
+        return self.embed_documents(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        嵌入一组文本。
+
+        Args:
+            texts: 文本
+
+        Returns:
+            与 texts 一一对应的 L2 归一化向量
+        """
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """嵌入查询文本"""
+        return self.embed_array([text])[0].tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        嵌入一组文本，返回 float32 矩阵。
+
+        Args:
+            texts: 文本
+
+        Returns:
+            形状为 (len(texts), dims) 的矩阵
+        """
+        if not texts:
+            return np.zeros((0, self.dims), dtype=np.float32)
+        return np.concatenate(
+            [self._embed_batch(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        )
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        if self.lowercase:
+            texts = [text.lower() for text in texts]
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        # 所有文本拼成一个码点数组，segment 记录每个位置属于哪条文本
+        codepoints = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        segment = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        counts = np.zeros(len(texts) * self.dims, dtype=np.float64)
+
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            positions = len(codepoints) - n + 1
+            if positions <= 0:
+                continue
+            # 只保留首尾字符属于同一条文本的 n-gram
+            valid = segment[:positions] == segment[n - 1:]
+            hashes = np.full(positions, n * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF, dtype=np.uint64)
+            for k in range(n):
+                hashes = (hashes ^ codepoints[k:k + positions]) * np.uint64(0x100000001B3)
+            # 64 位混合函数打散低位，最低位决定符号，其余位决定维度
+            hashes ^= hashes >> np.uint64(33)
+            hashes *= np.uint64(0xFF51AFD7ED558CCD)
+            hashes ^= hashes >> np.uint64(33)
+            hashes = hashes[valid]
+            signs = np.where(hashes & np.uint64(1), 1.0, -1.0)
+            buckets = ((hashes >> np.uint64(1)) % np.uint64(self.dims)).astype(np.int64)
+            counts += np.bincount(segment[:positions][valid] * self.dims + buckets, weights=signs, minlength=counts.size)
+
+        vectors = counts.reshape(len(texts), self.dims).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
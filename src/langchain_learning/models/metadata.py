@@ -0,0 +1,85 @@
+"""
+本地模型元数据
+
+记录示例中使用的硅基流动模型的上下文窗口、是否为推理模型、默认生成长度和调用的时限、重试与对冲策略。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class ResiliencePolicy:
+    """
+    单个模型的时限、重试和对冲策略。
+
+    Attributes:
+        deadline: 一次调用（包括重试和对冲）等到响应头的总时限（秒），None 表示不限制
+        max_attempts: 最多尝试的次数（包括第一次）
+        backoff_base: 第一次重试前退避时间的上限（秒），之后每次翻倍，实际等待在 0 到上限之间随机
+        backoff_max: 退避时间上限的最大值（秒）
+        hedge: 是否在等待超过 hedge_quantile 分位延迟后发出对冲请求
+        hedge_quantile: 触发对冲的延迟分位点，取值 0-100
+        hedge_min_samples: 开始对冲前至少需要的延迟样本数
+        hedge_min_delay: 对冲前最短的等待时间（秒）
+    """
+
+    deadline: Optional[float] = 120.0
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 10.0
+    hedge: bool = False
+    hedge_quantile: float = 95.0
+    hedge_min_samples: int = 20
+    hedge_min_delay: float = 0.1
+
+
+# 推理模型先输出思考过程，响应慢且长短差异大，放宽时限，不做对冲
+_REASONING_POLICY = ResiliencePolicy(deadline=300.0)
+# 普通对话模型响应快，延迟超过 p95 时发出对冲请求
+_CHAT_POLICY = ResiliencePolicy(deadline=60.0, hedge=True)
+
+
+@dataclass(frozen=True)
+class ModelMetadata:
+    """
+    单个模型的本地元数据。
+
+    Attributes:
+        id: 模型ID
+        name: 显示名称
+        context_window: 上下文窗口（token）
+        reasoning: 是否为推理模型（会先输出思考过程）
+        default_max_tokens: 默认最大生成 token 数
+        resilience: 调用的时限、重试与对冲策略
+    """
+
+    id: str
+    name: str
+    context_window: int = 32768
+    reasoning: bool = False
+    default_max_tokens: int = 1024
+    resilience: ResiliencePolicy = ResiliencePolicy()
+
+
+MODEL_METADATA: List[ModelMetadata] = [
+    ModelMetadata("Qwen/Qwen3-8B", "通义千问 Qwen3-8B (默认)", context_window=131072, reasoning=True, resilience=_REASONING_POLICY),
+    ModelMetadata("deepseek-ai/DeepSeek-R1-0528-Qwen3-8B", "DeepSeek-R1-0528-Qwen3-8B", context_window=131072, reasoning=True, resilience=_REASONING_POLICY),
+    ModelMetadata("THUDM/GLM-Z1-9B-0414", "清华 GLM-Z1-9B-0414", context_window=32768, reasoning=True, resilience=_REASONING_POLICY),
+    ModelMetadata("THUDM/glm-4-9b-chat", "清华 GLM-4-9B-Chat", context_window=32768, resilience=_CHAT_POLICY),
+]
+
+_METADATA_BY_ID: Dict[str, ModelMetadata] = {m.id: m for m in MODEL_METADATA}
+
+
+def get_model_metadata(model_id: str) -> ModelMetadata:
+    """
+    查找模型的本地元数据。
+
+    Args:
+        model_id: 模型ID
+
+    Returns:
+        模型元数据，未登记的模型返回保守的默认值
+    """
+    return _METADATA_BY_ID.get(model_id) or ModelMetadata(model_id, model_id)
@@ -0,0 +1,612 @@
+"""
+自适应的客户端限流
+
+包在共享 httpx 连接池外面的传输层，所有经过 get_chat_model / get_embeddings 的请求都会先经过这里。
+每个模型各有一组限流状态:
+
+- 请求数 / 分钟和 token 数 / 分钟两个令牌桶；发送前按提示词估计值（请求指定了 max_tokens 时再加上它）预扣，
+  响应结束后按 usage 中的实际用量多退少补，输出 token 由之后的请求等待偿还
+- 并发上限按 AIMD 调整：请求成功且首字节延迟正常时缓慢增加，遇到 429 / 503 或延迟明显升高时减半。
+  延迟只取流式响应的首字节时间；非流式响应要等整段回复生成完才返回响应头，这段时间随输出长度变化，
+  不能反映服务端是否在排队，只参与增加并发上限
+- 429 / 503 响应带 Retry-After 时，该模型的所有新请求都暂停到指定时间之后
+- 请求的 extensions 中带有截止时间（DEADLINE_EXTENSION）时，排队和等待配额都不会超过它，超过时抛出 RateLimitTimeout
+
+并发上限、正在执行和排队中的请求数可以随时通过 rate_limit_stats() 查看。
+"""
+
+import asyncio
+import email.utils
+import json
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from langchain_learning.utils.tokens import estimate_tokens
+
+# 表示服务端过载、需要降低并发的状态码
+_OVERLOAD_STATUS = (429, 503)
+# 首字节延迟指数平均的权重
+_LATENCY_ALPHA = 0.2
+# 延迟基线每次向当前平均值靠近的比例，负载长期变化后基线随之上移
+_FLOOR_DRIFT = 0.01
+# 从流式响应末尾查找 usage 时保留的字节数
+_SSE_TAIL_BYTES = 4096
+# describe_request 的结果在 request.extensions 中的键
+_DESCRIBE_KEY = "langchain_learning.describe"
+# 请求截止时间（time.monotonic）在 request.extensions 中的键，由 resilience.py 设置
+DEADLINE_EXTENSION = "langchain_learning.deadline"
+
+
+class RateLimitTimeout(httpx.PoolTimeout):
+    """截止时间之前没有等到并发名额或配额"""
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    """
+    单个模型的限流配置。
+
+    Attributes:
+        requests_per_minute: 每分钟请求数上限，None 表示不限制
+        tokens_per_minute: 每分钟 token 数上限（输入 + 输出），None 表示不限制
+        burst_seconds: 令牌桶容量对应的秒数，空闲之后最多允许这么多秒的配额一次用完
+        initial_concurrency: 初始并发上限
+        min_concurrency: 并发上限的下限
+        max_concurrency: 并发上限的上限
+        latency_target: 流式响应的首字节延迟目标（秒），None 表示使用观测到的延迟基线乘以 latency_tolerance
+        latency_tolerance: 平均延迟超过基线的多少倍时认为服务端在排队
+        decrease_factor: 减小并发上限时乘的系数
+        decrease_cooldown: 两次减小并发上限之间的最短间隔（秒），避免同一批请求的多个 429 连续减半
+        max_retry_after: Retry-After 暂停的最长时间（秒）
+    """
+
+    requests_per_minute: Optional[float] = 1000.0
+    tokens_per_minute: Optional[float] = 50000.0
+    burst_seconds: float = 10.0
+    initial_concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 64
+    latency_target: Optional[float] = None
+    latency_tolerance: float = 2.0
+    decrease_factor: float = 0.5
+    decrease_cooldown: float = 2.0
+    max_retry_after: float = 60.0
+
+
+class _TokenBucket:
+    """按预约方式使用的令牌桶：余量可以为负，负数部分就是后来者需要等待的时间"""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """预扣配额，返回需要等待的秒数"""
+        self._refill(now)
+        self.level -= amount
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    def adjust(self, amount: float, now: float) -> None:
+        """退回（正数）或补扣（负数）配额"""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    """排队等待并发名额的请求，同步请求用线程事件唤醒，异步请求用所在事件循环的 future 唤醒"""
+
+    __slots__ = ("granted", "event", "loop", "future")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future: Optional["asyncio.Future[None]"] = loop.create_future() if loop is not None else None
+
+    def wake(self) -> None:
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)  # type: ignore[union-attr]
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+@dataclass
+class _Permit:
+    """一个已经放行的请求，响应结束时交回限流器"""
+
+    tokens: int
+    started: float
+    status: Optional[int] = None
+    latency: Optional[float] = None
+    retry_after: Optional[float] = None
+    released: bool = field(default=False, repr=False)
+
+
+class AdaptiveRateLimiter:
+    """
+    单个模型的令牌桶限流和 AIMD 并发控制，同步和异步请求共用同一份状态。
+
+    Args:
+        config: 限流配置
+        name: 模型名称，用于统计
+    """
+
+    def __init__(self, config: Optional[RateLimitConfig] = None, name: str = ""):
+        self.config = config or RateLimitConfig()
+        self.name = name
+        self._lock = threading.Lock()
+        self._requests = (
+            _TokenBucket(self.config.requests_per_minute, self.config.burst_seconds)
+            if self.config.requests_per_minute
+            else None
+        )
+        self._tokens = (
+            _TokenBucket(self.config.tokens_per_minute, self.config.burst_seconds)
+            if self.config.tokens_per_minute
+            else None
+        )
+        self._limit = float(min(max(self.config.initial_concurrency, self.config.min_concurrency), self.config.max_concurrency))
+        self._in_flight = 0
+        self._queued = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latency: Optional[float] = None
+        self._latency_floor: Optional[float] = None
+        self._stats = {"requests": 0, "overloaded": 0, "decreases": 0, "wait_seconds": 0.0}
+
+    @property
+    def concurrency_limit(self) -> int:
+        """当前的并发上限"""
+        return max(int(self._limit), 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        当前状态和累计统计。
+
+        Returns:
+            并发上限、正在执行和排队中的请求数、Retry-After 剩余暂停时间、首字节延迟平均值，
+            以及累计的请求数、过载响应数、并发上限减小次数和排队等待总时间
+        """
+        with self._lock:
+            return {
+                "concurrency_limit": self.concurrency_limit,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+                "latency": self._latency,
+                **self._stats,
+            }
+
+    def acquire(self, tokens: int = 0, timeout: Optional[float] = None) -> _Permit:
+        """
+        等待并发名额和配额（阻塞当前线程）。
+
+        Args:
+            tokens: 本次请求预计消耗的 token 数
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            放行凭证，请求结束后交给 release()
+
+        Raises:
+            RateLimitTimeout: timeout 内等不到并发名额，或者配额要在 timeout 之后才够用
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiter = _Waiter()
+        queued_at = self._enqueue(waiter)
+        try:
+            if not waiter.granted and not waiter.event.wait(timeout):  # type: ignore[union-attr]
+                raise RateLimitTimeout(f"{timeout:g} 秒内没有等到 {self.name} 的并发名额")
+            delay = self._reserve(tokens, deadline)
+            if delay > 0:
+                time.sleep(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        finally:
+            self._dequeue(queued_at)
+        return _Permit(tokens, time.monotonic())
+
+    async def aacquire(self, tokens: int = 0, timeout: Optional[float] = None) -> _Permit:
+        """异步版本的 acquire()，等待时不阻塞事件循环"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiter = _Waiter(asyncio.get_running_loop())
+        queued_at = self._enqueue(waiter)
+        try:
+            if not waiter.granted:
+                try:
+                    await asyncio.wait_for(waiter.future, timeout)  # type: ignore[arg-type]
+                except asyncio.TimeoutError:
+                    raise RateLimitTimeout(f"{timeout:g} 秒内没有等到 {self.name} 的并发名额") from None
+            delay = self._reserve(tokens, deadline)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        finally:
+            self._dequeue(queued_at)
+        return _Permit(tokens, time.monotonic())
+
+    def release(self, permit: _Permit, used_tokens: Optional[int] = None) -> None:
+        """
+        请求结束，交回并发名额并根据结果调整并发上限。
+
+        Args:
+            permit: acquire() 返回的凭证，status、latency、retry_after 为响应头到达时记录的结果；
+                status 为 None 表示网络错误，不参与调整；latency 为 None 表示不是流式响应，只参与增加并发上限
+            used_tokens: 响应中的实际 token 用量，用于校正 token 桶
+        """
+        now = time.monotonic()
+        with self._lock:
+            if permit.released:
+                return
+            permit.released = True
+            if used_tokens is not None and self._tokens is not None:
+                self._tokens.adjust(permit.tokens - used_tokens, now)
+            if permit.status is not None:
+                self._stats["requests"] += 1
+                if permit.status in _OVERLOAD_STATUS:
+                    self._stats["overloaded"] += 1
+                    if permit.retry_after:
+                        pause = min(permit.retry_after, self.config.max_retry_after)
+                        self._paused_until = max(self._paused_until, now + pause)
+                    self._decrease_locked(now)
+                elif permit.status < 500:
+                    self._observe_locked(permit.latency, now)
+            self._in_flight -= 1
+            self._wake_locked()
+
+    def _enqueue(self, waiter: _Waiter) -> float:
+        with self._lock:
+            self._queued += 1
+            if not self._waiters and self._in_flight < self.concurrency_limit:
+                self._in_flight += 1
+                waiter.granted = True
+            else:
+                self._waiters.append(waiter)
+        return time.monotonic()
+
+    def _dequeue(self, queued_at: float) -> None:
+        with self._lock:
+            self._queued -= 1
+            self._stats["wait_seconds"] += time.monotonic() - queued_at
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """排队或等待配额时被取消或超时：交回已经分到的名额，或者离开队列"""
+        with self._lock:
+            if waiter.granted:
+                self._in_flight -= 1
+                self._wake_locked()
+            else:
+                self._waiters.remove(waiter)
+
+    def _reserve(self, tokens: int, deadline: Optional[float] = None) -> float:
+        """预扣配额并返回需要等待的秒数；等待会超过 deadline 时撤销预扣并抛出 RateLimitTimeout"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._paused_until - now
+            if self._requests is not None:
+                delay = max(delay, self._requests.reserve(1, now))
+            if self._tokens is not None and tokens:
+                delay = max(delay, self._tokens.reserve(tokens, now))
+            if deadline is not None and now + delay > deadline:
+                if self._requests is not None:
+                    self._requests.adjust(1, now)
+                if self._tokens is not None and tokens:
+                    self._tokens.adjust(tokens, now)
+                raise RateLimitTimeout(f"{self.name} 的配额要 {delay:.1f} 秒后才够用，超过了截止时间")
+            return delay
+
+    def _wake_locked(self) -> None:
+        while self._waiters and self._in_flight < self.concurrency_limit:
+            self._in_flight += 1
+            self._waiters.popleft().wake()
+
+    def _observe_locked(self, latency: Optional[float], now: float) -> None:
+        """成功的请求：延迟正常且名额已经用满时加性增加，流式响应的首字节延迟明显升高时乘性减小"""
+        if latency is not None:
+            if self._latency is None:
+                self._latency = self._latency_floor = latency
+            else:
+                self._latency += _LATENCY_ALPHA * (latency - self._latency)
+                floor = self._latency_floor or self._latency
+                self._latency_floor = min(self._latency, floor + _FLOOR_DRIFT * (self._latency - floor))
+        if self._latency is not None:
+            target = self.config.latency_target or self._latency_floor * self.config.latency_tolerance  # type: ignore[operator]
+            if self._latency > target:
+                self._decrease_locked(now)
+                return
+        if self._in_flight >= self.concurrency_limit:
+            # 每个并发名额完成一次请求，上限大约加一
+            self._limit = min(float(self.config.max_concurrency), self._limit + 1.0 / self._limit)
+
+    def _decrease_locked(self, now: float) -> None:
+        if now - self._last_decrease < self.config.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.config.min_concurrency), self._limit * self.config.decrease_factor)
+        self._stats["decreases"] += 1
+
+
+class RateLimiterGroup:
+    """
+    按模型分组的限流器，第一次请求某个模型时创建。
+
+    Args:
+        config: 默认的限流配置
+        per_model: 模型名称到单独限流配置的映射
+    """
+
+    def __init__(self, config: Optional[RateLimitConfig] = None, per_model: Optional[Dict[str, RateLimitConfig]] = None):
+        self.config = config or RateLimitConfig()
+        self.per_model = dict(per_model or {})
+        self._limiters: Dict[str, AdaptiveRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str) -> AdaptiveRateLimiter:
+        """获取模型的限流器"""
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                limiter = self._limiters[model] = AdaptiveRateLimiter(self.per_model.get(model, self.config), model)
+            return limiter
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """所有已使用模型的限流状态，键为模型名称（不带模型的请求，例如模型列表，记在空字符串下）"""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def _texts(value: Any) -> Iterator[str]:
+    """请求体中需要计入 token 的文本：消息内容、嵌入输入"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict):
+                yield from _texts(item.get("content", item.get("text")))
+            elif isinstance(item, list) and all(isinstance(token, int) for token in item):
+                yield " " * (4 * len(item))  # 已经分词的输入，每个 token 记 4 个字符
+            else:
+                yield from _texts(item)
+
+
+def describe_request(request: httpx.Request) -> Tuple[str, int]:
+    """
+    从请求体中取出模型名称和预计的 token 数，结果记在请求上，同一请求的多层传输层只解析一次。
+
+    Args:
+        request: httpx 请求
+
+    Returns:
+        (模型名称, 输入估计值 + 请求指定的最大生成长度)，不是 JSON 请求体时为 ("", 0)
+    """
+    cached = request.extensions.get(_DESCRIBE_KEY)
+    if cached is not None:
+        return cached
+    model, tokens = "", 0
+    try:
+        body = json.loads(request.content) if request.content else None
+    except (httpx.RequestNotRead, ValueError):
+        body = None
+    if isinstance(body, dict):
+        model = str(body.get("model", ""))
+        tokens = sum(estimate_tokens(text) for key in ("messages", "input") for text in _texts(body.get(key)))
+        tokens += int(body.get("max_tokens") or body.get("max_completion_tokens") or 0)
+    request.extensions[_DESCRIBE_KEY] = (model, tokens)
+    return model, tokens
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """解析 Retry-After 头（秒），支持秒数和 HTTP 日期两种格式，没有时返回 None"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def usage_tokens(content_type: str, body: bytes) -> Optional[int]:
+    """从 JSON 或 SSE 响应体中读取 usage.total_tokens"""
+    if "event-stream" in content_type:
+        # 用量在最后一个数据块里
+        lines: List[bytes] = [line[5:].strip() for line in body.splitlines() if line.startswith(b"data:")]
+        payloads = [line for line in lines if line and line != b"[DONE]"][-2:]
+    elif "json" in content_type:
+        payloads = [body]
+    else:
+        return None
+    for payload in reversed(payloads):
+        try:
+            usage = json.loads(payload).get("usage")
+        except (ValueError, AttributeError):
+            continue
+        if isinstance(usage, dict) and isinstance(usage.get("total_tokens"), int):
+            return usage["total_tokens"]
+    return None
+
+
+class _Collector:
+    """在响应体流过时保留计算用量需要的字节：JSON 全部保留，SSE 只保留末尾；gzip / deflate 压缩的响应先解压"""
+
+    def __init__(self, response: httpx.Response):
+        self.content_type = response.headers.get("content-type", "")
+        self.limit: Optional[int] = _SSE_TAIL_BYTES if "event-stream" in self.content_type else None
+        self.enabled = "json" in self.content_type or self.limit is not None
+        encoding = response.headers.get("content-encoding", "identity").strip().lower()
+        self.decoder: Any = None
+        if encoding == "gzip":
+            self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self.decoder = zlib.decompressobj()
+        elif encoding != "identity":
+            self.enabled = False  # 其他压缩格式不解析用量
+        self.buffer = bytearray()
+
+    def add(self, chunk: bytes) -> None:
+        if not self.enabled:
+            return
+        if self.decoder is not None:
+            try:
+                chunk = self.decoder.decompress(chunk)
+            except zlib.error:
+                self.enabled = False
+                return
+        self.buffer += chunk
+        if self.limit is not None and len(self.buffer) > 2 * self.limit:
+            del self.buffer[: -self.limit]
+
+    def usage(self) -> Optional[int]:
+        return usage_tokens(self.content_type, bytes(self.buffer)) if self.enabled else None
+
+
+class _LimitedStream(httpx.SyncByteStream):
+    """同步响应体：读完或关闭时交回并发名额"""
+
+    def __init__(self, stream: httpx.SyncByteStream, response: httpx.Response, limiter: AdaptiveRateLimiter, permit: _Permit):
+        self._stream = stream
+        self._limiter = limiter
+        self._permit = permit
+        self._collector = _Collector(response)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._collector.add(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._limiter.release(self._permit, self._collector.usage())
+
+
+class _AsyncLimitedStream(httpx.AsyncByteStream):
+    """异步响应体：读完或关闭时交回并发名额"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, response: httpx.Response, limiter: AdaptiveRateLimiter, permit: _Permit):
+        self._stream = stream
+        self._limiter = limiter
+        self._permit = permit
+        self._collector = _Collector(response)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._collector.add(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._limiter.release(self._permit, self._collector.usage())
+
+
+def _remaining(request: httpx.Request) -> Optional[float]:
+    """请求截止时间之前剩余的秒数，没有截止时间时为 None"""
+    deadline = request.extensions.get(DEADLINE_EXTENSION)
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+
+def _record(permit: _Permit, response: httpx.Response) -> None:
+    permit.status = response.status_code
+    if "event-stream" in response.headers.get("content-type", ""):
+        # 流式响应头在第一个 token 之前到达，即首字节延迟
+        permit.latency = time.monotonic() - permit.started
+    if response.status_code in _OVERLOAD_STATUS:
+        permit.retry_after = retry_after_seconds(response)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    同步 httpx 传输层包装：发送前按模型限流，响应体关闭后交回名额。
+
+    Args:
+        transport: 实际发送请求的传输层
+        limiters: 按模型分组的限流器
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, limiters: RateLimiterGroup):
+        self._transport = transport
+        self.limiters = limiters
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = describe_request(request)
+        limiter = self.limiters.get(model)
+        permit = limiter.acquire(tokens, _remaining(request))
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            limiter.release(permit)
+            raise
+        _record(permit, response)
+        if response.is_closed:
+            # 响应体已经完整读入内存（例如 MockTransport），直接交回名额
+            limiter.release(permit, usage_tokens(response.headers.get("content-type", ""), response.content))
+        else:
+            response.stream = _LimitedStream(response.stream, response, limiter, permit)  # type: ignore[arg-type]
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    异步 httpx 传输层包装，与同步版本共用同一组限流器。
+
+    Args:
+        transport: 实际发送请求的传输层
+        limiters: 按模型分组的限流器
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiters: RateLimiterGroup):
+        self._transport = transport
+        self.limiters = limiters
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = describe_request(request)
+        limiter = self.limiters.get(model)
+        permit = await limiter.aacquire(tokens, _remaining(request))
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            limiter.release(permit)
+            raise
+        _record(permit, response)
+        if response.is_closed:
+            limiter.release(permit, usage_tokens(response.headers.get("content-type", ""), response.content))
+        else:
+            response.stream = _AsyncLimitedStream(response.stream, response, limiter, permit)  # type: ignore[arg-type]
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,421 @@
+"""
+调用时限、重试与对冲请求
+
+包在限流层外面的 httpx 传输层，每个模型按 ResiliencePolicy（默认取自 MODEL_METADATA，见 metadata.py）处理每一次请求:
+
+- 时限：一次调用（包括所有重试和对冲）等到响应头的总时间上限，超时抛出 DeadlineExceeded，
+  OpenAI SDK 会把它转换为 APITimeoutError
+- 重试：连接错误、超时以及 408 / 429 / 5xx 响应按带抖动的指数退避重试，429 响应的 Retry-After 作为最短等待时间
+- 对冲：等待超过该模型最近延迟的 p95 仍没有响应头时，再发出一个相同的请求，取先到达的响应；
+  落后的请求被取消（异步）或在后台读完后丢弃（同步），它消耗的 token 计入 extra_tokens
+
+流式响应的响应头在第一个 token 之前到达，因此时限和对冲控制的是首 token 时间。
+重试由这一层负责，模型客户端自身的重试应关闭（get_chat_model 已经这样做）。
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, Set
+
+import httpx
+
+from langchain_learning.models.metadata import ResiliencePolicy
+from langchain_learning.models.rate_limit import (
+    DEADLINE_EXTENSION,
+    RateLimitTimeout,
+    describe_request,
+    retry_after_seconds,
+    usage_tokens,
+)
+from langchain_learning.utils.metrics import percentile
+
+# 需要重试的响应状态码
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+# 计算对冲延迟时保留的最近延迟样本数
+_LATENCY_WINDOW = 200
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """调用在时限内没有拿到响应"""
+
+
+class _ModelResilience:
+    """单个模型的延迟样本和统计"""
+
+    def __init__(self, policy: ResiliencePolicy, name: str):
+        self.policy = policy
+        self.name = name
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._hedge_delay: Optional[float] = None
+        self._stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "deadline_exceeded": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "extra_tokens": 0,
+        }
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def observe(self, latency: float) -> None:
+        """记录一次成功调用的延迟，样本足够后更新对冲延迟"""
+        with self._lock:
+            self._latencies.append(latency)
+            if self.policy.hedge and len(self._latencies) >= self.policy.hedge_min_samples:
+                delay = percentile(self._latencies, self.policy.hedge_quantile)
+                self._hedge_delay = max(delay, self.policy.hedge_min_delay)
+
+    def hedge_delay(self) -> Optional[float]:
+        """对冲前的等待时间，没有启用对冲或样本不足时为 None"""
+        return self._hedge_delay
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "hedge_delay": self._hedge_delay if self.policy.hedge else None}
+
+
+class ResilienceGroup:
+    """
+    按模型分组的策略和统计，第一次请求某个模型时创建。
+
+    Args:
+        policy_for: 模型名称到策略的映射函数
+    """
+
+    def __init__(self, policy_for: Callable[[str], ResiliencePolicy]):
+        self._policy_for = policy_for
+        self._models: Dict[str, _ModelResilience] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str) -> _ModelResilience:
+        with self._lock:
+            state = self._models.get(model)
+            if state is None:
+                state = self._models[model] = _ModelResilience(self._policy_for(model), model)
+            return state
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        所有已使用模型的统计。
+
+        Returns:
+            模型名称到调用数、尝试数、重试数、超时数、对冲次数、对冲胜出次数、
+            对冲额外消耗的 token 数（被取消的请求按输入估计值计）和当前对冲延迟的映射
+        """
+        with self._lock:
+            states = list(self._models.values())
+        return {state.name: state.stats() for state in states}
+
+
+def _replayable(request: httpx.Request) -> bool:
+    """请求体已经在内存中时才能重发"""
+    try:
+        request.content  # noqa: B018 - 只为触发 RequestNotRead，流式请求体没有 content
+    except httpx.RequestNotRead:
+        return False
+    return True
+
+
+def _with_deadline(request: httpx.Request, deadline: Optional[float]) -> None:
+    """把剩余时间设为这次尝试的 httpx 超时上限，并把截止时间交给限流层（排队等待同样受时限约束）"""
+    if deadline is None:
+        return
+    request.extensions[DEADLINE_EXTENSION] = deadline
+    remaining = max(deadline - time.monotonic(), 0.001)
+    timeout = dict(request.extensions.get("timeout") or {})
+    for key in ("connect", "read", "write", "pool"):
+        value = timeout.get(key)
+        timeout[key] = remaining if value is None else min(value, remaining)
+    request.extensions["timeout"] = timeout
+
+
+def _backoff(policy: ResiliencePolicy, retry: int, retry_after: Optional[float]) -> float:
+    """第 retry 次重试前的等待时间：完全抖动的指数退避，不短于 Retry-After"""
+    delay = random.uniform(0.0, min(policy.backoff_max, policy.backoff_base * 2**retry))
+    return max(delay, retry_after or 0.0)
+
+
+def _discard(state: _ModelResilience, response: httpx.Response, estimate: int) -> None:
+    """丢弃落后的对冲响应，计入它消耗的 token；流式响应直接关闭，按输入估计值计"""
+    content_type = response.headers.get("content-type", "")
+    used = None
+    try:
+        if "event-stream" not in content_type:
+            used = usage_tokens(content_type, response.read())
+    except httpx.HTTPError:
+        pass
+    finally:
+        response.close()
+    state.count("extra_tokens", used if used is not None else estimate)
+
+
+async def _adiscard(state: _ModelResilience, response: httpx.Response, estimate: int) -> None:
+    content_type = response.headers.get("content-type", "")
+    used = None
+    try:
+        if "event-stream" not in content_type:
+            used = usage_tokens(content_type, await response.aread())
+    except httpx.HTTPError:
+        pass
+    finally:
+        await response.aclose()
+    state.count("extra_tokens", used if used is not None else estimate)
+
+
+class _Retrying:
+    """同步和异步传输层共用的重试循环状态"""
+
+    def __init__(self, state: _ModelResilience, request: httpx.Request):
+        self.state = state
+        self.policy = state.policy
+        self.started = time.monotonic()
+        self.attempt_started = self.started
+        self.deadline = self.started + self.policy.deadline if self.policy.deadline else None
+        # 请求体是流时无法重发，只尝试一次
+        self.replayable = _replayable(request)
+        self.attempts = self.policy.max_attempts if self.replayable else 1
+        state.count("calls")
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def expired(self) -> DeadlineExceeded:
+        self.state.count("deadline_exceeded")
+        return DeadlineExceeded(f"{self.policy.deadline:g} 秒内没有拿到响应")
+
+    def next_delay(self, retry: int, retry_after: Optional[float]) -> Optional[float]:
+        """还可以重试时返回等待时间，次数用完或等待后会超过时限时返回 None"""
+        if retry >= self.attempts:
+            return None
+        delay = _backoff(self.policy, retry - 1, retry_after)
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        self.state.count("retries")
+        return delay
+
+    def after_error(self, retry: int, error: httpx.TransportError) -> float:
+        """
+        请求出错后的等待时间。
+
+        Raises:
+            DeadlineExceeded: 出错时已经到了时限（这次尝试的超时被时限截短）
+            httpx.TransportError: 不再重试时重新抛出原来的错误
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise self.expired() from error
+        delay = self.next_delay(retry, None)
+        if delay is None:
+            raise error
+        return delay
+
+    def begin(self) -> None:
+        self.state.count("attempts")
+        self.attempt_started = time.monotonic()
+
+    def finish(self, response: httpx.Response) -> httpx.Response:
+        # 只记录最后一次尝试的延迟，重试前的退避不应抬高对冲延迟
+        self.state.observe(time.monotonic() - self.attempt_started)
+        return response
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """
+    同步 httpx 传输层包装：时限、重试和对冲。对冲时两个请求在线程池中并行发送。
+
+    Args:
+        transport: 实际发送请求的传输层（通常是限流层）
+        group: 按模型分组的策略和统计
+        max_workers: 对冲使用的线程数上限
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, group: ResilienceGroup, max_workers: int = 32):
+        self._transport = transport
+        self.group = group
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, estimate = describe_request(request)
+        state = self.group.get(model)
+        call = _Retrying(state, request)
+        retry = 0
+        while True:
+            retry += 1
+            try:
+                response = self._attempt(request, call, estimate)
+            except DeadlineExceeded:
+                raise
+            except RateLimitTimeout as e:
+                raise call.expired() from e
+            except httpx.TransportError as e:
+                delay = call.after_error(retry, e)
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    return call.finish(response)
+                delay = call.next_delay(retry, retry_after_seconds(response))
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+
+    def _attempt(self, request: httpx.Request, call: _Retrying, estimate: int) -> httpx.Response:
+        call.begin()
+        _with_deadline(request, call.deadline)
+        delay = call.state.hedge_delay() if call.replayable else None
+        remaining = call.remaining()
+        if delay is None or (remaining is not None and delay >= remaining):
+            return self._transport.handle_request(request)
+
+        executor = self._get_executor()
+        primary = executor.submit(self._transport.handle_request, request)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        call.state.count("hedges")
+        call.state.count("attempts")
+        hedge = executor.submit(self._transport.handle_request, request)
+        pending: Set["Future[httpx.Response]"] = {primary, hedge}
+        fallback: Optional[Future] = None
+        while pending:
+            remaining = call.remaining()
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                self._abandon(pending, call.state, estimate)
+                raise call.expired()
+            for future in done:
+                if future.exception() is None and future.result().status_code not in RETRYABLE_STATUS:
+                    if future is hedge:
+                        call.state.count("hedge_wins")
+                    self._abandon(pending | (done - {future}), call.state, estimate)
+                    return future.result()
+                if fallback is not None and fallback.exception() is None:
+                    fallback.result().close()
+                fallback = future
+        # 两个请求都失败：交给重试循环处理
+        return fallback.result()  # type: ignore[union-attr]
+
+    def _abandon(self, futures: Set["Future[httpx.Response]"], state: _ModelResilience, estimate: int) -> None:
+        """落后的请求无法中断，完成后在后台读完并丢弃"""
+
+        def discard(future: "Future[httpx.Response]") -> None:
+            if future.exception() is None:
+                _discard(state, future.result(), estimate)
+
+        for future in futures:
+            future.add_done_callback(discard)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="hedge")
+            return self._executor
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        self._transport.close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """
+    异步 httpx 传输层包装，落后的对冲请求会被直接取消。
+
+    Args:
+        transport: 实际发送请求的传输层（通常是限流层）
+        group: 按模型分组的策略和统计
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, group: ResilienceGroup):
+        self._transport = transport
+        self.group = group
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, estimate = describe_request(request)
+        state = self.group.get(model)
+        call = _Retrying(state, request)
+        retry = 0
+        while True:
+            retry += 1
+            try:
+                response = await self._attempt(request, call, estimate)
+            except DeadlineExceeded:
+                raise
+            except RateLimitTimeout as e:
+                raise call.expired() from e
+            except httpx.TransportError as e:
+                delay = call.after_error(retry, e)
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    return call.finish(response)
+                delay = call.next_delay(retry, retry_after_seconds(response))
+                if delay is None:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, request: httpx.Request, call: _Retrying, estimate: int) -> httpx.Response:
+        call.begin()
+        _with_deadline(request, call.deadline)
+        primary = asyncio.ensure_future(self._transport.handle_async_request(request))
+        pending: Set["asyncio.Future[httpx.Response]"] = {primary}
+        delay = call.state.hedge_delay() if call.replayable else None
+        hedge: Optional["asyncio.Future[httpx.Response]"] = None
+        fallback: Optional["asyncio.Future[httpx.Response]"] = None
+        won = False
+        try:
+            while pending:
+                remaining = call.remaining()
+                timeout = remaining
+                if hedge is None and delay is not None:
+                    timeout = delay if remaining is None else min(delay, remaining)
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    remaining = call.remaining()
+                    if hedge is not None or (remaining is not None and remaining <= 0):
+                        raise call.expired()
+                    # 等待超过对冲延迟，发出第二个相同的请求
+                    call.state.count("hedges")
+                    call.state.count("attempts")
+                    hedge = asyncio.ensure_future(self._transport.handle_async_request(request))
+                    pending.add(hedge)
+                    continue
+                for future in done:
+                    if future.exception() is None and future.result().status_code not in RETRYABLE_STATUS:
+                        if future is hedge:
+                            call.state.count("hedge_wins")
+                        for other in done - {future}:
+                            if other.exception() is None:
+                                await _adiscard(call.state, other.result(), estimate)
+                        won = True
+                        return future.result()
+                    if fallback is not None and fallback.exception() is None:
+                        await fallback.result().aclose()
+                    fallback = future
+            return fallback.result()  # type: ignore[union-attr]
+        finally:
+            # 落后或超时的请求直接取消；对冲胜出时服务端通常已经处理了落后请求的输入，按输入估计值计入额外消耗
+            for future in pending:
+                if future.cancel():
+                    if won:
+                        call.state.count("extra_tokens", estimate)
+                elif not future.cancelled() and future.exception() is None:
+                    # 在取消之前刚好完成的请求，读完并关闭后再返回，不留下无人持有的后台任务
+                    await _adiscard(call.state, future.result(), estimate)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
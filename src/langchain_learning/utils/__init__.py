@@ -1 +1,63 @@
-"""Utility functions for LangChain learning."""
\ No newline at end of file
+"""Utility functions for LangChain learning."""
+
+from langchain_learning.utils.agent_stream import AgentEvent, AgentStream
+from langchain_learning.utils.analytics import DataSummary, analyze_data, iter_records
+from langchain_learning.utils.batch import BatchReport, arun_batch, run_batch
+from langchain_learning.utils.calculator import CalculatorError, SafeCalculator, compile_expression
+from langchain_learning.utils.checkpointer import SQLiteCheckpointer, get_checkpointer
+from langchain_learning.utils.embedding_cache import EmbeddingCache, get_embedding_cache
+from langchain_learning.utils.history import TokenBudgetHistory
+from langchain_learning.utils.ingestion import IngestionReport, sync_documents
+from langchain_learning.utils.intent import NGramIntentClassifier, parse_intent
+from langchain_learning.utils.llm_cache import TwoTierLLMCache, get_response_cache
+from langchain_learning.utils.matrix_store import MatrixStore
+from langchain_learning.utils.metrics import percentile, summarize
+from langchain_learning.utils.paths import get_cache_dir
+from langchain_learning.utils.speculation import IntentSpeculator, SpeculativeRouter
+from langchain_learning.utils.sqlite_store import SQLiteStore
+from langchain_learning.utils.streaming import StreamRenderer, StreamResult
+from langchain_learning.utils.tokens import estimate_tokens
+from langchain_learning.utils.tool_cache import ToolResultCache, cached_tool, get_tool_cache, tool_cache_stats
+from langchain_learning.utils.tool_execution import ToolExecutionMiddleware
+from langchain_learning.utils.vector_index import MatrixIndex
+
+__all__ = [
+    "AgentEvent",
+    "AgentStream",
+    "BatchReport",
+    "CalculatorError",
+    "DataSummary",
+    "EmbeddingCache",
+    "IngestionReport",
+    "IntentSpeculator",
+    "MatrixIndex",
+    "MatrixStore",
+    "NGramIntentClassifier",
+    "SQLiteCheckpointer",
+    "SQLiteStore",
+    "SafeCalculator",
+    "SpeculativeRouter",
+    "StreamRenderer",
+    "StreamResult",
+    "TokenBudgetHistory",
+    "ToolExecutionMiddleware",
+    "ToolResultCache",
+    "TwoTierLLMCache",
+    "analyze_data",
+    "arun_batch",
+    "cached_tool",
+    "compile_expression",
+    "estimate_tokens",
+    "get_cache_dir",
+    "get_checkpointer",
+    "get_embedding_cache",
+    "get_response_cache",
+    "get_tool_cache",
+    "iter_records",
+    "parse_intent",
+    "percentile",
+    "run_batch",
+    "summarize",
+    "sync_documents",
+    "tool_cache_stats",
+]
@@ -0,0 +1,208 @@
+"""
+单次执行的智能体流式运行
+
+用 stream_mode=["updates", "values"] 执行一次智能体：迭代时产出每个节点的更新，
+同时记录每一步之后的完整状态，迭代结束后直接得到最终状态，不需要为了拿到最终回复再 invoke 一次。
+
+events() 额外打开 "messages" 流，逐 token 产出模型输出，并穿插工具调用和工具返回事件，
+同时记录首个可见 token 的时间。
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.pregel import Pregel
+
+from langchain_learning.utils.streaming import StreamResult
+
+# 只需要更新和状态两种流
+_STREAM_MODES = ["updates", "values"]
+# 逐 token 输出时还需要消息流
+_EVENT_MODES = ["messages", "updates", "values"]
+
+
+@dataclass
+class AgentEvent:
+    """
+    逐 token 流式运行中的一个事件。
+
+    Attributes:
+        kind: "token"（模型输出的文本片段）、"tool_call"（模型决定调用工具）或 "tool_result"（工具返回）
+        text: token 文本，或工具返回的内容
+        name: 工具名称
+        args: 工具参数（仅 tool_call）
+    """
+
+    kind: str
+    text: str = ""
+    name: Optional[str] = None
+    args: Optional[Dict[str, Any]] = None
+
+
+class AgentStream:
+    """
+    执行一次智能体，流式产出节点更新并保留最终状态。
+
+    同步执行用 for 迭代，异步执行用 async for 迭代；需要逐 token 输出时改用 events() / aevents()。
+    一个实例只能执行一次。
+
+        run = AgentStream(agent, {"messages": [HumanMessage(content="你好")]})
+        for node, update in run:
+            print(node, update)
+        print(run.final_message.content)
+
+    Args:
+        agent: create_agent 等返回的已编译图
+        inputs: 图的输入
+        config: 运行配置（例如带 thread_id 的 configurable）
+    """
+
+    def __init__(self, agent: Pregel, inputs: Any, config: Optional[RunnableConfig] = None):
+        self.agent = agent
+        self.inputs = inputs
+        self.config = config
+        self.state: Optional[Dict[str, Any]] = None
+        self.steps = 0
+        self.elapsed: Optional[float] = None
+        self.ttft: Optional[float] = None
+        self._token_chunks = 0
+        self._usage_tokens = 0
+        self._started_at = 0.0
+        self._started = False
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        self._start()
+        for mode, chunk in self.agent.stream(self.inputs, self.config, stream_mode=_STREAM_MODES):
+            yield from self._handle(mode, chunk)
+        self.elapsed = time.perf_counter() - self._started_at
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[str, Any]]:
+        self._start()
+        async for mode, chunk in self.agent.astream(self.inputs, self.config, stream_mode=_STREAM_MODES):
+            for item in self._handle(mode, chunk):
+                yield item
+        self.elapsed = time.perf_counter() - self._started_at
+
+    def events(self) -> Iterator[AgentEvent]:
+        """
+        逐 token 执行智能体，与 for 迭代二选一。
+
+        Returns:
+            事件迭代器：模型输出的 token 到达即产出，模型决定调用工具和每个工具返回时穿插对应事件
+        """
+        self._start()
+        for mode, chunk in self.agent.stream(self.inputs, self.config, stream_mode=_EVENT_MODES):
+            yield from self._events(mode, chunk)
+        self.elapsed = time.perf_counter() - self._started_at
+
+    async def aevents(self) -> AsyncIterator[AgentEvent]:
+        """异步版本的 events()"""
+        self._start()
+        async for mode, chunk in self.agent.astream(self.inputs, self.config, stream_mode=_EVENT_MODES):
+            for event in self._events(mode, chunk):
+                yield event
+        self.elapsed = time.perf_counter() - self._started_at
+
+    def stats(self) -> StreamResult:
+        """
+        执行结束后的时间统计。
+
+        Returns:
+            最终回复文本、首个可见 token 时间（只用 for 迭代或 result() 时为 None）、总耗时和输出 token 数
+            （服务端未返回用量时为文本块数）
+        """
+        if self.elapsed is None:
+            raise RuntimeError("智能体还没有执行完毕，请先完成迭代")
+        return StreamResult(
+            text=self.final_text,
+            ttft=self.ttft,
+            total_time=self.elapsed,
+            output_tokens=self._usage_tokens or self._token_chunks,
+        )
+
+    def result(self) -> Dict[str, Any]:
+        """
+        最终状态。还没有迭代时先完成整个执行（不产出更新）。
+
+        Returns:
+            与 invoke 返回值相同的最终状态
+        """
+        if not self._started:
+            for _ in self:
+                pass
+        if self.state is None:
+            raise RuntimeError("智能体还没有执行完毕，请先完成迭代")
+        return self.state
+
+    async def aresult(self) -> Dict[str, Any]:
+        """异步版本的 result()"""
+        if not self._started:
+            async for _ in self:
+                pass
+        if self.state is None:
+            raise RuntimeError("智能体还没有执行完毕，请先完成迭代")
+        return self.state
+
+    @property
+    def final_message(self) -> Optional[BaseMessage]:
+        """最终状态中的最后一条消息，通常是模型的最终回复"""
+        messages = (self.state or {}).get("messages") or []
+        return messages[-1] if messages else None
+
+    @property
+    def final_text(self) -> str:
+        """最终回复的文本，最后一条不是 AI 消息时返回空字符串"""
+        message = self.final_message
+        return message.text if isinstance(message, AIMessage) else ""
+
+    def _start(self) -> None:
+        if self._started:
+            raise RuntimeError("AgentStream 只能迭代一次")
+        self._started = True
+        self._started_at = time.perf_counter()
+
+    def _handle(self, mode: str, chunk: Any) -> Iterator[Tuple[str, Any]]:
+        if mode == "values":
+            self.state = chunk
+            return
+        self.steps += 1
+        for node, update in chunk.items():
+            yield node, update
+
+    def _events(self, mode: str, chunk: Any) -> Iterator[AgentEvent]:
+        if mode == "values":
+            self.state = chunk
+        elif mode == "updates":
+            # 模型节点结束时工具调用的参数已经完整
+            self.steps += 1
+            for update in chunk.values():
+                for message in _update_messages(update):
+                    if isinstance(message, AIMessage):
+                        for call in message.tool_calls:
+                            yield AgentEvent("tool_call", name=call["name"], args=call["args"])
+        else:
+            message, _ = chunk
+            if isinstance(message, ToolMessage):
+                yield AgentEvent("tool_result", text=message.text, name=message.name)
+            elif isinstance(message, AIMessage):
+                usage = message.usage_metadata
+                if usage:
+                    self._usage_tokens += usage.get("output_tokens", 0)
+                text = message.text
+                if text:
+                    if self.ttft is None:
+                        self.ttft = time.perf_counter() - self._started_at
+                    self._token_chunks += 1
+                    yield AgentEvent("token", text=text)
+
+
+def _update_messages(update: Any) -> List[Any]:
+    """节点更新中的消息；中间件节点可能没有更新，并行分派的节点可能返回多个更新"""
+    if isinstance(update, dict):
+        return list(update.get("messages") or [])
+    if isinstance(update, (list, tuple)):
+        return [message for item in update for message in _update_messages(item)]
+    return []
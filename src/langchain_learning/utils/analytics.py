@@ -0,0 +1,490 @@
+"""
+流式数据分析
+
+把 JSON 数组、JSON Lines、CSV 或“名称:数值”形式的文本逐条解析为记录，不构建完整的对象树:
+JSON 用 JSONDecoder.raw_decode 从缓冲区中一次解码一个元素，CSV 用 csv.reader 逐行读取。
+“名称:数值”文本中每个名称是一列，名称重复出现时开始下一条记录，不同名称的数值不会混在一起统计。
+数值列按块写入 float64 数组，聚合、分位数和排序都由 NumPy 完成；每块合并一次前 k 名，
+只为候选行保留标签，分类列的取值计数有上限，因此内存占用只与数值列大小成正比。
+"""
+
+import csv
+import io
+import itertools
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+Source = Union[str, Iterable[str]]
+
+# 每个分类列最多统计的不同取值数，超出后新的取值计入“其他”
+_MAX_CATEGORIES = 10_000
+
+# 检测格式时最多读取的字符数
+_SNIFF_CHARS = 4096
+
+_WHITESPACE = re.compile(r"\s*")
+# 数值可以带千位分隔符，例如 1,299 或 12,345.6
+_PAIR = re.compile(r"([^\s:：,，;；]+)\s*[:：]\s*(-?(?:\d{1,3}(?:,\d{3})+(?!\d)|\d+)(?:\.\d+)?)")
+_SEPARATOR = re.compile(r"\s*([,\]])\s*")
+_CSV_DELIMITERS = ",\t;|"
+_NUMERIC_KINDS = {int, float, type(None)}
+_STR_KIND = {str}
+
+
+class _TextBuffer:
+    """按需从文本块中读取的缓冲区，已解码的部分在下次读取时丢弃"""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符，读完时返回空字符串"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()  # type: ignore[union-attr]
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        """解码下一个 JSON 值；值恰好在缓冲区末尾结束时（例如数字）先读入更多文本再确认"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()  # type: ignore[union-attr]
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def _json_records(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """逐条产出顶层数组的元素，或连续排列的顶层 JSON 值（单个对象或 JSON Lines）"""
+    decoder = json.JSONDecoder()
+    buffer = _TextBuffer(chunks)
+    char = buffer.peek()
+    if char != "[":
+        while char:
+            value = buffer.decode(decoder)
+            if type(value) is dict and _is_columnar(value):
+                # 按列组织的对象: {"产品": [...], "销量": [...]}
+                yield from (dict(zip(value, row)) for row in zip(*value.values()))
+            else:
+                yield _as_record(value)
+            char = buffer.peek()
+        return
+
+    buffer.pos += 1
+    if buffer.peek() == "]":
+        return
+    raw_decode = decoder.raw_decode
+    while True:
+        # 快速路径：元素完整地位于缓冲区中，不在开头有空白
+        text = buffer.text
+        try:
+            value, end = raw_decode(text, buffer.pos)
+        except json.JSONDecodeError:
+            end = -1
+        if end < 0 or (end == len(text) and not buffer.eof):
+            value = buffer.decode(decoder)
+        else:
+            buffer.pos = end
+        yield value if type(value) is dict else _as_record(value)
+        match = _SEPARATOR.match(buffer.text, buffer.pos)
+        if match is not None:
+            char = match.group(1)
+            buffer.pos = match.end()
+        else:
+            char = buffer.peek()
+            buffer.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError(f"JSON 数组中出现意外的字符: {char!r}")
+
+
+def _as_record(value: Any) -> Dict[str, Any]:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, list):
+        return {str(i): item for i, item in enumerate(value)}
+    return {"value": value}
+
+
+def _is_columnar(value: Dict[str, Any]) -> bool:
+    columns = list(value.values())
+    return bool(columns) and all(type(c) is list for c in columns) and len({len(c) for c in columns}) == 1
+
+
+def _expand(name: str, values: List[Any]) -> Iterator[Tuple[str, List[Any]]]:
+    """把一列中嵌套的对象展开为以 "." 连接的子列"""
+    if dict not in set(map(type, values)):
+        yield name, values
+        return
+    nested = (value for value in values if type(value) is dict)
+    for key in dict.fromkeys(itertools.chain.from_iterable(nested)):
+        yield from _expand(f"{name}.{key}", [value.get(key) if type(value) is dict else None for value in values])
+
+
+def _csv_cell(cell: str) -> Any:
+    cell = cell.strip()
+    if not cell:
+        return None
+    for convert in (int, float):
+        try:
+            return convert(cell)
+        except ValueError:
+            pass
+    return cell
+
+
+def _csv_records(lines: Iterable[str], delimiter: str) -> Iterator[Dict[str, Any]]:
+    reader = csv.reader(lines, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return
+    names = [name.strip() or f"列{i + 1}" for i, name in enumerate(header)]
+    for row in reader:
+        if row:
+            yield {name: _csv_cell(cell) for name, cell in zip(names, row)}
+
+
+def _csv_delimiter(sample: str) -> Optional[str]:
+    """前两行的分隔符数量一致时视为 CSV"""
+    lines = [line for line in sample.splitlines() if line.strip()][:2]
+    if len(lines) < 2:
+        return None
+    for delimiter in _CSV_DELIMITERS:
+        counts = [len(next(csv.reader([line], delimiter=delimiter))) for line in lines]
+        if counts[0] > 1 and counts[0] == counts[1]:
+            return delimiter
+    return None
+
+
+def detect_format(sample: str) -> str:
+    """
+    根据开头的文本判断数据格式。
+
+    Args:
+        sample: 数据开头的一段文本
+
+    Returns:
+        json（数组或单个对象）、jsonl、csv、pairs（“名称:数值”）或 text
+    """
+    stripped = sample.lstrip()
+    if stripped.startswith("["):
+        return "json"
+    if stripped.startswith("{"):
+        first_line, _, rest = stripped.partition("\n")
+        return "jsonl" if rest.lstrip().startswith("{") else "json"
+    pairs = len(_PAIR.findall(stripped[:_SNIFF_CHARS])) >= 2
+    # 每行若干“名称: 数值”、以逗号分隔的文本看起来也像 CSV，但 CSV 的表头中不会出现“名称: 数值”
+    if pairs and _PAIR.search(stripped.partition("\n")[0]):
+        return "pairs"
+    if _csv_delimiter(stripped):
+        return "csv"
+    return "pairs" if pairs else "text"
+
+
+def iter_records(source: Source, format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐条解析记录。
+
+    Args:
+        source: 完整的文本，或按顺序产出文本块的可迭代对象（CSV 要求按行产出，例如打开的文件）
+        format: 数据格式，None 表示自动检测
+
+    Returns:
+        记录的迭代器，每条记录是列名到值的映射
+
+    Raises:
+        ValueError: 格式不支持或 JSON 格式错误
+    """
+    chunks, sample = _sample(source)
+    format = format or detect_format(sample)
+    if format in ("json", "jsonl"):
+        return _json_records(chunks)
+    if format == "csv":
+        lines = io.StringIO(source) if isinstance(source, str) else chunks
+        return _csv_records(lines, _csv_delimiter(sample) or ",")
+    if format == "pairs":
+        text = source if isinstance(source, str) else "".join(chunks)
+        return _pair_records(text)
+    raise ValueError(f"不支持的数据格式: {format}")
+
+
+def _pair_records(text: str) -> Iterator[Dict[str, Any]]:
+    """“名称:数值”文本中每个名称一列，名称在当前记录中已经出现过时开始下一条记录"""
+    record: Dict[str, Any] = {}
+    for name, value in _PAIR.findall(text):
+        if name in record:
+            yield record
+            record = {}
+        record[name] = _csv_cell(value.replace(",", ""))
+    if record:
+        yield record
+
+
+def _sample(source: Source) -> Tuple[Iterable[str], str]:
+    """读取用于检测格式的开头部分，返回仍然包含这部分文本的块序列"""
+    if isinstance(source, str):
+        return [source], source[:_SNIFF_CHARS]
+    iterator = iter(source)
+    head: List[str] = []
+    size = 0
+    for chunk in iterator:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= _SNIFF_CHARS:
+            break
+    return itertools.chain(head, iterator), "".join(head)[:_SNIFF_CHARS]
+
+
+class _Column:
+    """单列的累加器：数值分块保存，前 k 名逐块合并，分类取值有上限地计数"""
+
+    def __init__(self, top_k: int, missing: int = 0):
+        self.top_k = top_k
+        self.chunks: List[np.ndarray] = []
+        self.top_values = np.empty(0)
+        self.top_labels: List[Any] = []
+        self.categories: Counter = Counter()
+        self.other = 0
+        self.texts = 0
+        self.missing = missing
+
+    def add_batch(self, values: List[Any], labels: List[Any]) -> None:
+        """加入一批记录中这一列的值，labels 是每条记录的标签"""
+        kinds = set(map(type, values))
+        if kinds <= _NUMERIC_KINDS:
+            # 常见情况：整列都是数字（可能有缺失），由 NumPy 一次转换
+            chunk = np.array(values, dtype=np.float64)
+            if type(None) in kinds:
+                present = np.fromiter((v is not None for v in values), dtype=bool, count=len(values))
+                self.missing += len(values) - int(present.sum())
+                index = np.flatnonzero(present)
+                chunk = chunk[index]
+                labels = [labels[i] for i in index]
+            self._add_numbers(chunk, labels)
+            return
+        if kinds == _STR_KIND and len(self.categories) + len(values) <= _MAX_CATEGORIES:
+            self.categories.update(values)
+            self.texts += len(values)
+            return
+
+        numbers: List[float] = []
+        number_labels: List[Any] = []
+        for value, label in zip(values, labels):
+            kind = type(value)
+            if kind is int or kind is float:
+                numbers.append(value)
+                number_labels.append(label)
+            elif value is None or value == "":
+                self.missing += 1
+            else:
+                self.texts += 1
+                key = value if kind is str or kind is bool else json.dumps(value, ensure_ascii=False)
+                if key in self.categories or len(self.categories) < _MAX_CATEGORIES:
+                    self.categories[key] += 1
+                else:
+                    self.other += 1
+        if numbers:
+            self._add_numbers(np.array(numbers, dtype=np.float64), number_labels)
+
+    def _add_numbers(self, chunk: np.ndarray, labels: List[Any]) -> None:
+        if not len(chunk):
+            return
+        self.chunks.append(chunk)
+        # 只在本块的前 k 名和之前的前 k 名之间比较
+        if len(chunk) > self.top_k:
+            keep = np.argpartition(-chunk, self.top_k - 1)[:self.top_k]
+            chunk, labels = chunk[keep], [labels[i] for i in keep]
+        candidates = np.concatenate([self.top_values, chunk])
+        candidate_labels = self.top_labels + list(labels)
+        if len(candidates) > self.top_k:
+            keep = np.argpartition(-candidates, self.top_k - 1)[:self.top_k]
+            candidates, candidate_labels = candidates[keep], [candidate_labels[i] for i in keep]
+        self.top_values, self.top_labels = candidates, candidate_labels
+
+    @property
+    def count(self) -> int:
+        return sum(len(chunk) for chunk in self.chunks)
+
+    def numeric_stats(self) -> Dict[str, Any]:
+        values = np.concatenate(self.chunks)
+        finite = values[np.isfinite(values)]
+        quartiles = np.percentile(finite, [25, 50, 75]) if len(finite) else [np.nan] * 3
+        order = np.argsort(-self.top_values, kind="stable")
+        return {
+            "count": int(len(values)),
+            "missing": self.missing + self.texts,
+            "sum": float(values.sum()),
+            "mean": float(values.mean()),
+            "std": float(values.std()),
+            "min": float(values.min()),
+            "p25": float(quartiles[0]),
+            "median": float(quartiles[1]),
+            "p75": float(quartiles[2]),
+            "max": float(values.max()),
+            "top": [(self.top_labels[i], float(self.top_values[i])) for i in order],
+        }
+
+    def category_stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.texts,
+            "missing": self.missing + self.count,
+            "distinct": len(self.categories),
+            "truncated": self.other > 0,
+            "top": self.categories.most_common(self.top_k),
+        }
+
+
+@dataclass
+class DataSummary:
+    """
+    数据集的统计摘要。
+
+    Attributes:
+        format: 数据格式
+        rows: 记录数
+        numeric: 数值列名称到统计量的映射（计数、缺失、总和、均值、标准差、最小值、四分位数、最大值、前 k 名）
+        categorical: 分类列名称到统计量的映射（计数、缺失、不同取值数、最常见的取值）
+        preview: 前几条记录
+    """
+
+    format: str
+    rows: int
+    numeric: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    categorical: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    preview: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": self.format,
+            "rows": self.rows,
+            "numeric": self.numeric,
+            "categorical": self.categorical,
+            "preview": self.preview,
+        }
+
+    def summary(self, max_preview_chars: int = 200) -> str:
+        """紧凑的文本摘要，供模型在此基础上撰写解释"""
+        lines = [f"数据分析结果: {self.format} 格式, {self.rows} 行, {len(self.numeric) + len(self.categorical)} 列"]
+        if self.numeric:
+            lines.append("数值列:")
+        for name, stats in self.numeric.items():
+            if stats["count"] == 1 and not stats["missing"]:
+                lines.append(f"- {name}: {_fmt(stats['sum'])}")
+                continue
+            line = (
+                f"- {name}: 计数 {stats['count']}, 总和 {_fmt(stats['sum'])}, 均值 {_fmt(stats['mean'])}, "
+                f"标准差 {_fmt(stats['std'])}, 最小 {_fmt(stats['min'])}, 中位数 {_fmt(stats['median'])}, "
+                f"最大 {_fmt(stats['max'])}"
+            )
+            if stats["missing"]:
+                line += f", 缺失 {stats['missing']}"
+            ranked = ", ".join(f"{label}={_fmt(value)}" if label is not None else _fmt(value) for label, value in stats["top"])
+            lines.append(f"{line}; 最高: {ranked}")
+        if self.categorical:
+            lines.append("分类列:")
+        for name, stats in self.categorical.items():
+            distinct = f"{stats['distinct']}+" if stats["truncated"] else str(stats["distinct"])
+            common = ", ".join(f"{value}({count})" for value, count in stats["top"])
+            lines.append(f"- {name}: {distinct} 个取值; 最多: {common}")
+        if self.preview:
+            preview = json.dumps(self.preview, ensure_ascii=False)
+            if len(preview) > max_preview_chars:
+                preview = preview[:max_preview_chars] + "..."
+            lines.append(f"预览: {preview}")
+        return "\n".join(lines)
+
+
+def _fmt(value: float) -> str:
+    if np.isfinite(value) and value == int(value):
+        return str(int(value))
+    return f"{value:.6g}"
+
+
+def analyze_data(
+    source: Source,
+    format: Optional[str] = None,
+    top_k: int = 5,
+    chunk_size: int = 8192,
+    preview_rows: int = 3,
+) -> DataSummary:
+    """
+    流式解析数据并计算各列的统计量。
+
+    Args:
+        source: 完整的文本，或按顺序产出文本块的可迭代对象
+        format: 数据格式，None 表示自动检测
+        top_k: 每个数值列保留的最大值个数，以及每个分类列列出的最常见取值个数
+        chunk_size: 数值列每次写入 NumPy 数组的行数
+        preview_rows: 摘要中保留的前几条记录
+
+    Returns:
+        统计摘要。数值多于其他取值的列视为数值列，第一个文本取值所在的列作为前 k 名的标签
+
+    Raises:
+        ValueError: 格式不支持或 JSON 格式错误
+    """
+    chunks, sample = _sample(source)
+    format = format or detect_format(sample)
+    records = iter_records(source if isinstance(source, str) else chunks, format)
+
+    columns: Dict[str, _Column] = {}
+    label_column: Optional[str] = None
+    preview: List[Dict[str, Any]] = []
+    rows = 0
+    while True:
+        # 每次取 chunk_size 条记录，按列处理
+        batch = list(itertools.islice(records, chunk_size))
+        if not batch:
+            break
+        if not rows:
+            preview = batch[:preview_rows]
+            label_column = next((k for k, v in batch[0].items() if isinstance(v, str)), None)
+        if label_column is not None:
+            labels = [record.get(label_column) for record in batch]
+        else:
+            labels = list(range(rows + 1, rows + len(batch) + 1))
+        present = set()
+        for key in dict.fromkeys(itertools.chain.from_iterable(batch)):
+            for name, values in _expand(key, [record.get(key) for record in batch]):
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = _Column(top_k, missing=rows)  # 之前的记录中没有这一列
+                column.add_batch(values, labels)
+                present.add(name)
+        for name, column in columns.items():
+            if name not in present:
+                column.missing += len(batch)
+        rows += len(batch)
+
+    summary = DataSummary(format=format, rows=rows, preview=preview)
+    for name, column in columns.items():
+        if column.chunks and column.count >= column.texts:
+            summary.numeric[name] = column.numeric_stats()
+        elif column.texts:
+            summary.categorical[name] = column.category_stats()
+    return summary
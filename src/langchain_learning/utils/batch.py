@@ -0,0 +1,232 @@
+"""
+JSONL 提示词的批量执行
+
+输入文件每行一个 JSON：对象中的 "prompt"（或 "input"）字段为提示词，"id" 为行标识（缺省为行号），
+也可以直接是一个字符串。固定数量的协程从输入中依次取行执行，每完成一行就向输出文件追加一行结果并刷新，
+输出文件同时就是进度检查点：再次运行时跳过已经成功的行，失败的行会重新执行（以后写入的结果为准）。
+
+    report = run_batch(pipeline, "prompts.jsonl", "results.jsonl", concurrency=8)
+    print(report.summary())
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from langchain_learning.utils.metrics import summarize
+
+PathLike = Union[str, Path]
+
+
+@dataclass
+class BatchReport:
+    """
+    一次批量执行的统计。
+
+    Attributes:
+        total: 输入文件的行数
+        skipped: 之前已经成功、本次跳过的行数
+        succeeded: 本次成功的行数
+        failed: 本次失败的行数
+        elapsed: 总耗时（秒）
+        latencies: 本次成功的每一行的耗时（秒）
+    """
+
+    total: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def processed(self) -> int:
+        """本次执行的行数"""
+        return self.succeeded + self.failed
+
+    @property
+    def rows_per_second(self) -> float:
+        """本次执行的吞吐"""
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def latency(self) -> Dict[str, float]:
+        """成功行耗时的 count、mean、min、max、p50、p95"""
+        return summarize(self.latencies)
+
+    def summary(self) -> str:
+        """格式化的统计信息"""
+        latency = self.latency()
+        latency_text = f"p50 {latency['p50']:.2f}s / p95 {latency['p95']:.2f}s" if self.latencies else "-"
+        return (
+            f"执行 {self.processed} 行 (成功 {self.succeeded}, 失败 {self.failed}, 跳过 {self.skipped}), "
+            f"耗时 {self.elapsed:.2f}s, {self.rows_per_second:.1f} 行/s, 延迟 {latency_text}"
+        )
+
+
+def read_prompts(path: PathLike) -> Iterator[Tuple[str, str]]:
+    """
+    逐行读取提示词文件，跳过空行。
+
+    Args:
+        path: 输入 JSONL 文件
+
+    Returns:
+        (行标识, 提示词) 的迭代器
+
+    Raises:
+        ValueError: 某一行不是合法的 JSON，或者没有提示词
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"第 {line_no} 行不是合法的 JSON: {e}") from e
+            if isinstance(row, str):
+                yield str(line_no), row
+                continue
+            prompt = row.get("prompt", row.get("input")) if isinstance(row, dict) else None
+            if not isinstance(prompt, str):
+                raise ValueError(f"第 {line_no} 行缺少 prompt 字段")
+            yield str(row.get("id", line_no)), prompt
+
+
+def completed_ids(path: PathLike) -> Set[str]:
+    """
+    读取输出文件中已经成功的行标识。
+
+    上次运行中断时最后一行可能只写了一半，这里把它截掉，之后追加的结果仍然是完整的 JSONL。
+
+    Args:
+        path: 输出 JSONL 文件
+
+    Returns:
+        已经成功的行标识，文件不存在时为空集合
+    """
+    path = Path(path)
+    if not path.exists():
+        return set()
+    data = path.read_bytes()
+    end = data.rfind(b"\n") + 1
+    if end < len(data):
+        with open(path, "r+b") as f:
+            f.truncate(end)
+
+    status: Dict[str, bool] = {}
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict) and "id" in record:
+            status[str(record["id"])] = "error" not in record
+    return {row_id for row_id, ok in status.items() if ok}
+
+
+async def arun_batch(
+    func: Callable[[str], Awaitable[Any]],
+    input_path: PathLike,
+    output_path: PathLike,
+    concurrency: int = 8,
+    resume: bool = True,
+    progress: Optional[Callable[[BatchReport], None]] = None,
+    progress_interval: float = 2.0,
+) -> BatchReport:
+    """
+    并发执行输入文件中的所有提示词，结果按完成顺序追加到输出文件。
+
+    Args:
+        func: 对单个提示词执行流水线的异步函数，返回值需要能序列化为 JSON
+        input_path: 输入 JSONL 文件
+        output_path: 输出 JSONL 文件，每行为 {"id", "output", "latency"} 或 {"id", "error", "latency"}
+        concurrency: 同时执行的最大行数
+        resume: 是否跳过输出文件中已经成功的行；False 时清空输出文件重新执行
+        progress: 进度回调，最多每 progress_interval 秒调用一次
+        progress_interval: 进度回调的最小间隔（秒）
+
+    Returns:
+        执行统计
+
+    Raises:
+        ValueError: concurrency 小于 1，或者输入文件格式错误
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency 必须大于 0")
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    done = completed_ids(output_path) if resume else set()
+
+    report = BatchReport()
+    start = time.perf_counter()
+    last_progress = start
+
+    def pending() -> Iterator[Tuple[str, str]]:
+        for row_id, prompt in read_prompts(input_path):
+            report.total += 1
+            if row_id in done:
+                report.skipped += 1
+                continue
+            yield row_id, prompt
+
+    rows = pending()
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+
+        async def worker() -> None:
+            nonlocal last_progress
+            # 所有协程共享同一个迭代器，取行是同步操作，不会重复执行同一行
+            for row_id, prompt in rows:
+                row_start = time.perf_counter()
+                record: Dict[str, Any] = {"id": row_id}
+                try:
+                    record["output"] = await func(prompt)
+                except Exception as e:  # 单行失败不影响其他行
+                    record["error"] = f"{type(e).__name__}: {e}"
+                latency = time.perf_counter() - row_start
+                record["latency"] = round(latency, 4)
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+
+                if "error" in record:
+                    report.failed += 1
+                else:
+                    report.succeeded += 1
+                    report.latencies.append(latency)
+                now = time.perf_counter()
+                if progress is not None and now - last_progress >= progress_interval:
+                    last_progress = now
+                    report.elapsed = now - start
+                    progress(report)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # 输入格式错误或被取消时，先停下其他协程再关闭输出文件
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def run_batch(
+    func: Callable[[str], Awaitable[Any]],
+    input_path: PathLike,
+    output_path: PathLike,
+    concurrency: int = 8,
+    resume: bool = True,
+    progress: Optional[Callable[[BatchReport], None]] = None,
+    progress_interval: float = 2.0,
+) -> BatchReport:
+    """arun_batch 的同步版本，在新的事件循环中执行"""
+    return asyncio.run(
+        arun_batch(func, input_path, output_path, concurrency, resume, progress, progress_interval)
+    )
@@ -0,0 +1,380 @@
+"""
+基于 AST 的安全计算器
+
+表达式只解析一次：ast.parse 之后校验节点类型（只允许数字常量、+ - * / // % ** 和正负号），
+再把常量提取为参数，得到与具体数值无关的表达式“模板”。模板编译成闭包并缓存，
+按文本缓存的编译结果只保存模板和常量，因此结构相同的表达式共享同一份编译结果。
+
+编译时限制语法树的深度和节点数（编译和求值都是递归的，过深的表达式会耗尽调用栈），
+求值时限制整数位数、指数大小和耗时，9**9**9 这类输入会立即报错而不是卡住进程。
+批量求值把结构相同的表达式分为一组，用 NumPy 对整列常量一次完成计算；
+浮点运算无法保证与 Python 结果完全一致的行（大整数、除零、溢出等）回退到逐个精确求值。
+"""
+
+import ast
+import functools
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+Number = Union[int, float]
+
+# 表达式的中间表示：("const", 下标) | ("unary", 运算符, 子节点) | ("binary", 运算符, 左, 右)
+Program = Tuple[Any, ...]
+
+_BINARY_OPS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.FloorDiv: "//",
+    ast.Mod: "%",
+    ast.Pow: "**",
+}
+_UNARY_OPS = {ast.UAdd: "+", ast.USub: "-"}
+
+# float64 能精确表示的最大整数
+_EXACT_INT = 2 ** 53
+
+# 结构相同的表达式达到该数量时才向量化求值
+_MIN_VECTOR_GROUP = 32
+
+# 语法树的最大深度和节点数；编译和求值每层各占几个栈帧，深度需要远低于解释器的递归上限
+_MAX_DEPTH = 200
+_MAX_NODES = 2000
+
+
+class CalculatorError(ValueError):
+    """表达式不合法、超出限制或无法求值"""
+
+
+@dataclass(frozen=True)
+class CompiledExpression:
+    """
+    编译后的表达式。
+
+    Attributes:
+        program: 与常量数值无关的表达式模板
+        constants: 按出现顺序排列的常量
+    """
+
+    program: Program
+    constants: Tuple[Number, ...]
+
+
+@functools.lru_cache(maxsize=65536)
+def compile_expression(text: str) -> CompiledExpression:
+    """
+    解析并校验表达式，按文本缓存。
+
+    Args:
+        text: 算术表达式，例如 "(1 + 2) * 3 ** 2"
+
+    Returns:
+        编译后的表达式
+
+    Raises:
+        CalculatorError: 语法错误、包含不允许的语法（变量、函数调用、属性等）或嵌套过深
+    """
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except (SyntaxError, ValueError, RecursionError, MemoryError) as e:
+        raise CalculatorError(f"无法解析表达式: {text!r}") from e
+    _check_shape(tree.body)
+    constants: List[Number] = []
+    try:
+        program = _lower(tree.body, constants)
+    except RecursionError as e:
+        raise CalculatorError("表达式嵌套过深") from e
+    return CompiledExpression(program, tuple(constants))
+
+
+def _check_shape(root: ast.AST) -> None:
+    """不递归地检查语法树的深度和节点数，超出上限时在编译和求值之前报错"""
+    stack = [(root, 1)]
+    nodes = 0
+    while stack:
+        node, depth = stack.pop()
+        nodes += 1
+        if depth > _MAX_DEPTH:
+            raise CalculatorError(f"表达式嵌套超过 {_MAX_DEPTH} 层")
+        if nodes > _MAX_NODES:
+            raise CalculatorError(f"表达式超过 {_MAX_NODES} 个节点")
+        if isinstance(node, ast.BinOp):
+            stack.append((node.left, depth + 1))
+            stack.append((node.right, depth + 1))
+        elif isinstance(node, ast.UnaryOp):
+            stack.append((node.operand, depth + 1))
+
+
+def _lower(node: ast.AST, constants: List[Number]) -> Program:
+    """把 AST 转换为模板，常量替换为参数下标"""
+    node_type = type(node)
+    if node_type is ast.BinOp:
+        op = _BINARY_OPS.get(type(node.op))  # type: ignore[attr-defined]
+        if op is not None:
+            left = _lower(node.left, constants)  # type: ignore[attr-defined]
+            return ("binary", op, left, _lower(node.right, constants))  # type: ignore[attr-defined]
+    elif node_type is ast.Constant:
+        value = node.value  # type: ignore[attr-defined]
+        if type(value) not in (int, float):
+            raise CalculatorError(f"不支持的常量: {value!r}")
+        constants.append(value)
+        return ("const", len(constants) - 1)
+    elif node_type is ast.UnaryOp:
+        op = _UNARY_OPS.get(type(node.op))  # type: ignore[attr-defined]
+        if op is not None:
+            return ("unary", op, _lower(node.operand, constants))  # type: ignore[attr-defined]
+    raise CalculatorError(f"不支持的语法: {node_type.__name__}")
+
+
+@dataclass(frozen=True)
+class _Limits:
+    max_int_bits: int
+    max_exponent: float
+    deadline: float
+
+
+ScalarFn = Callable[[Tuple[Number, ...], _Limits], Number]
+
+
+def _check_deadline(limits: _Limits) -> None:
+    if time.perf_counter() > limits.deadline:
+        raise CalculatorError("计算超时")
+
+
+def _check_size(value: Number, limits: _Limits) -> Number:
+    if isinstance(value, int) and value.bit_length() > limits.max_int_bits:
+        raise CalculatorError(f"结果超过 {limits.max_int_bits} 位")
+    if isinstance(value, complex):
+        raise CalculatorError("结果是复数")
+    return value
+
+
+def _div(a: Number, b: Number, op: Callable[[Number, Number], Number]) -> Number:
+    if b == 0:
+        raise CalculatorError("除数不能为零")
+    return op(a, b)
+
+
+def _pow(a: Number, b: Number, limits: _Limits) -> Number:
+    if abs(b) > limits.max_exponent:
+        raise CalculatorError(f"指数 {b} 超过上限 {limits.max_exponent:g}")
+    if a == 0 and b < 0:
+        raise CalculatorError("0 不能取负数次幂")
+    # 整数幂的结果位数约为 底数位数 × 指数，先估算再计算，避免构造巨大的整数
+    if isinstance(a, int) and isinstance(b, int) and b > 0 and abs(a) > 1:
+        if (abs(a).bit_length() - 1) * b > limits.max_int_bits:
+            raise CalculatorError(f"结果超过 {limits.max_int_bits} 位")
+    return a ** b
+
+
+_SCALAR_OPS: Dict[str, Callable[[Number, Number, _Limits], Number]] = {
+    "+": lambda a, b, limits: a + b,
+    "-": lambda a, b, limits: a - b,
+    "*": lambda a, b, limits: a * b,
+    "/": lambda a, b, limits: _div(a, b, lambda x, y: x / y),
+    "//": lambda a, b, limits: _div(a, b, lambda x, y: x // y),
+    "%": lambda a, b, limits: _div(a, b, lambda x, y: x % y),
+    "**": _pow,
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def _scalar_fn(program: Program) -> ScalarFn:
+    """把模板编译成闭包，同一个模板只编译一次"""
+    kind = program[0]
+    if kind == "const":
+        index = program[1]
+        return lambda params, limits: params[index]
+    if kind == "unary":
+        child = _scalar_fn(program[2])
+        if program[1] == "-":
+            return lambda params, limits: -child(params, limits)
+        return child
+    op = _SCALAR_OPS[program[1]]
+    left, right = _scalar_fn(program[2]), _scalar_fn(program[3])
+
+    def binary(params: Tuple[Number, ...], limits: _Limits) -> Number:
+        a = left(params, limits)
+        b = right(params, limits)
+        _check_deadline(limits)
+        try:
+            return _check_size(op(a, b, limits), limits)
+        except (OverflowError, ZeroDivisionError) as e:
+            raise CalculatorError(f"计算溢出: {e}") from e
+
+    return binary
+
+
+def _vector_eval(program: Program, columns: List[np.ndarray], int_columns: List[np.ndarray], limits: _Limits):
+    """
+    对一组结构相同的表达式做 NumPy 向量化求值。
+
+    Returns:
+        (float64 结果, 结果是否为整数, 该行结果是否与 Python 精确求值一致)
+    """
+    kind = program[0]
+    if kind == "const":
+        values = columns[program[1]]
+        is_int = int_columns[program[1]]
+        return values, is_int, ~is_int | (np.abs(values) < _EXACT_INT)
+    if kind == "unary":
+        values, is_int, ok = _vector_eval(program[2], columns, int_columns, limits)
+        return (-values if program[1] == "-" else values), is_int, ok
+
+    op = program[1]
+    a, a_int, a_ok = _vector_eval(program[2], columns, int_columns, limits)
+    b, b_int, b_ok = _vector_eval(program[3], columns, int_columns, limits)
+    _check_deadline(limits)
+    ok = a_ok & b_ok
+    is_int = a_int & b_int
+    with np.errstate(all="ignore"):
+        if op in ("+", "-", "*"):
+            values = a + b if op == "+" else a - b if op == "-" else a * b
+        elif op in ("/", "//", "%"):
+            bad = b == 0
+            safe_b = np.where(bad, 1.0, b)
+            values = a / safe_b if op == "/" else np.floor_divide(a, safe_b) if op == "//" else np.mod(a, safe_b)
+            ok &= ~bad
+            if op == "/":
+                is_int = np.zeros_like(is_int)
+        else:
+            # np.power 与 C 的 pow 在最后一位上可能不同，只向量化整数的非负整数次幂：
+            # 先用浮点估计结果大小，再对不会溢出的行用 int64 精确计算；其余行逐个求值
+            is_int &= b >= 0
+            small = is_int & (np.abs(b) <= 64) & (np.abs(np.power(a, np.where(is_int, b, 0.0))) < _EXACT_INT)
+            exact = np.power(np.where(small, a, 0).astype(np.int64), np.where(small, b, 0).astype(np.int64))
+            values = exact.astype(np.float64)
+            ok &= small
+    ok &= np.isfinite(values) & (~is_int | (np.abs(values) < _EXACT_INT))
+    return values, is_int, ok
+
+
+class SafeCalculator:
+    """
+    带资源限制的算术表达式计算器。
+
+    Args:
+        max_length: 表达式的最大字符数
+        max_int_bits: 整数结果（包括中间结果）的最大位数
+        max_exponent: 幂运算指数的最大绝对值
+        time_budget: 单个表达式的求值时间上限（秒）
+    """
+
+    def __init__(
+        self,
+        max_length: int = 1000,
+        max_int_bits: int = 4096,
+        max_exponent: float = 10_000,
+        time_budget: float = 0.05,
+    ):
+        self.max_length = max_length
+        self.max_int_bits = max_int_bits
+        self.max_exponent = max_exponent
+        self.time_budget = time_budget
+
+    def _limits(self) -> _Limits:
+        return _Limits(self.max_int_bits, self.max_exponent, time.perf_counter() + self.time_budget)
+
+    def compile(self, text: str) -> CompiledExpression:
+        """
+        检查长度后编译表达式（结果按文本缓存）。
+
+        Raises:
+            CalculatorError: 表达式过长或不合法
+        """
+        if len(text) > self.max_length:
+            raise CalculatorError(f"表达式超过 {self.max_length} 个字符")
+        return compile_expression(text)
+
+    def evaluate(self, text: str) -> Number:
+        """
+        计算一个表达式。
+
+        Args:
+            text: 算术表达式
+
+        Returns:
+            计算结果，整数运算保持为 int
+
+        Raises:
+            CalculatorError: 表达式不合法、超出限制、除零或超时
+        """
+        compiled = self.compile(text)
+        try:
+            return _scalar_fn(compiled.program)(compiled.constants, self._limits())
+        except RecursionError as e:
+            raise CalculatorError("表达式嵌套过深") from e
+
+    def evaluate_batch(self, texts: Sequence[str]) -> List[Union[Number, CalculatorError]]:
+        """
+        批量计算表达式，结构相同的表达式用 NumPy 一次完成。
+
+        Args:
+            texts: 算术表达式
+
+        Returns:
+            与 texts 一一对应的结果，出错的表达式对应 CalculatorError 实例
+        """
+        results: List[Union[Number, CalculatorError]] = [CalculatorError("未计算")] * len(texts)
+        groups: Dict[Program, List[Tuple[int, CompiledExpression]]] = defaultdict(list)
+        for i, text in enumerate(texts):
+            try:
+                compiled = self.compile(text)
+            except CalculatorError as e:
+                results[i] = e
+                continue
+            groups[compiled.program].append((i, compiled))
+
+        for program, members in groups.items():
+            fallback = members
+            # 成员太少时 NumPy 的固定开销超过收益，逐个求值更快
+            if len(members) >= _MIN_VECTOR_GROUP and program[0] != "const":
+                fallback = self._evaluate_group(program, members, results)
+            for i, compiled in fallback:
+                try:
+                    results[i] = _scalar_fn(program)(compiled.constants, self._limits())
+                except CalculatorError as e:
+                    results[i] = e
+                except RecursionError:
+                    results[i] = CalculatorError("表达式嵌套过深")
+        return results
+
+    def _evaluate_group(
+        self,
+        program: Program,
+        members: List[Tuple[int, CompiledExpression]],
+        results: List[Union[Number, CalculatorError]],
+    ) -> List[Tuple[int, CompiledExpression]]:
+        """向量化计算一组结构相同的表达式，返回需要逐个精确求值的成员"""
+        width = len(members[0][1].constants)
+        raw = [[compiled.constants[j] for _, compiled in members] for j in range(width)]
+        int_columns = [np.array([isinstance(v, int) for v in column]) for column in raw]
+        # 超出 float64 范围的整数常量先替换为 0，这些行最终会回退
+        too_big = np.zeros(len(members), dtype=bool)
+        columns = []
+        for column in raw:
+            big = np.array([isinstance(v, int) and abs(v) >= _EXACT_INT for v in column])
+            too_big |= big
+            columns.append(np.array([0.0 if b else float(v) for v, b in zip(column, big)], dtype=np.float64))
+
+        try:
+            values, is_int, ok = _vector_eval(program, columns, int_columns, self._limits())
+        except (CalculatorError, RecursionError):
+            return members
+        ok &= ~too_big
+
+        fallback = []
+        for row, (i, compiled) in enumerate(members):
+            if not ok[row]:
+                fallback.append((i, compiled))
+            elif is_int[row]:
+                results[i] = int(values[row])
+            else:
+                results[i] = float(values[row])
+        return fallback
+
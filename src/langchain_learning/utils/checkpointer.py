@@ -0,0 +1,536 @@
+"""
+基于 SQLite 的增量检查点存储
+
+作为 create_agent 的 checkpointer，按 thread_id 保存智能体的状态，进程重启后可以继续同一个会话:
+
+- 每个检查点只写入本步骤有新版本的通道（与 LangGraph 的检查点协议一致）
+- 列表类型的通道（messages）写入增量：新列表以上一次写入的列表为前缀时，只保存新增的消息和前一个版本号，
+  读取时沿版本链拼接；增量链达到一定长度后写入一次完整快照，限制读取时需要拼接的行数
+- 状态在第一次读取某个会话时才从数据库加载，用于比较前缀的列表也是需要时才反序列化
+- 每个会话只保留最近的若干个检查点，旧检查点、它们的中间写入以及不再被引用的通道版本会被清理
+"""
+
+import json
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from langchain_learning.utils.paths import get_cache_dir
+
+# 增量链的最大长度，超过后写入完整快照
+_MAX_DELTA_DEPTH = 64
+
+# 检查点数超过上限这么多时才清理一次，分摊清理的开销
+_PRUNE_SLACK = 16
+
+# 内存中最多保留的通道尾部（用于判断新列表是否只是追加）
+_MAX_CACHED_TAILS = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    versions TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    base TEXT,
+    depth INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS checkpoint_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# 沿 base 找到完整快照，按 depth 从快照到最新增量排列
+_CHAIN_SQL = """
+WITH RECURSIVE chain(version, base, type, value, depth) AS (
+    SELECT version, base, type, value, depth FROM checkpoint_blobs
+    WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?
+    UNION ALL
+    SELECT b.version, b.base, b.type, b.value, b.depth FROM checkpoint_blobs b
+    JOIN chain ON b.version = chain.base
+    WHERE b.thread_id = ? AND b.checkpoint_ns = ? AND b.channel = ?
+)
+SELECT type, value FROM chain ORDER BY depth
+"""
+
+TailKey = Tuple[str, str, str]
+
+# 通道在本步骤中被清空的标记
+_EMPTY = object()
+
+
+class _Tail:
+    """某个通道最近一次写入或读取的列表值，用于判断下一次写入是否只是追加"""
+
+    def __init__(self, version: str, depth: int, load: Callable[[], List[Any]]):
+        self.version = version
+        self.depth = depth
+        self._load: Optional[Callable[[], List[Any]]] = load
+        self._values: List[Any] = []
+
+    @property
+    def values(self) -> List[Any]:
+        """反序列化得到的独立副本，第一次访问时才加载"""
+        if self._load is not None:
+            self._values, self._load = self._load(), None
+        return self._values
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """
+    把智能体状态按 thread_id 增量保存到 SQLite 的检查点存储。
+
+    Args:
+        path: SQLite 文件路径，None 表示只保存在内存中
+        serde: 序列化器，默认为 LangGraph 的 JsonPlusSerializer
+        max_checkpoints: 每个会话保留的最近检查点数，None 表示不清理
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        max_checkpoints: Optional[int] = 100,
+    ):
+        super().__init__(serde=serde)
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path) if path is not None else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._tails: "OrderedDict[TailKey, _Tail]" = OrderedDict()
+        self.max_checkpoints = max_checkpoints
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    # ---- 读取 ----
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: List[Any] = [thread_id, checkpoint_ns]
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            return self._tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, "
+            "metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params: List[Any] = []
+        if config is not None:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(get_checkpoint_id(config))
+        if before is not None and get_checkpoint_id(before):
+            query += " AND checkpoint_id < ?"
+            params.append(get_checkpoint_id(before))
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        # 通道的值在产出每个检查点时才加载
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                return
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                item = self._tuple(thread_id, checkpoint_ns, row)
+            yield item
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: Sequence[Any]) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint_blob, metadata_type, metadata_blob = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint_blob))
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM checkpoint_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_values(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=_config(thread_id, checkpoint_ns, parent_checkpoint_id) if parent_checkpoint_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    def _load_values(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            rows = self._conn.execute(
+                _CHAIN_SQL, (thread_id, checkpoint_ns, channel, str(version), thread_id, checkpoint_ns, channel)
+            ).fetchall()
+            if not rows or rows[0][0] == "empty":
+                continue
+            values[channel] = self._assemble(rows)
+            key = (thread_id, checkpoint_ns, channel)
+            tail = self._tails.get(key)
+            if isinstance(values[channel], list) and (tail is None or tail.version != str(version)):
+                # 记住这个版本，之后的写入可以相对它保存增量（需要比较时再重新反序列化出独立的副本）
+                self._remember(key, _Tail(str(version), len(rows) - 1, lambda rows=rows: self._assemble(rows)))
+        return values
+
+    def _assemble(self, rows: Sequence[Tuple[str, bytes]]) -> Any:
+        """完整快照加上按顺序排列的增量"""
+        value = self.serde.loads_typed(rows[0])
+        for type_, blob in rows[1:]:
+            value = value + self.serde.loads_typed((type_, blob))
+        return value
+
+    # ---- 写入 ----
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        saved = checkpoint.copy()
+        values: Dict[str, Any] = saved.pop("channel_values")  # type: ignore[misc]
+        type_, checkpoint_blob = self.serde.dumps_typed(saved)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        versions = json.dumps({channel: str(version) for channel, version in checkpoint["channel_versions"].items()})
+
+        with self._lock:
+            blobs = [
+                self._blob_row(thread_id, checkpoint_ns, channel, str(version), values.get(channel, _EMPTY))
+                for channel, version in new_versions.items()
+            ]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoint_blobs "
+                    "(thread_id, checkpoint_ns, channel, version, type, value, base, depth) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    blobs,
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                    "type, checkpoint, metadata_type, metadata, versions) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        config["configurable"].get("checkpoint_id"),
+                        type_,
+                        checkpoint_blob,
+                        metadata_type,
+                        metadata_blob,
+                        versions,
+                    ),
+                )
+            if self.max_checkpoints is not None:
+                count = self._conn.execute(
+                    "SELECT COUNT(*) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+                ).fetchone()[0]
+                if count > self.max_checkpoints + _PRUNE_SLACK:
+                    self._prune_thread(thread_id, checkpoint_ns, self.max_checkpoints)
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def _blob_row(self, thread_id: str, checkpoint_ns: str, channel: str, version: str, value: Any) -> Tuple[Any, ...]:
+        """一个通道新版本的数据行：列表只是在上一次写入的基础上追加时保存增量，否则保存完整的值"""
+        key = (thread_id, checkpoint_ns, channel)
+        if value is _EMPTY:
+            return (thread_id, checkpoint_ns, channel, version, "empty", b"", None, 0)
+
+        tail = self._tails.get(key)
+        if isinstance(value, list) and tail is not None and tail.depth < _MAX_DELTA_DEPTH:
+            previous = tail.values
+            if len(value) >= len(previous) and all(a == b for a, b in zip(previous, value)):
+                type_, blob = self.serde.dumps_typed(value[len(previous):])
+                appended = self.serde.loads_typed((type_, blob))  # 独立的副本，不受调用方之后修改的影响
+                next_tail = _Tail(version, tail.depth + 1, lambda: previous + appended)
+                self._remember(key, next_tail)
+                return (thread_id, checkpoint_ns, channel, version, type_, blob, tail.version, next_tail.depth)
+
+        type_, blob = self.serde.dumps_typed(value)
+        if isinstance(value, list):
+            self._remember(key, _Tail(version, 0, lambda: self.serde.loads_typed((type_, blob))))
+        return (thread_id, checkpoint_ns, channel, version, type_, blob, None, 0)
+
+    def _remember(self, key: TailKey, tail: _Tail) -> None:
+        self._tails[key] = tail
+        self._tails.move_to_end(key)
+        while len(self._tails) > _MAX_CACHED_TAILS:
+            self._tails.popitem(last=False)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # 特殊写入（错误、中断等）覆盖已有的记录，普通写入已存在时保留原记录
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = [
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+                task_path,
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"{verb} INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, "
+                "value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    # ---- 清理 ----
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            with self._conn:
+                for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            for key in [key for key in self._tails if key[0] == thread_id]:
+                del self._tails[key]
+
+    def prune(self, thread_id: Optional[str] = None, keep_last: Optional[int] = None) -> int:
+        """
+        只保留每个会话最近的检查点，删除其余检查点、它们的中间写入和不再被引用的通道版本。
+
+        Args:
+            thread_id: 只清理该会话，None 表示所有会话
+            keep_last: 每个会话保留的检查点数，默认为 max_checkpoints
+
+        Returns:
+            删除的检查点数
+        """
+        keep = keep_last if keep_last is not None else self.max_checkpoints
+        if keep is None:
+            return 0
+        with self._lock:
+            query = "SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints"
+            params: Tuple[Any, ...] = ()
+            if thread_id is not None:
+                query += " WHERE thread_id = ?"
+                params = (thread_id,)
+            threads = self._conn.execute(query, params).fetchall()
+            return sum(self._prune_thread(t, ns, keep) for t, ns in threads)
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str, keep: int) -> int:
+        scope = (thread_id, checkpoint_ns)
+        stale = [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (*scope, keep),
+            )
+        ]
+        if not stale:
+            return 0
+
+        # 保留的检查点引用的通道版本，以及这些版本的增量链所依赖的版本
+        needed: Set[Tuple[str, str]] = set()
+        for (versions,) in self._conn.execute(
+            "SELECT versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT ?",
+            (*scope, keep),
+        ):
+            needed.update(json.loads(versions).items())
+        bases = {
+            (channel, version): base
+            for channel, version, base in self._conn.execute(
+                "SELECT channel, version, base FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ?", scope
+            )
+        }
+        pending = list(needed)
+        while pending:
+            channel, version = pending.pop()
+            base = bases.get((channel, version))
+            if base is not None and (channel, base) not in needed:
+                needed.add((channel, base))
+                pending.append((channel, base))
+        unused = [(*scope, channel, version) for channel, version in bases if (channel, version) not in needed]
+
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(*scope, checkpoint_id) for checkpoint_id in stale],
+            )
+            self._conn.executemany(
+                "DELETE FROM checkpoint_writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(*scope, checkpoint_id) for checkpoint_id in stale],
+            )
+            self._conn.executemany(
+                "DELETE FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                unused,
+            )
+        # 指向已删除版本的尾部不能再作为增量的基础
+        for key in [key for key in self._tails if key[:2] == scope and (key[2], self._tails[key].version) not in needed]:
+            del self._tails[key]
+        return len(stale)
+
+    def storage_stats(self, thread_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        数据库中的检查点数、通道版本数（其中增量的个数）和通道数据的总字节数。
+
+        Args:
+            thread_id: 只统计该会话，None 表示所有会话
+        """
+        where, params = ("WHERE thread_id = ?", (thread_id,)) if thread_id is not None else ("", ())
+        with self._lock:
+            checkpoints = self._conn.execute(f"SELECT COUNT(*) FROM checkpoints {where}", params).fetchone()[0]
+            blobs, deltas, size = self._conn.execute(
+                f"SELECT COUNT(*), COUNT(base), COALESCE(SUM(LENGTH(value)), 0) FROM checkpoint_blobs {where}", params
+            ).fetchone()
+        return {"checkpoints": checkpoints, "blobs": blobs, "delta_blobs": deltas, "blob_bytes": size}
+
+    # ---- 异步接口：本地 SQLite 的读写很快，直接调用同步实现 ----
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+_default_checkpointer: Optional[SQLiteCheckpointer] = None
+_default_lock = threading.Lock()
+
+
+def get_checkpointer() -> SQLiteCheckpointer:
+    """
+    获取示例共用的检查点存储，位于缓存目录下的 checkpoints.sqlite。
+
+    Returns:
+        共享的 SQLiteCheckpointer 实例
+    """
+    global _default_checkpointer
+    with _default_lock:
+        if _default_checkpointer is None:
+            _default_checkpointer = SQLiteCheckpointer(get_cache_dir() / "checkpoints.sqlite")
+        return _default_checkpointer
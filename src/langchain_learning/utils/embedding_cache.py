@@ -0,0 +1,117 @@
+"""
+按内容寻址的嵌入向量缓存
+
+缓存键是 (模型, 文本) 的 SHA-256 哈希，向量以 float32 字节串存放在 SQLite 中。
+同一个缓存文件可以被 Chroma、InMemoryStore 等所有使用嵌入的地方共享。
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from langchain_learning.utils.paths import get_cache_dir
+
+# 单条 SQL 中 IN (...) 的最大参数个数
+_MAX_SQL_PARAMS = 500
+
+
+def embedding_key(model: str, text: str) -> str:
+    """
+    计算嵌入缓存键。
+
+    Args:
+        model: 嵌入模型名称
+        text: 文本
+
+    Returns:
+        SHA-256 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite 嵌入向量缓存。
+
+    Args:
+        path: SQLite 文件路径，None 表示只在内存中缓存
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path) if path is not None else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embedding_cache (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        批量查找向量。
+
+        Args:
+            keys: embedding_key 计算出的键
+
+        Returns:
+            命中的键到向量的映射
+        """
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for start in range(0, len(keys), _MAX_SQL_PARAMS):
+                chunk = keys[start:start + _MAX_SQL_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", list(chunk)
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        """
+        批量写入向量。
+
+        Args:
+            items: (键, 向量) 对
+        """
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embedding_cache (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embedding_cache")
+            self._conn.commit()
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    获取示例共用的嵌入缓存，位于缓存目录下的 embeddings.sqlite。
+
+    Returns:
+        共享的 EmbeddingCache 实例
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache(get_cache_dir() / "embeddings.sqlite")
+        return _default_cache
@@ -0,0 +1,183 @@
+"""
+按 token 预算滑动的对话历史
+
+始终保留系统提示，把最近的若干轮对话放进 token 预算内，更早的轮次被淘汰。
+可以选择用模型把被淘汰的轮次滚动压缩成一段摘要，保留长期上下文。
+"""
+
+import logging
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from langchain_learning.models.metadata import get_model_metadata
+from langchain_learning.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# for_model 默认的提示预算：提示越长每轮的费用和首 token 延迟越高，聊天保留最近几轮和摘要就够了
+DEFAULT_PROMPT_TOKENS = 4096
+
+
+def estimate_message_tokens(message: BaseMessage) -> int:
+    """估计单条消息的 token 数"""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+SUMMARY_PROMPT = "请把下面的对话压缩成一段简洁的中文摘要，保留用户的关键信息、偏好和尚未完成的问题，不超过{limit}字。"
+
+
+class TokenBudgetHistory:
+    """
+    按 token 预算维护对话历史。
+
+    Args:
+        system_prompt: 系统提示，始终保留
+        max_prompt_tokens: 每次请求的提示 token 预算（包括系统提示和摘要）
+        summarizer: 用于压缩被淘汰轮次的模型，None 表示直接丢弃
+        summary_max_tokens: 摘要的最大长度
+        token_counter: 单条消息的 token 计数函数
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        max_prompt_tokens: int,
+        summarizer: Optional[BaseChatModel] = None,
+        summary_max_tokens: int = 256,
+        token_counter: Callable[[BaseMessage], int] = estimate_message_tokens,
+    ):
+        self.system_message = SystemMessage(content=system_prompt)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summarizer = summarizer
+        self.summary_max_tokens = summary_max_tokens
+        self.token_counter = token_counter
+        self.summary: Optional[SystemMessage] = None
+        self.evicted_turns = 0
+        self.last_prompt_tokens = 0
+        self._system_tokens = token_counter(self.system_message)
+        self._summary_tokens = 0
+        # (消息, token 数)，累计值随增删更新，避免每轮重新计数
+        self._messages: Deque[Tuple[BaseMessage, int]] = deque()
+        self._history_tokens = 0
+
+    @classmethod
+    def for_model(
+        cls,
+        model_id: str,
+        system_prompt: str,
+        max_prompt_tokens: Optional[int] = None,
+        **kwargs: object,
+    ) -> "TokenBudgetHistory":
+        """
+        按模型的上下文窗口创建历史管理器。
+
+        Args:
+            model_id: 模型ID
+            system_prompt: 系统提示
+            max_prompt_tokens: 提示预算，默认为 DEFAULT_PROMPT_TOKENS；不会超过上下文窗口减去默认生成长度
+            **kwargs: 其他构造参数
+
+        Returns:
+            历史管理器
+        """
+        metadata = get_model_metadata(model_id)
+        budget = metadata.context_window - metadata.default_max_tokens
+        budget = min(budget, max_prompt_tokens if max_prompt_tokens is not None else DEFAULT_PROMPT_TOKENS)
+        return cls(system_prompt, budget, **kwargs)  # type: ignore[arg-type]
+
+    def add_user_message(self, content: str) -> None:
+        """添加用户消息"""
+        self._append(HumanMessage(content=content))
+
+    def add_ai_message(self, content: str) -> None:
+        """添加AI消息"""
+        self._append(AIMessage(content=content))
+
+    def messages(self) -> List[BaseMessage]:
+        """
+        返回本次请求要发送的消息：系统提示、摘要和预算内最近的轮次。
+
+        超出预算的最早轮次会被淘汰（有摘要模型时先压缩进摘要），并记录本次的提示大小。
+        摘要模型调用失败时只记录警告，被淘汰的轮次直接丢弃，对话仍然可以继续。
+
+        Returns:
+            消息列表
+        """
+        self._evict()
+        system_message = self.system_message
+        if self.summary is not None:
+            # 部分模型只接受一条系统消息，把摘要合并进系统提示
+            system_message = SystemMessage(content=f"{self.system_message.content}\n\n{self.summary.content}")
+        prompt: List[BaseMessage] = [system_message]
+        prompt.extend(message for message, _ in self._messages)
+        self.last_prompt_tokens = self._system_tokens + self._summary_tokens + self._history_tokens
+        return prompt
+
+    def clear(self) -> None:
+        """清空历史和摘要"""
+        self._messages.clear()
+        self._history_tokens = 0
+        self.summary = None
+        self._summary_tokens = 0
+        self.evicted_turns = 0
+
+    def _append(self, message: BaseMessage) -> None:
+        tokens = self.token_counter(message)
+        self._messages.append((message, tokens))
+        self._history_tokens += tokens
+
+    def _budget_exceeded(self) -> bool:
+        return self._system_tokens + self._summary_tokens + self._history_tokens > self.max_prompt_tokens
+
+    def _evict(self) -> None:
+        """按整轮淘汰最早的对话，始终保留最新的一条消息；每条被淘汰的消息都会进入摘要"""
+        while True:
+            evicted = self._pop_turns()
+            if not evicted or self.summarizer is None:
+                return
+            try:
+                self._summarize(evicted)
+            except Exception:
+                # 摘要失败时退化为直接淘汰，保证请求不超出预算
+                logger.warning("摘要模型调用失败，直接丢弃 %d 条被淘汰的消息", len(evicted), exc_info=True)
+                return
+            # 摘要本身占用预算，变长后可能需要继续淘汰，新淘汰的轮次同样压缩进摘要
+
+    def _pop_turns(self) -> List[BaseMessage]:
+        """弹出最早的整轮对话直到预算内，返回被弹出的消息"""
+        evicted: List[BaseMessage] = []
+        while self._budget_exceeded() and len(self._messages) > 1:
+            message, tokens = self._messages.popleft()
+            evicted.append(message)
+            self._history_tokens -= tokens
+            # 一轮从用户消息开始，继续弹出直到下一条用户消息
+            while len(self._messages) > 1 and not isinstance(self._messages[0][0], HumanMessage):
+                message, tokens = self._messages.popleft()
+                evicted.append(message)
+                self._history_tokens -= tokens
+            self.evicted_turns += 1
+        return evicted
+
+    def _summarize(self, evicted: List[BaseMessage]) -> None:
+        """把被淘汰的消息滚动合并进摘要"""
+        lines = []
+        if self.summary is not None:
+            lines.append(f"已有摘要: {self.summary.content}")
+        for message in evicted:
+            role = "用户" if isinstance(message, HumanMessage) else "助手"
+            lines.append(f"{role}: {message.content}")
+        response = self.summarizer.invoke(  # type: ignore[union-attr]
+            [
+                SystemMessage(content=SUMMARY_PROMPT.format(limit=self.summary_max_tokens)),
+                HumanMessage(content="\n".join(lines)),
+            ]
+        )
+        self.summary = SystemMessage(content=f"之前对话的摘要: {response.content}")
+        self._summary_tokens = self.token_counter(self.summary)
@@ -0,0 +1,152 @@
+"""
+幂等的增量向量库导入
+
+每个文档的内容哈希保存在 Chroma 的元数据中。重复导入时只对新增或内容变化的文档
+计算嵌入并写入，没有变化的文档直接跳过，语料中已不存在的文档会被删除。
+语料没有变化时不会发起任何嵌入请求。
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_chroma import Chroma
+
+# 保存内容哈希的元数据字段
+HASH_KEY = "content_hash"
+
+# 保存语料来源的元数据字段
+SOURCE_KEY = "source"
+
+
+@dataclass
+class IngestionReport:
+    """
+    一次导入的结果。
+
+    Attributes:
+        added: 新增的文档ID
+        updated: 内容变化后重新写入的文档ID
+        unchanged: 没有变化、被跳过的文档ID
+        deleted: 从向量库中删除的过期文档ID
+    """
+
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+
+    @property
+    def embedded(self) -> int:
+        """需要计算嵌入的文档数"""
+        return len(self.added) + len(self.updated)
+
+    def summary(self) -> str:
+        """格式化的统计信息"""
+        return (
+            f"新增 {len(self.added)} 个, 更新 {len(self.updated)} 个, "
+            f"跳过 {len(self.unchanged)} 个未变化, 删除 {len(self.deleted)} 个过期文档"
+        )
+
+
+def content_hash(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    计算文档内容和元数据的哈希。
+
+    Args:
+        text: 文档内容
+        metadata: 文档元数据（不含哈希和来源字段）
+
+    Returns:
+        十六进制 SHA-256 摘要
+    """
+    payload = json.dumps([text, metadata or {}], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _stored_hashes(vector_store: Chroma, source: Optional[str], page_size: int) -> Dict[str, Optional[str]]:
+    """分页读取向量库中已有文档的ID和内容哈希"""
+    where = {SOURCE_KEY: source} if source is not None else None
+    hashes: Dict[str, Optional[str]] = {}
+    offset = 0
+    while True:
+        page = vector_store.get(where=where, limit=page_size, offset=offset, include=["metadatas"])
+        for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+            hashes[doc_id] = (metadata or {}).get(HASH_KEY)
+        if len(page["ids"]) < page_size:
+            return hashes
+        offset += page_size
+
+
+def sync_documents(
+    vector_store: Chroma,
+    texts: Sequence[str],
+    ids: Sequence[str],
+    metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    source: Optional[str] = None,
+    delete_stale: bool = True,
+    batch_size: int = 64,
+    page_size: int = 1000,
+) -> IngestionReport:
+    """
+    把一组文档同步到 Chroma 向量库，只嵌入新增或变化的文档。
+
+    Args:
+        vector_store: Chroma 向量库
+        texts: 文档内容
+        ids: 文档ID，与 texts 一一对应
+        metadatas: 文档元数据
+        source: 语料来源，给定时只在同一来源的文档中查找过期文档
+        delete_stale: 是否删除本次语料中不存在的文档
+        batch_size: 每批写入（嵌入）的文档数
+        page_size: 读取已有哈希时每页的文档数
+
+    Returns:
+        导入结果
+
+    Raises:
+        ValueError: ids 与 texts 长度不一致或 ids 重复
+    """
+    if len(ids) != len(texts) or (metadatas is not None and len(metadatas) != len(texts)):
+        raise ValueError("ids、metadatas 必须与 texts 一一对应")
+    if len(set(ids)) != len(ids):
+        raise ValueError("文档ID不能重复")
+
+    stored = _stored_hashes(vector_store, source, page_size)
+    report = IngestionReport()
+    pending_texts: List[str] = []
+    pending_ids: List[str] = []
+    pending_metadatas: List[Dict[str, Any]] = []
+
+    for i, (doc_id, text) in enumerate(zip(ids, texts)):
+        metadata = dict(metadatas[i]) if metadatas is not None else {}
+        digest = content_hash(text, metadata)
+        if stored.get(doc_id) == digest:
+            report.unchanged.append(doc_id)
+            continue
+        (report.updated if doc_id in stored else report.added).append(doc_id)
+        metadata[HASH_KEY] = digest
+        if source is not None:
+            metadata[SOURCE_KEY] = source
+        pending_texts.append(text)
+        pending_ids.append(doc_id)
+        pending_metadatas.append(metadata)
+
+    # Chroma 的 add_texts 按 ID upsert，已有文档会被覆盖
+    for start in range(0, len(pending_ids), batch_size):
+        end = start + batch_size
+        vector_store.add_texts(
+            texts=pending_texts[start:end],
+            metadatas=pending_metadatas[start:end],
+            ids=pending_ids[start:end],
+        )
+
+    if delete_stale:
+        current = set(ids)
+        # 只删除由本函数导入（带有内容哈希）的文档，不影响其他方式写入的数据
+        report.deleted = [doc_id for doc_id, digest in stored.items() if digest is not None and doc_id not in current]
+        if report.deleted:
+            vector_store.delete(ids=report.deleted)
+
+    return report
@@ -0,0 +1,268 @@
+"""
+本地快速意图分类
+
+用字符 n-gram 给中文关键词打分（英文关键词按整词匹配），在微秒级内判断意图明确的输入；
+只命中一个普通关键词（且不是“天气”“新闻”这类高精度关键词）或者置信度不足时返回 None，
+由调用方回退到 LLM 意图分类。
+还可以选择用嵌入向量的类中心作为第二级判断。
+"""
+
+import math
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+INTENTS = ("weather", "news", "data", "task", "general")
+
+DEFAULT_KEYWORDS: Dict[str, List[str]] = {
+    "weather": ["天气", "气温", "温度", "下雨", "降雨", "下雪", "晴", "阴天", "多云", "刮风", "风速", "湿度", "雾霾", "预报", "weather", "forecast"],
+    "news": ["新闻", "头条", "报道", "资讯", "消息", "时事", "快讯", "news", "headline"],
+    "data": ["数据", "分析", "统计", "销售", "销量", "报表", "平均", "图表", "利润", "趋势", "data", "analysis"],
+    "task": ["安排", "会议", "提醒", "日程", "任务", "调度", "预约", "待办", "计划", "schedule", "meeting", "remind"],
+    "general": ["你好", "您好", "介绍", "谢谢", "你是谁", "帮助", "hello", "hi"],
+}
+
+# 高精度关键词：几乎只在对应意图中出现，输入中完整出现一个就足以判断
+DEFAULT_STRONG_KEYWORDS: Dict[str, List[str]] = {
+    "weather": ["天气", "气温", "下雨", "下雪", "降雨", "weather", "forecast"],
+    "news": ["新闻", "头条", "快讯", "时事", "news", "headline"],
+    "data": ["数据分析", "报表"],
+    "task": ["日程", "待办", "schedule"],
+    "general": ["你好", "您好", "你是谁"],
+}
+
+EmbedFunc = Callable[[Sequence[str]], Sequence[Sequence[float]]]
+
+# 英文关键词和输入中的英文单词
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def parse_intent(text: str, default: str = "general") -> str:
+    """
+    从 LLM 的分类输出中解析意图标签。
+
+    Args:
+        text: LLM 输出
+        default: 找不到标签时的默认意图
+
+    Returns:
+        意图标签
+    """
+    text = text.lower()
+    for intent in INTENTS:
+        if intent in text:
+            return intent
+    return default
+
+
+def _ngrams(text: str, sizes: Iterable[int] = (1, 2, 3)) -> set:
+    """文本的字符 n-gram 集合"""
+    return {text[i:i + n] for n in sizes for i in range(len(text) - n + 1)}
+
+
+# 特征到 (意图, 关键词序号, 权重) 的索引
+_FeatureIndex = Dict[str, List[Tuple[str, int, float]]]
+
+
+class NGramIntentClassifier:
+    """
+    基于字符 n-gram 关键词打分的意图分类器。
+
+    中文关键词按字符 n-gram 匹配，英文关键词只匹配完整的单词。单个关键词很容易出现在其他话题中
+    （例如“温度计”“消息队列”），因此得分最高的意图至少要命中 min_hits 个不同的关键词才走快速路径；
+    输入中完整出现该意图的高精度关键词（例如“天气”“新闻”）时命中一个就够了。
+
+    Args:
+        keywords: 每个意图的关键词，默认使用 DEFAULT_KEYWORDS
+        min_score: 最高分低于该值时视为没有把握
+        min_ratio: 最高分占前两名总分的比例低于该值时视为没有把握
+        min_hits: 得分最高的意图命中的不同关键词少于该值时视为没有把握
+        strong_keywords: 每个意图的高精度关键词，默认使用 DEFAULT_STRONG_KEYWORDS，传入空字典表示不使用
+    """
+
+    def __init__(
+        self,
+        keywords: Optional[Dict[str, List[str]]] = None,
+        min_score: float = 1.0,
+        min_ratio: float = 0.65,
+        min_hits: int = 2,
+        strong_keywords: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.min_score = min_score
+        self.min_ratio = min_ratio
+        self.min_hits = min_hits
+        self._keywords: Dict[str, List[str]] = {k: list(v) for k, v in (keywords or DEFAULT_KEYWORDS).items()}
+        if strong_keywords is None:
+            strong_keywords = DEFAULT_STRONG_KEYWORDS
+        self._strong: Dict[str, List[str]] = {k: [w.lower() for w in v] for k, v in strong_keywords.items()}
+        self._features: _FeatureIndex = {}
+        self._word_features: _FeatureIndex = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._centroid_intents: List[str] = []
+        self._embed: Optional[EmbedFunc] = None
+        self._min_similarity = 0.0
+        self._min_margin = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"ngram_hits": 0, "embedding_hits": 0, "fallbacks": 0}
+        self._build()
+
+    def add_keywords(self, intent: str, words: Iterable[str], strong: bool = False) -> None:
+        """
+        为意图追加关键词。
+
+        Args:
+            intent: 意图标签
+            words: 关键词
+            strong: 是否同时作为高精度关键词（输入中完整出现一个即可判断）
+        """
+        words = list(words)
+        self._keywords.setdefault(intent, []).extend(words)
+        if strong:
+            self._strong.setdefault(intent, []).extend(word.lower() for word in words)
+        self._build()
+
+    def fit_centroids(
+        self,
+        examples: Dict[str, List[str]],
+        embed: EmbedFunc,
+        min_similarity: float = 0.5,
+        min_margin: float = 0.05,
+    ) -> None:
+        """
+        用示例句子的嵌入均值作为每个意图的类中心，n-gram 没有把握时再比较相似度。
+
+        Args:
+            examples: 每个意图的示例句子
+            embed: 批量嵌入函数
+            min_similarity: 最高相似度的下限
+            min_margin: 最高相似度与第二名之差的下限
+        """
+        intents = [intent for intent, texts in examples.items() if texts]
+        centroids = []
+        for intent in intents:
+            vectors = np.asarray(embed(examples[intent]), dtype=np.float32)
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / (np.linalg.norm(centroid) or 1.0))
+        self._centroids = np.stack(centroids)
+        self._centroid_intents = intents
+        self._embed = embed
+        self._min_similarity = min_similarity
+        self._min_margin = min_margin
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """快速路径命中次数、回退次数和命中率"""
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+        total = stats["ngram_hits"] + stats["embedding_hits"] + stats["fallbacks"]
+        stats["hit_rate"] = (stats["ngram_hits"] + stats["embedding_hits"]) / total if total else 0.0
+        return stats
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """
+        计算每个意图的 n-gram 得分。
+
+        Args:
+            text: 用户输入
+
+        Returns:
+            意图到得分的映射
+        """
+        return self._match(text)[0]
+
+    def predict(self, text: str) -> Optional[str]:
+        """
+        预测意图，没有把握时返回 None。
+
+        Args:
+            text: 用户输入
+
+        Returns:
+            意图标签或 None
+        """
+        scores, hits = self._match(text)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (best, top), second = ranked[0], ranked[1][1] if len(ranked) > 1 else 0.0
+        confident = hits[best] >= self.min_hits or self._has_strong_keyword(best, text)
+        if top >= self.min_score and top / (top + second) >= self.min_ratio and confident:
+            self._count("ngram_hits")
+            return best
+
+        if self._centroids is not None and self._embed is not None:
+            vector = np.asarray(self._embed([text])[0], dtype=np.float32)
+            similarities = self._centroids @ (vector / (np.linalg.norm(vector) or 1.0))
+            order = np.argsort(similarities)[::-1]
+            best_sim = float(similarities[order[0]])
+            margin = best_sim - float(similarities[order[1]]) if len(order) > 1 else best_sim
+            if best_sim >= self._min_similarity and margin >= self._min_margin:
+                self._count("embedding_hits")
+                return self._centroid_intents[int(order[0])]
+
+        self._count("fallbacks")
+        return None
+
+    def _match(self, text: str) -> Tuple[Dict[str, float], Dict[str, int]]:
+        """每个意图的得分和命中的不同关键词数"""
+        text = text.lower()
+        scores = dict.fromkeys(self._keywords, 0.0)
+        matched: Dict[str, set] = {intent: set() for intent in self._keywords}
+        for index, features in ((self._features, _ngrams(text)), (self._word_features, set(_WORD.findall(text)))):
+            for feature in features:
+                for intent, keyword, weight in index.get(feature, ()):
+                    scores[intent] += weight
+                    matched[intent].add(keyword)
+        return scores, {intent: len(keywords) for intent, keywords in matched.items()}
+
+    def _has_strong_keyword(self, intent: str, text: str) -> bool:
+        """输入中是否完整出现意图的高精度关键词（英文按整词）"""
+        text = text.lower()
+        words = set(_WORD.findall(text))
+        return any(
+            keyword in words if _WORD.fullmatch(keyword) else keyword in text
+            for keyword in self._strong.get(intent, ())
+        )
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _build(self) -> None:
+        """
+        构建特征到 (意图, 关键词, 权重) 的索引。
+
+        中文关键词的 2-3 字 n-gram 以及不超过 3 个字的完整关键词作为特征，英文关键词整词作为特征，
+        只出现在少数意图中的特征权重更高。
+        """
+        intent_grams: Dict[str, Dict[str, set]] = {}
+        for intent, words in self._keywords.items():
+            grams: Dict[str, set] = {}
+            for i, word in enumerate(words):
+                word = word.lower()
+                if _WORD.fullmatch(word):
+                    word_grams = {word}
+                else:
+                    word_grams = _ngrams(word, (2, 3))
+                    if len(word) <= 3:
+                        word_grams.add(word)
+                for gram in word_grams:
+                    grams.setdefault(gram, set()).add(i)
+            intent_grams[intent] = grams
+
+        document_frequency: Dict[str, int] = {}
+        for grams in intent_grams.values():
+            for gram in grams:
+                document_frequency[gram] = document_frequency.get(gram, 0) + 1
+
+        count = len(intent_grams)
+        features: _FeatureIndex = {}
+        word_features: _FeatureIndex = {}
+        for intent, grams in intent_grams.items():
+            for gram, keywords in grams.items():
+                index = word_features if _WORD.fullmatch(gram) else features
+                weight = math.log(1 + count / document_frequency[gram])
+                # 同一个特征可能来自多个关键词，记在第一个关键词上，避免一个特征被算成多次命中
+                index.setdefault(gram, []).append((intent, min(keywords), weight))
+        self._features = features
+        self._word_features = word_features
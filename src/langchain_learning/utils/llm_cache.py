@@ -0,0 +1,331 @@
+"""
+两级 LLM 响应缓存
+
+进程内 LRU 缓存在前，SQLite 磁盘缓存在后。缓存键是 (模型, 消息, 工具, 生成参数)
+规范化后的 SHA-256 哈希，适合温度较低、结果基本确定的调用（例如意图分类）。
+
+作为 LangChain 的 BaseCache 实现，可以直接挂到任意聊天模型上:
+
+    llm = get_chat_model("THUDM/GLM-Z1-9B-0414", temperature=0.3, cache=get_response_cache())
+
+BaseChatModel.stream 不会查询缓存，流式调用请使用 cache.stream(llm, messages)，
+命中时会把缓存的回复按块重放。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, Generation
+from langchain_core.runnables import RunnableConfig
+
+from langchain_learning.utils.paths import get_cache_dir
+
+# 序列化消息中每次调用都会变化、不影响模型输出的字段
+_VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+
+def _strip_volatile(value: Any) -> Any:
+    """递归去掉序列化消息中的易变字段"""
+    if isinstance(value, dict):
+        cleaned = {k: _strip_volatile(v) for k, v in value.items()}
+        kwargs = cleaned.get("kwargs")
+        if cleaned.get("lc") == 1 and isinstance(kwargs, dict):
+            for field in _VOLATILE_MESSAGE_FIELDS:
+                kwargs.pop(field, None)
+        return cleaned
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    计算规范化的缓存键。
+
+    Args:
+        prompt: LangChain 序列化后的消息列表
+        llm_string: 模型、工具和生成参数的描述
+
+    Returns:
+        SHA-256 十六进制摘要
+    """
+    try:
+        prompt = json.dumps(_strip_volatile(json.loads(prompt)), sort_keys=True, ensure_ascii=False)
+    except (TypeError, ValueError):
+        pass
+    digest = hashlib.sha256()
+    digest.update(llm_string.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TwoTierLLMCache(BaseCache):
+    """
+    内存 LRU + SQLite 的两级缓存。
+
+    Args:
+        path: SQLite 文件路径，None 表示只使用内存缓存
+        max_memory_items: 内存缓存的最大条目数
+        ttl: 缓存有效期（秒），None 表示永不过期
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        max_memory_items: int = 1024,
+        ttl: Optional[float] = None,
+    ):
+        self.max_memory_items = max_memory_items
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[Optional[float], List[Generation]]]" = OrderedDict()
+        # 内存层和计数用 _lock，SQLite 读写用 _db_lock，磁盘 IO 不阻塞内存命中
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "updates": 0, "expired": 0}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL)"
+            )
+            self._conn.commit()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """命中、未命中等计数以及命中率"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """查找缓存，先内存后磁盘"""
+        return self.get(cache_key(prompt, llm_string))
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """写入缓存"""
+        self.put(cache_key(prompt, llm_string), return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        """清空两级缓存"""
+        with self._lock:
+            self._memory.clear()
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[Generation]]:
+        """
+        按缓存键查找。
+
+        Args:
+            key: cache_key 计算出的键
+
+        Returns:
+            缓存的生成结果，未命中或已过期时返回 None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, generations = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    # 返回浅拷贝，调用方会替换其中的 message
+                    return [g.model_copy() for g in generations]
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+        loaded = self._load(key, now) if self._conn is not None else None
+        with self._lock:
+            if loaded is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, generations = loaded
+            # 读盘期间其他线程可能已经写入了更新的结果
+            if key not in self._memory:
+                self._remember(key, expires_at, generations)
+            self._stats["disk_hits"] += 1
+        return [g.model_copy() for g in generations]
+
+    def _load(self, key: str, now: float) -> Optional[Tuple[Optional[float], List[Generation]]]:
+        """从磁盘层读取未过期的条目，顺便删除已过期的条目"""
+        with self._db_lock:
+            row = self._conn.execute(  # type: ignore[union-attr]
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))  # type: ignore[union-attr]
+                self._conn.commit()  # type: ignore[union-attr]
+                with self._lock:
+                    self._stats["expired"] += 1
+                return None
+        return expires_at, loads(value)
+
+    def put(self, key: str, generations: Sequence[Generation]) -> None:
+        """
+        按缓存键写入。
+
+        Args:
+            key: cache_key 计算出的键
+            generations: 模型生成结果
+        """
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        generations = list(generations)
+        with self._lock:
+            self._remember(key, expires_at, generations)
+            self._stats["updates"] += 1
+        if self._conn is not None:
+            value = dumps(generations)
+            with self._db_lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, expires_at),
+                )
+                self._conn.commit()
+
+    def _remember(self, key: str, expires_at: Optional[float], generations: List[Generation]) -> None:
+        """在持有锁的情况下写入内存层并淘汰最久未使用的条目"""
+        self._memory[key] = (expires_at, generations)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _stream_key(self, model: BaseChatModel, input: LanguageModelInput, **kwargs: Any) -> str:
+        """计算流式调用的缓存键，与 invoke 使用的键一致"""
+        messages = model._convert_input(input).to_messages()
+        return cache_key(dumps(messages), model._get_llm_string(**kwargs))
+
+    def stream(
+        self,
+        model: BaseChatModel,
+        input: LanguageModelInput,
+        config: Optional[RunnableConfig] = None,
+        chunk_size: int = 8,
+        **kwargs: Any,
+    ) -> Iterator[AIMessageChunk]:
+        """
+        带缓存的流式调用。
+
+        命中时把缓存的回复按 chunk_size 个字符一块重放；未命中时正常流式调用模型，
+        结束后把完整回复写入缓存。
+
+        Args:
+            model: 聊天模型
+            input: 模型输入
+            config: 运行配置
+            chunk_size: 重放时每块的字符数
+            **kwargs: 传给模型的其他参数
+
+        Yields:
+            回复的消息块
+        """
+        key = self._stream_key(model, input, **kwargs)
+        cached = self.get(key)
+        if cached:
+            yield from _replay(cached, chunk_size)
+            return
+
+        merged: Optional[AIMessageChunk] = None
+        for chunk in model.stream(input, config, **kwargs):
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            self.put(key, [_to_generation(merged)])
+
+    async def astream(
+        self,
+        model: BaseChatModel,
+        input: LanguageModelInput,
+        config: Optional[RunnableConfig] = None,
+        chunk_size: int = 8,
+        **kwargs: Any,
+    ) -> AsyncIterator[AIMessageChunk]:
+        """stream 的异步版本"""
+        key = self._stream_key(model, input, **kwargs)
+        cached = self.get(key)
+        if cached:
+            for chunk in _replay(cached, chunk_size):
+                yield chunk
+            return
+
+        merged: Optional[AIMessageChunk] = None
+        async for chunk in model.astream(input, config, **kwargs):
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            self.put(key, [_to_generation(merged)])
+
+
+def _to_generation(chunk: AIMessageChunk) -> ChatGeneration:
+    """把合并后的消息块转换为可缓存的生成结果"""
+    message = AIMessage(
+        content=chunk.content,
+        additional_kwargs=chunk.additional_kwargs,
+        response_metadata=chunk.response_metadata,
+        tool_calls=chunk.tool_calls,
+        usage_metadata=chunk.usage_metadata,
+    )
+    return ChatGeneration(message=message)
+
+
+def _replay(generations: List[Generation], chunk_size: int) -> Iterator[AIMessageChunk]:
+    """把缓存的生成结果拆成消息块"""
+    generation = generations[0]
+    message = generation.message if isinstance(generation, ChatGeneration) else AIMessage(content=generation.text)
+    content = message.content
+    if isinstance(content, str):
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)] or [""]
+    else:
+        pieces = [content]
+    for index, piece in enumerate(pieces):
+        last = index == len(pieces) - 1
+        yield AIMessageChunk(
+            content=piece,
+            tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"], ensure_ascii=False), "id": call["id"], "index": i}
+                for i, call in enumerate(getattr(message, "tool_calls", []))
+            ]
+            if last
+            else [],
+            response_metadata={**message.response_metadata, "cache_hit": True} if last else {},
+        )
+
+
+_default_cache: Optional[TwoTierLLMCache] = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache() -> TwoTierLLMCache:
+    """
+    获取示例共用的响应缓存，磁盘层位于缓存目录下的 llm_cache.sqlite。
+
+    Returns:
+        共享的 TwoTierLLMCache 实例
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TwoTierLLMCache(get_cache_dir() / "llm_cache.sqlite", ttl=24 * 3600)
+        return _default_cache
@@ -0,0 +1,304 @@
+"""
+基于矩阵索引的内存记忆存储
+
+与 LangGraph 的 InMemoryStore 使用相同的 put / get / search / list_namespaces 接口，
+但每个命名空间的向量保存在一个 MatrixIndex 中，语义搜索是一次矩阵-向量乘积，
+适合每个用户积累几十万条记忆的场景。
+"""
+
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langgraph.store.base import (
+    BaseStore,
+    GetOp,
+    IndexConfig,
+    Item,
+    ListNamespacesOp,
+    MatchCondition,
+    Op,
+    PutOp,
+    Result,
+    SearchItem,
+    SearchOp,
+    ensure_embeddings,
+    get_text_at_path,
+    tokenize_path,
+)
+
+from langchain_learning.utils.vector_index import MatrixIndex
+
+Namespace = Tuple[str, ...]
+
+
+def match_filter(value: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    判断记忆的值是否满足过滤条件，支持嵌套字典和 $eq/$ne/$gt/$gte/$lt/$lte 运算符。
+
+    Args:
+        value: 记忆的值
+        filter: 过滤条件，None 表示不过滤
+
+    Returns:
+        是否满足
+    """
+    return not filter or all(_compare(value.get(key), expected) for key, expected in filter.items())
+
+
+def _compare(actual: Any, expected: Any) -> bool:
+    if isinstance(expected, dict):
+        if any(key.startswith("$") for key in expected):
+            return all(_apply_operator(actual, op, operand) for op, operand in expected.items())
+        return isinstance(actual, dict) and all(_compare(actual.get(k), v) for k, v in expected.items())
+    return actual == expected
+
+
+def _apply_operator(actual: Any, op: str, operand: Any) -> bool:
+    if op == "$eq":
+        return actual == operand
+    if op == "$ne":
+        return actual != operand
+    if actual is None:
+        return False
+    if op == "$gt":
+        return float(actual) > float(operand)
+    if op == "$gte":
+        return float(actual) >= float(operand)
+    if op == "$lt":
+        return float(actual) < float(operand)
+    if op == "$lte":
+        return float(actual) <= float(operand)
+    raise ValueError(f"不支持的过滤运算符: {op}")
+
+
+def match_namespace(condition: MatchCondition, namespace: Namespace) -> bool:
+    """
+    判断命名空间是否满足前缀/后缀匹配条件（"*" 匹配任意一段）。
+
+    Args:
+        condition: 匹配条件
+        namespace: 命名空间
+
+    Returns:
+        是否满足
+    """
+    path = condition.path
+    if len(namespace) < len(path):
+        return False
+    if condition.match_type == "prefix":
+        pairs = zip(namespace, path)
+    elif condition.match_type == "suffix":
+        pairs = zip(reversed(namespace), reversed(path))
+    else:
+        raise ValueError(f"不支持的匹配类型: {condition.match_type}")
+    return all(expected == "*" or actual == expected for actual, expected in pairs)
+
+
+def list_namespaces(namespaces: Iterable[Namespace], op: ListNamespacesOp) -> List[Namespace]:
+    """按 ListNamespacesOp 过滤、截断并分页命名空间"""
+    selected = [ns for ns in namespaces if all(match_namespace(c, ns) for c in op.match_conditions or ())]
+    if op.max_depth is not None:
+        selected = list({ns[:op.max_depth] for ns in selected})
+    return sorted(selected)[op.offset:op.offset + op.limit]
+
+
+def check_vector_dims(vectors: Iterable[List[float]], index_config: Optional[Dict[str, Any]]) -> None:
+    """
+    在写入之前检查嵌入结果的维度，避免把维度不对的向量写进索引。
+
+    Args:
+        vectors: 嵌入函数返回的向量
+        index_config: 索引配置，None 表示不检查
+
+    Raises:
+        ValueError: 向量维度与索引配置的 dims 不一致
+    """
+    if not index_config:
+        return
+    dims = index_config["dims"]
+    for vector in vectors:
+        if len(vector) != dims:
+            raise ValueError(f"嵌入向量的维度为 {len(vector)}，与索引配置的 {dims} 不一致")
+
+
+class MatrixStore(BaseStore):
+    """
+    按命名空间维护矩阵索引的内存存储。
+
+    Args:
+        index: 与 InMemoryStore 相同的索引配置，包括 embed、dims 和可选的 fields
+    """
+
+    def __init__(self, *, index: Optional[IndexConfig] = None):
+        self._data: Dict[Namespace, Dict[str, Item]] = defaultdict(dict)
+        self._indexes: Dict[Namespace, MatrixIndex] = {}
+        self._lock = threading.RLock()
+        self.index_config = dict(index) if index else None
+        self.embeddings = ensure_embeddings(index.get("embed")) if index else None
+        self._fields = [
+            (path, tokenize_path(path) if path != "$" else path)
+            for path in ((index or {}).get("fields") or ["$"])
+        ]
+
+    def batch(self, ops: Iterable[Op]) -> List[Result]:
+        ops = list(ops)
+        texts, rows = self._texts_to_embed(ops)
+        vectors = self.embeddings.embed_documents(texts) if texts else []  # type: ignore[union-attr]
+        queries = self._queries(ops)
+        query_vectors = {query: self.embeddings.embed_query(query) for query in queries}  # type: ignore[union-attr]
+        check_vector_dims([*vectors, *query_vectors.values()], self.index_config)
+        return self._apply(ops, rows, vectors, query_vectors)
+
+    async def abatch(self, ops: Iterable[Op]) -> List[Result]:
+        ops = list(ops)
+        texts, rows = self._texts_to_embed(ops)
+        vectors = await self.embeddings.aembed_documents(texts) if texts else []  # type: ignore[union-attr]
+        query_vectors = {}
+        for query in self._queries(ops):
+            query_vectors[query] = await self.embeddings.aembed_query(query)  # type: ignore[union-attr]
+        check_vector_dims([*vectors, *query_vectors.values()], self.index_config)
+        return self._apply(ops, rows, vectors, query_vectors)
+
+    def index_stats(self) -> Dict[str, int]:
+        """命名空间数、已索引的键数和矩阵占用的字节数"""
+        with self._lock:
+            return {
+                "namespaces": len(self._indexes),
+                "keys": sum(len(index) for index in self._indexes.values()),
+                "bytes": sum(index.nbytes for index in self._indexes.values()),
+            }
+
+    def _texts_to_embed(self, ops: List[Op]) -> Tuple[List[str], List[Tuple[Namespace, str]]]:
+        """收集写入操作需要嵌入的文本，以及每段文本所属的 (命名空间, 键)"""
+        texts: List[str] = []
+        rows: List[Tuple[Namespace, str]] = []
+        if self.embeddings is None:
+            return texts, rows
+        # 同一批次中同一个键以最后一次写入为准，只嵌入最后一次写入的文本
+        for op in _last_puts(ops).values():
+            if op.value is None or op.index is False:
+                continue
+            fields = self._fields if op.index is None else [(path, tokenize_path(path)) for path in op.index]
+            for _, field in fields:
+                for text in get_text_at_path(op.value, field):
+                    texts.append(text)
+                    rows.append((op.namespace, op.key))
+        return texts, rows
+
+    def _queries(self, ops: List[Op]) -> List[str]:
+        if self.embeddings is None:
+            return []
+        return list({op.query for op in ops if isinstance(op, SearchOp) and op.query})
+
+    def _apply(
+        self,
+        ops: List[Op],
+        rows: List[Tuple[Namespace, str]],
+        vectors: List[List[float]],
+        query_vectors: Dict[str, List[float]],
+    ) -> List[Result]:
+        """先按写入前的状态回答读操作，再统一应用写入（与 InMemoryStore 的语义一致）"""
+        results: List[Result] = []
+        with self._lock:
+            for op in ops:
+                if isinstance(op, GetOp):
+                    results.append(self._data[op.namespace].get(op.key) if op.namespace in self._data else None)
+                elif isinstance(op, SearchOp):
+                    results.append(self._search(op, query_vectors.get(op.query or "")))
+                elif isinstance(op, ListNamespacesOp):
+                    results.append(list_namespaces([ns for ns, items in self._data.items() if items], op))
+                elif isinstance(op, PutOp):
+                    results.append(None)
+                else:
+                    raise ValueError(f"未知的操作类型: {type(op)}")
+
+            now = datetime.now(timezone.utc)
+            for (namespace, key), op in _last_puts(ops).items():
+                index = self._indexes.get(namespace)
+                if index is not None:
+                    index.remove(key)
+                if op.value is None:
+                    self._data[namespace].pop(key, None)
+                    continue
+                previous = self._data[namespace].get(key)
+                self._data[namespace][key] = Item(
+                    value=op.value,
+                    key=key,
+                    namespace=namespace,
+                    created_at=previous.created_at if previous is not None else now,
+                    updated_at=now,
+                )
+
+            grouped: Dict[Namespace, Tuple[List[str], List[List[float]]]] = defaultdict(lambda: ([], []))
+            for (namespace, key), vector in zip(rows, vectors):
+                grouped[namespace][0].append(key)
+                grouped[namespace][1].append(vector)
+            for namespace, (keys, namespace_vectors) in grouped.items():
+                index = self._indexes.get(namespace)
+                if index is None:
+                    index = self._indexes[namespace] = MatrixIndex(self.index_config["dims"])  # type: ignore[index]
+                index.add_batch(keys, namespace_vectors)
+        return results
+
+    def _search(self, op: SearchOp, query_vector: Optional[List[float]]) -> List[SearchItem]:
+        prefix = op.namespace_prefix
+        namespaces = [ns for ns in self._data if ns[:len(prefix)] == prefix]
+
+        if query_vector is None:
+            matched = (
+                item
+                for ns in namespaces
+                for item in self._data[ns].values()
+                if match_filter(item.value, op.filter)
+            )
+            page = []
+            for i, item in enumerate(matched):
+                if i >= op.offset + op.limit:
+                    break
+                if i >= op.offset:
+                    page.append(_search_item(item))
+            return page
+
+        # 每个命名空间取前 offset + limit 个，合并后再分页
+        wanted = op.offset + op.limit
+        scored: List[Tuple[float, Item]] = []
+        for ns in namespaces:
+            index = self._indexes.get(ns)
+            if index is None:
+                continue
+            allowed = None
+            if op.filter:
+                allowed = [key for key, item in self._data[ns].items() if match_filter(item.value, op.filter)]
+            for key, score in index.search(query_vector, limit=wanted, allowed=allowed):
+                scored.append((score, self._data[ns][key]))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        page = [_search_item(item, score) for score, item in scored[op.offset:wanted]]
+
+        if len(page) < op.limit:
+            # 没有向量的记忆排在最后，与 InMemoryStore 一致
+            for ns in namespaces:
+                index = self._indexes.get(ns)
+                for key, item in self._data[ns].items():
+                    if len(page) >= op.limit:
+                        return page
+                    if (index is None or key not in index) and match_filter(item.value, op.filter):
+                        page.append(_search_item(item))
+        return page
+
+
+def _last_puts(ops: List[Op]) -> Dict[Tuple[Namespace, str], PutOp]:
+    """每个 (命名空间, 键) 最后一次的写入操作"""
+    return {(op.namespace, op.key): op for op in ops if isinstance(op, PutOp)}
+
+
+def _search_item(item: Item, score: Optional[float] = None) -> SearchItem:
+    return SearchItem(
+        namespace=item.namespace,
+        key=item.key,
+        value=item.value,
+        created_at=item.created_at,
+        updated_at=item.updated_at,
+        score=score,
+    )
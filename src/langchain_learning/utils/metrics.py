@@ -0,0 +1,54 @@
+"""
+性能指标工具
+
+用于统计延迟、首 token 时间等指标的分位数。
+"""
+
+import math
+from typing import Dict, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    计算分位数（线性插值）。
+
+    Args:
+        values: 样本值
+        q: 分位点，取值 0-100
+
+    Returns:
+        对应的分位数，样本为空时返回 NaN
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return float(ordered[0])
+    rank = (len(ordered) - 1) * min(max(q, 0.0), 100.0) / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return float(ordered[low])
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """
+    汇总一组样本。
+
+    Args:
+        values: 样本值
+
+    Returns:
+        包含 count、mean、min、max、p50、p95 的字典
+    """
+    if not values:
+        return {"count": 0, "mean": math.nan, "min": math.nan, "max": math.nan, "p50": math.nan, "p95": math.nan}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "min": float(min(values)),
+        "max": float(max(values)),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+    }
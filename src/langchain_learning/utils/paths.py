@@ -0,0 +1,20 @@
+"""
+本地缓存目录
+"""
+
+import os
+from pathlib import Path
+
+
+def get_cache_dir() -> Path:
+    """
+    获取本地缓存目录，不存在时自动创建。
+
+    默认为当前目录下的 .cache/langchain_learning，可通过 LANGCHAIN_LEARNING_CACHE_DIR 环境变量修改。
+
+    Returns:
+        缓存目录路径
+    """
+    path = Path(os.getenv("LANGCHAIN_LEARNING_CACHE_DIR", ".cache/langchain_learning"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
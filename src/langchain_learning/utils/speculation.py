@@ -0,0 +1,270 @@
+"""
+推测式路由
+
+LLM 做意图分类的同时，先按历史猜测的意图启动对应的处理链。
+猜对时直接输出已经生成的内容，省掉一次串行的模型往返；
+猜错时取消推测的处理链，改走正确的分支，并记录浪费的 token（推测已经结束时同样记录）。
+"""
+
+import asyncio
+import operator
+import queue
+import threading
+from functools import reduce
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from langchain_learning.utils.tokens import estimate_tokens
+
+# 推测线程结束的标记
+_DONE = object()
+
+
+class IntentSpeculator:
+    """
+    推测策略和统计。
+
+    Args:
+        strategy: "last" 猜上一次的意图，"frequent" 猜出现次数最多的意图
+        priors: 各意图的初始计数，没有历史时用于猜测
+    """
+
+    def __init__(self, strategy: str = "last", priors: Optional[Dict[str, float]] = None):
+        if strategy not in ("last", "frequent"):
+            raise ValueError(f"未知的推测策略: {strategy}")
+        self.strategy = strategy
+        self._counts: Dict[str, float] = dict(priors or {})
+        self._last: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stats = {"speculations": 0, "hits": 0, "misses": 0, "wasted_tokens": 0}
+
+    def guess(self) -> Optional[str]:
+        """猜测下一次的意图，没有任何依据时返回 None"""
+        with self._lock:
+            if self.strategy == "last" and self._last is not None:
+                return self._last
+            if not self._counts:
+                return None
+            return max(self._counts.items(), key=lambda item: item[1])[0]
+
+    def record(self, intent: str) -> None:
+        """记录一次实际的意图（包括没有推测的请求）"""
+        with self._lock:
+            self._last = intent
+            self._counts[intent] = self._counts.get(intent, 0.0) + 1
+
+    def record_outcome(self, hit: bool) -> None:
+        """记录一次推测的结果"""
+        with self._lock:
+            self._stats["speculations"] += 1
+            self._stats["hits" if hit else "misses"] += 1
+
+    def add_wasted_tokens(self, tokens: int) -> None:
+        """累计被丢弃的推测请求的 token 数"""
+        with self._lock:
+            self._stats["wasted_tokens"] += tokens
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """推测次数、命中/未命中次数、命中率和浪费的 token 数（估计值）"""
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+        stats["hit_rate"] = stats["hits"] / stats["speculations"] if stats["speculations"] else 0.0
+        return stats
+
+
+def _combine(chunks: List[Any]) -> Any:
+    """把流式输出块合并成完整结果"""
+    if not chunks:
+        return ""
+    return reduce(operator.add, chunks)
+
+
+def _wasted_tokens(input: Dict[str, Any], chunks: List[Any]) -> int:
+    """估计一次被放弃的推测请求的 token 数：输入文本加上已经生成的输出"""
+    prompt = "".join(str(value) for value in input.values())
+    text = "".join(c if isinstance(c, str) else str(getattr(c, "content", "")) for c in chunks)
+    return estimate_tokens(prompt) + estimate_tokens(text)
+
+
+class SpeculativeRouter(Runnable[Dict[str, Any], Any]):
+    """
+    与意图分类并行推测执行处理链的路由器。
+
+    Args:
+        classifier: 返回意图标签的 Runnable（通常是 LLM 意图分类链）
+        routes: 意图到处理链的映射
+        speculator: 推测策略和统计
+        default: 分类结果不在 routes 中时使用的意图
+    """
+
+    def __init__(
+        self,
+        classifier: Runnable[Dict[str, Any], str],
+        routes: Dict[str, Runnable],
+        speculator: IntentSpeculator,
+        default: str = "general",
+    ):
+        self.classifier = classifier
+        self.routes = routes
+        self.speculator = speculator
+        self.default = default
+
+    def _route(self, intent: str) -> Runnable:
+        return self.routes.get(intent) or self.routes[self.default]
+
+    def invoke(self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return _combine(list(self.stream(input, config)))
+
+    async def ainvoke(self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return _combine([chunk async for chunk in self.astream(input, config)])
+
+    def stream(
+        self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[Any]:
+        """
+        流式执行：推测的处理链在后台线程运行，输出先缓冲，分类确认后再放出。
+
+        Args:
+            input: 链的输入
+            config: 运行配置
+
+        Returns:
+            处理链的输出块
+        """
+        guess = self.speculator.guess()
+        if guess is None or guess not in self.routes:
+            intent = self.classifier.invoke(input, config)
+            self.speculator.record(intent)
+            yield from self._route(intent).stream(input, config)
+            return
+
+        chunks: "queue.Queue[Any]" = queue.Queue()
+        cancelled = threading.Event()
+        errors: List[BaseException] = []
+        produced: List[Any] = []
+        # 推测线程结束和调用方放弃推测谁后发生，谁负责记录浪费的 token，保证无论推测是否已经结束都只记录一次
+        settle_lock = threading.Lock()
+        settled = {"finished": False, "discarded": False}
+
+        def discard() -> None:
+            cancelled.set()
+            with settle_lock:
+                settled["discarded"] = True
+                finished = settled["finished"]
+            if finished:
+                self.speculator.add_wasted_tokens(_wasted_tokens(input, produced))
+
+        def speculate() -> None:
+            try:
+                for chunk in self.routes[guess].stream(input, config):
+                    if cancelled.is_set():
+                        break
+                    produced.append(chunk)
+                    chunks.put(chunk)
+            except BaseException as e:  # 只有猜对时才在调用线程中重新抛出
+                errors.append(e)
+            finally:
+                with settle_lock:
+                    settled["finished"] = True
+                    discarded = settled["discarded"]
+                if discarded:
+                    # 推测被放弃，请求和已经生成的输出全部浪费
+                    self.speculator.add_wasted_tokens(_wasted_tokens(input, produced))
+                chunks.put(_DONE)
+
+        worker = threading.Thread(target=speculate, daemon=True)
+        worker.start()
+        try:
+            intent = self.classifier.invoke(input, config)
+        except BaseException:
+            discard()
+            raise
+        self.speculator.record(intent)
+
+        if self._route(intent) is not self.routes[guess]:
+            discard()
+            self.speculator.record_outcome(hit=False)
+            yield from self._route(intent).stream(input, config)
+            return
+
+        self.speculator.record_outcome(hit=True)
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _DONE:
+                    break
+                yield chunk
+        finally:
+            # 调用方提前停止读取时也结束推测线程
+            cancelled.set()
+        if errors:
+            raise errors[0]
+
+    async def astream(
+        self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """
+        异步流式执行：猜错时直接取消推测任务。
+
+        Args:
+            input: 链的输入
+            config: 运行配置
+
+        Returns:
+            处理链的输出块
+        """
+        guess = self.speculator.guess()
+        if guess is None or guess not in self.routes:
+            intent = await self.classifier.ainvoke(input, config)
+            self.speculator.record(intent)
+            async for chunk in self._route(intent).astream(input, config):
+                yield chunk
+            return
+
+        chunks: "asyncio.Queue[Any]" = asyncio.Queue()
+        produced: List[Any] = []
+
+        async def speculate() -> None:
+            try:
+                async for chunk in self.routes[guess].astream(input, config):
+                    produced.append(chunk)
+                    chunks.put_nowait(chunk)
+            finally:
+                chunks.put_nowait(_DONE)
+
+        task = asyncio.ensure_future(speculate())
+        try:
+            intent = await self.classifier.ainvoke(input, config)
+        except BaseException:
+            await self._discard(task, input, produced)
+            raise
+        self.speculator.record(intent)
+
+        if self._route(intent) is not self.routes[guess]:
+            await self._discard(task, input, produced)
+            self.speculator.record_outcome(hit=False)
+            async for chunk in self._route(intent).astream(input, config):
+                yield chunk
+            return
+
+        self.speculator.record_outcome(hit=True)
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is _DONE:
+                    break
+                yield chunk
+        finally:
+            task.cancel()
+            # 取回任务的结果，避免出现 "Task exception was never retrieved"
+            (outcome,) = await asyncio.gather(task, return_exceptions=True)
+        if isinstance(outcome, BaseException) and not isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+
+    async def _discard(self, task: "asyncio.Future[None]", input: Dict[str, Any], produced: List[Any]) -> None:
+        """取消猜错的推测任务并等待它结束，无论它是否已经完成都记录浪费的 token"""
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.speculator.add_wasted_tokens(_wasted_tokens(input, produced))
@@ -0,0 +1,409 @@
+"""
+基于 SQLite 的持久化记忆存储
+
+与 MatrixStore 的接口和搜索语义相同，但记忆和嵌入向量都保存在 SQLite（WAL 模式）中：
+
+- 命名空间以 "." 连接后作为主键前缀，前缀搜索是一次主键上的范围扫描
+- 一个批次中的所有写入在同一个事务中完成
+- 向量以 float32 字节串保存，重启后不需要重新计算嵌入；值和索引字段都没有变化的写入也不会重新嵌入
+- 每个命名空间的矩阵索引在第一次语义搜索时才从数据库加载
+"""
+
+import json
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+from langgraph.store.base import (
+    BaseStore,
+    GetOp,
+    IndexConfig,
+    Item,
+    ListNamespacesOp,
+    Op,
+    PutOp,
+    Result,
+    SearchItem,
+    SearchOp,
+    ensure_embeddings,
+    get_text_at_path,
+    tokenize_path,
+)
+
+from langchain_learning.utils.matrix_store import (
+    _last_puts,
+    _search_item,
+    check_vector_dims,
+    list_namespaces,
+    match_filter,
+)
+from langchain_learning.utils.vector_index import MatrixIndex
+
+Namespace = Tuple[str, ...]
+
+# 命名空间各段的分隔符（LangGraph 不允许命名空间中出现 "."）
+_SEP = "."
+
+# 单条 SQL 中 IN (...) 的最大参数个数
+_MAX_SQL_PARAMS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS store (
+    prefix TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (prefix, key)
+);
+CREATE TABLE IF NOT EXISTS store_vectors (
+    prefix TEXT NOT NULL,
+    key TEXT NOT NULL,
+    field TEXT NOT NULL,
+    vector BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS store_vectors_prefix_key ON store_vectors (prefix, key);
+CREATE TABLE IF NOT EXISTS store_meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _prefix(namespace: Namespace) -> str:
+    return _SEP.join(namespace)
+
+
+def _prefix_range(namespace_prefix: Namespace) -> Tuple[str, List[str]]:
+    """命名空间前缀对应的 WHERE 子句和参数，能够使用 (prefix, key) 主键上的范围扫描"""
+    if not namespace_prefix:
+        return "1 = 1", []
+    prefix = _prefix(namespace_prefix)
+    # 子命名空间的 prefix 都以 "a.b." 开头，落在 ["a.b.", "a.b/") 区间内（"/" 紧跟在 "." 之后）
+    return "(prefix = ? OR (prefix >= ? AND prefix < ?))", [prefix, prefix + _SEP, prefix + chr(ord(_SEP) + 1)]
+
+
+def _chunks(values: Sequence[Any], size: int = _MAX_SQL_PARAMS) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SQLiteStore(BaseStore):
+    """
+    SQLite 持久化存储，语义搜索使用按命名空间懒加载的 MatrixIndex。
+
+    Args:
+        path: SQLite 文件路径，None 表示只保存在内存中
+        index: 与 InMemoryStore 相同的索引配置，包括 embed、dims 和可选的 fields
+
+    Raises:
+        ValueError: 数据库中已有向量的维度与 index 配置的 dims 不一致；写入时嵌入结果的维度不一致也会报错
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, *, index: Optional[IndexConfig] = None):
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path) if path is not None else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._indexes: Dict[str, MatrixIndex] = {}
+        self.index_config = dict(index) if index else None
+        self.embeddings = ensure_embeddings(index.get("embed")) if index else None
+        self._fields = list((index or {}).get("fields") or ["$"])
+        if index:
+            self._check_dims(index["dims"])
+
+    def _check_dims(self, dims: int) -> None:
+        row = self._conn.execute("SELECT value FROM store_meta WHERE name = 'dims'").fetchone()
+        if row is None:
+            with self._conn:
+                self._conn.execute("INSERT INTO store_meta (name, value) VALUES ('dims', ?)", (str(dims),))
+        elif int(row[0]) != dims:
+            raise ValueError(f"数据库中的向量维度为 {row[0]}，与索引配置的 {dims} 不一致，请使用新的数据库文件")
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def batch(self, ops: Iterable[Op]) -> List[Result]:
+        ops = list(ops)
+        texts, rows, unchanged = self._texts_to_embed(ops)
+        vectors = self.embeddings.embed_documents(texts) if texts else []  # type: ignore[union-attr]
+        queries = self._queries(ops)
+        query_vectors = {query: self.embeddings.embed_query(query) for query in queries}  # type: ignore[union-attr]
+        check_vector_dims([*vectors, *query_vectors.values()], self.index_config)
+        return self._apply(ops, rows, vectors, query_vectors, unchanged)
+
+    async def abatch(self, ops: Iterable[Op]) -> List[Result]:
+        ops = list(ops)
+        texts, rows, unchanged = self._texts_to_embed(ops)
+        vectors = await self.embeddings.aembed_documents(texts) if texts else []  # type: ignore[union-attr]
+        query_vectors = {}
+        for query in self._queries(ops):
+            query_vectors[query] = await self.embeddings.aembed_query(query)  # type: ignore[union-attr]
+        check_vector_dims([*vectors, *query_vectors.values()], self.index_config)
+        return self._apply(ops, rows, vectors, query_vectors, unchanged)
+
+    def index_stats(self) -> Dict[str, int]:
+        """已加载到内存的命名空间数、键数和矩阵占用的字节数，以及数据库中的向量行数"""
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM store_vectors").fetchone()[0]
+            return {
+                "namespaces": len(self._indexes),
+                "keys": sum(len(index) for index in self._indexes.values()),
+                "bytes": sum(index.nbytes for index in self._indexes.values()),
+                "stored_vectors": stored,
+            }
+
+    def _op_fields(self, op: PutOp) -> List[str]:
+        return self._fields if op.index is None else list(op.index or [])
+
+    def _texts_to_embed(
+        self, ops: List[Op]
+    ) -> Tuple[List[str], List[Tuple[Namespace, str, str]], Set[Tuple[Namespace, str]]]:
+        """
+        收集写入操作需要嵌入的文本，以及每段文本所属的 (命名空间, 键, 字段)。
+
+        值没有变化、且已保存的向量字段与本次要索引的字段相同的写入不需要重新嵌入，
+        这些 (命名空间, 键) 作为第三个返回值，写入时保留其原有向量。
+        """
+        texts: List[str] = []
+        rows: List[Tuple[Namespace, str, str]] = []
+        unchanged: Set[Tuple[Namespace, str]] = set()
+        if self.embeddings is None:
+            return texts, rows, unchanged
+        puts = [op for op in _last_puts(ops).values() if op.value is not None and op.index is not False]
+        with self._lock:
+            stored = self._stored_state([(op.namespace, op.key) for op in puts])
+        for op in puts:
+            pending = [
+                (path, text)
+                for path in self._op_fields(op)
+                for text in get_text_at_path(op.value, tokenize_path(path) if path != "$" else path)
+            ]
+            previous = stored.get((_prefix(op.namespace), op.key))
+            if previous is not None and previous == (op.value, {path for path, _ in pending}):
+                unchanged.add((op.namespace, op.key))
+                continue
+            for path, text in pending:
+                texts.append(text)
+                rows.append((op.namespace, op.key, path))
+        return texts, rows, unchanged
+
+    def _stored_state(self, keys: List[Tuple[Namespace, str]]) -> Dict[Tuple[str, str], Tuple[Any, Set[str]]]:
+        """已保存记忆的 (值, 已索引的字段集合)"""
+        by_prefix: Dict[str, List[str]] = defaultdict(list)
+        for namespace, key in keys:
+            by_prefix[_prefix(namespace)].append(key)
+        state: Dict[Tuple[str, str], Tuple[Any, Set[str]]] = {}
+        for prefix, prefix_keys in by_prefix.items():
+            for chunk in _chunks(prefix_keys):
+                placeholders = ",".join("?" * len(chunk))
+                for key, value in self._conn.execute(
+                    f"SELECT key, value FROM store WHERE prefix = ? AND key IN ({placeholders})", [prefix, *chunk]
+                ):
+                    state[(prefix, key)] = (json.loads(value), set())
+                for key, field in self._conn.execute(
+                    f"SELECT DISTINCT key, field FROM store_vectors WHERE prefix = ? AND key IN ({placeholders})",
+                    [prefix, *chunk],
+                ):
+                    if (prefix, key) in state:
+                        state[(prefix, key)][1].add(field)
+        return state
+
+    def _queries(self, ops: List[Op]) -> List[str]:
+        if self.embeddings is None:
+            return []
+        return list({op.query for op in ops if isinstance(op, SearchOp) and op.query})
+
+    def _apply(
+        self,
+        ops: List[Op],
+        rows: List[Tuple[Namespace, str, str]],
+        vectors: List[List[float]],
+        query_vectors: Dict[str, List[float]],
+        unchanged: Set[Tuple[Namespace, str]],
+    ) -> List[Result]:
+        """先按写入前的状态回答读操作，再在一个事务中应用所有写入（与 InMemoryStore 的语义一致）"""
+        results: List[Result] = []
+        with self._lock:
+            for op in ops:
+                if isinstance(op, GetOp):
+                    results.append(self._get(op.namespace, op.key))
+                elif isinstance(op, SearchOp):
+                    results.append(self._search(op, query_vectors.get(op.query or "")))
+                elif isinstance(op, ListNamespacesOp):
+                    prefixes = [row[0] for row in self._conn.execute("SELECT DISTINCT prefix FROM store")]
+                    results.append(list_namespaces([tuple(p.split(_SEP)) for p in prefixes], op))
+                elif isinstance(op, PutOp):
+                    results.append(None)
+                else:
+                    raise ValueError(f"未知的操作类型: {type(op)}")
+
+            puts = _last_puts(ops)
+            if puts:
+                self._write(puts, rows, vectors, unchanged)
+        return results
+
+    def _write(
+        self,
+        puts: Dict[Tuple[Namespace, str], PutOp],
+        rows: List[Tuple[Namespace, str, str]],
+        vectors: List[List[float]],
+        unchanged: Set[Tuple[Namespace, str]],
+    ) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        deleted = [(_prefix(ns), key) for (ns, key), op in puts.items() if op.value is None]
+        upserts = [
+            (_prefix(ns), key, json.dumps(op.value, ensure_ascii=False), now, now)
+            for (ns, key), op in puts.items()
+            if op.value is not None
+        ]
+        # 除了值未变化而跳过嵌入的记忆，其余写入都要清掉旧向量
+        stale = [(_prefix(ns), key) for ns, key in puts if (ns, key) not in unchanged]
+        blobs = [
+            (_prefix(ns), key, field, np.asarray(vector, dtype=np.float32).tobytes())
+            for (ns, key, field), vector in zip(rows, vectors)
+        ]
+
+        with self._conn:
+            self._conn.executemany("DELETE FROM store WHERE prefix = ? AND key = ?", deleted)
+            self._conn.executemany(
+                "INSERT INTO store (prefix, key, value, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (prefix, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                upserts,
+            )
+            self._conn.executemany("DELETE FROM store_vectors WHERE prefix = ? AND key = ?", stale)
+            self._conn.executemany(
+                "INSERT INTO store_vectors (prefix, key, field, vector) VALUES (?, ?, ?, ?)", blobs
+            )
+
+        # 已加载的索引同步更新，未加载的命名空间下次搜索时再从数据库读取
+        for prefix, key in stale:
+            index = self._indexes.get(prefix)
+            if index is not None:
+                index.remove(key)
+        grouped: Dict[str, Tuple[List[str], List[List[float]]]] = defaultdict(lambda: ([], []))
+        for (namespace, key, _), vector in zip(rows, vectors):
+            grouped[_prefix(namespace)][0].append(key)
+            grouped[_prefix(namespace)][1].append(vector)
+        for prefix, (keys, prefix_vectors) in grouped.items():
+            index = self._indexes.get(prefix)
+            if index is not None:
+                index.add_batch(keys, prefix_vectors)
+
+    def _load_index(self, prefix: str) -> MatrixIndex:
+        """从数据库加载一个命名空间的全部向量，构建矩阵索引"""
+        index = self._indexes.get(prefix)
+        if index is not None:
+            return index
+        dims = self.index_config["dims"]  # type: ignore[index]
+        keys: List[str] = []
+        blobs: List[bytes] = []
+        for key, blob in self._conn.execute(
+            "SELECT key, vector FROM store_vectors WHERE prefix = ?", (prefix,)
+        ):
+            keys.append(key)
+            blobs.append(blob)
+        index = MatrixIndex(dims, capacity=max(1024, len(keys)))
+        if keys:
+            index.add_batch(keys, np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(keys), dims))
+        self._indexes[prefix] = index
+        return index
+
+    def _get(self, namespace: Namespace, key: str) -> Optional[Item]:
+        row = self._conn.execute(
+            "SELECT prefix, key, value, created_at, updated_at FROM store WHERE prefix = ? AND key = ?",
+            (_prefix(namespace), key),
+        ).fetchone()
+        return _item(row) if row is not None else None
+
+    def _fetch(self, prefix: str, keys: Sequence[str]) -> Dict[str, Item]:
+        items: Dict[str, Item] = {}
+        for chunk in _chunks(keys):
+            placeholders = ",".join("?" * len(chunk))
+            for row in self._conn.execute(
+                f"SELECT prefix, key, value, created_at, updated_at FROM store "
+                f"WHERE prefix = ? AND key IN ({placeholders})",
+                [prefix, *chunk],
+            ):
+                items[row[1]] = _item(row)
+        return items
+
+    def _search(self, op: SearchOp, query_vector: Optional[List[float]]) -> List[SearchItem]:
+        where, params = _prefix_range(op.namespace_prefix)
+        columns = "prefix, key, value, created_at, updated_at"
+
+        if query_vector is None:
+            if not op.filter:
+                cursor = self._conn.execute(
+                    f"SELECT {columns} FROM store WHERE {where} ORDER BY prefix, rowid LIMIT ? OFFSET ?",
+                    [*params, op.limit, op.offset],
+                )
+                return [_search_item(_item(row)) for row in cursor]
+            cursor = self._conn.execute(f"SELECT {columns} FROM store WHERE {where} ORDER BY prefix, rowid", params)
+            matched = (item for item in map(_item, cursor) if match_filter(item.value, op.filter))
+            page = []
+            for i, item in enumerate(matched):
+                if i >= op.offset + op.limit:
+                    break
+                if i >= op.offset:
+                    page.append(_search_item(item))
+            return page
+
+        # 每个命名空间取前 offset + limit 个，合并后再分页
+        wanted = op.offset + op.limit
+        cursor = self._conn.execute(f"SELECT DISTINCT prefix FROM store_vectors WHERE {where}", params)
+        prefixes = [row[0] for row in cursor]
+        scored: List[Tuple[float, str, str]] = []
+        for prefix in prefixes:
+            allowed = None
+            if op.filter:
+                allowed = [
+                    key
+                    for key, value in self._conn.execute("SELECT key, value FROM store WHERE prefix = ?", (prefix,))
+                    if match_filter(json.loads(value), op.filter)
+                ]
+            for key, score in self._load_index(prefix).search(query_vector, limit=wanted, allowed=allowed):
+                scored.append((score, prefix, key))
+        scored.sort(key=lambda triple: triple[0], reverse=True)
+        scored = scored[op.offset:wanted]
+
+        by_prefix: Dict[str, List[str]] = defaultdict(list)
+        for _, prefix, key in scored:
+            by_prefix[prefix].append(key)
+        items = {prefix: self._fetch(prefix, keys) for prefix, keys in by_prefix.items()}
+        page = [_search_item(items[prefix][key], score) for score, prefix, key in scored]
+
+        if len(page) < op.limit:
+            # 没有向量的记忆排在最后，与 InMemoryStore 一致
+            cursor = self._conn.execute(
+                f"SELECT {columns} FROM store AS s WHERE {where} AND NOT EXISTS "
+                f"(SELECT 1 FROM store_vectors AS v WHERE v.prefix = s.prefix AND v.key = s.key) "
+                f"ORDER BY s.prefix, s.rowid",
+                params,
+            )
+            for item in map(_item, cursor):
+                if len(page) >= op.limit:
+                    break
+                if match_filter(item.value, op.filter):
+                    page.append(_search_item(item))
+        return page
+
+
+def _item(row: Tuple[str, str, str, str, str]) -> Item:
+    prefix, key, value, created_at, updated_at = row
+    return Item(
+        value=json.loads(value),
+        key=key,
+        namespace=tuple(prefix.split(_SEP)),
+        created_at=datetime.fromisoformat(created_at),
+        updated_at=datetime.fromisoformat(updated_at),
+    )
@@ -0,0 +1,152 @@
+"""
+限帧的流式输出渲染器
+
+一个线程读取模型的流式响应，当前线程按固定帧率刷新 Rich Live 区域，
+避免快速模型逐块打印时终端渲染成为瓶颈。文本块先放进列表，结束时只拼接一次，
+并统计首 token 时间和生成速度。
+
+Live 区域超出终端高度后无法再回到上方重绘，多出的部分会在每一帧重复打印，
+因此生成过程中超出屏幕的部分以省略号截断，结束时 Live 最后一次刷新会把完整回复打印一次。
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional
+
+from rich.console import Console
+from rich.live import Live
+from rich.text import Text
+
+# 读取线程结束的标记
+_DONE = object()
+
+
+@dataclass
+class StreamResult:
+    """
+    一次流式输出的结果。
+
+    Attributes:
+        text: 完整的回复文本
+        ttft: 首 token 时间（秒），没有输出时为 None
+        total_time: 总耗时（秒）
+        output_tokens: 输出 token 数，服务端未返回用量时为文本块数
+    """
+
+    text: str
+    ttft: Optional[float]
+    total_time: float
+    output_tokens: int
+
+    @property
+    def tokens_per_second(self) -> float:
+        """首 token 之后的生成速度"""
+        generation_time = self.total_time - (self.ttft or 0.0)
+        return self.output_tokens / generation_time if generation_time > 0 else 0.0
+
+    def summary(self) -> str:
+        """格式化的统计信息"""
+        ttft = f"{self.ttft:.2f}s" if self.ttft is not None else "-"
+        return (
+            f"首token {ttft}, 总耗时 {self.total_time:.2f}s, "
+            f"{self.output_tokens} tokens, {self.tokens_per_second:.1f} tok/s"
+        )
+
+
+class StreamRenderer:
+    """
+    在后台线程读取流、在当前线程限帧渲染的输出器。
+
+    Args:
+        console: Rich 控制台
+        fps: 每秒最多刷新的帧数
+        prefix: 显示在回复前面的文本（支持 Rich 标记）
+        show_stats: 结束时是否打印首 token 时间和生成速度
+    """
+
+    def __init__(
+        self,
+        console: Optional[Console] = None,
+        fps: float = 15.0,
+        prefix: str = "",
+        show_stats: bool = True,
+    ):
+        self.console = console or Console()
+        self.frame_interval = 1.0 / fps
+        self.prefix = prefix
+        self.show_stats = show_stats
+
+    def render(self, stream: Iterable[Any]) -> StreamResult:
+        """
+        渲染一个流式响应。
+
+        Args:
+            stream: 模型 stream() 返回的迭代器，元素为消息块或字符串
+
+        Returns:
+            完整文本和时间统计
+        """
+        chunks: "queue.Queue[Any]" = queue.Queue()
+        start = time.perf_counter()
+        first_token: List[float] = []
+        usage_tokens: List[int] = []
+        errors: List[BaseException] = []
+
+        def read() -> None:
+            try:
+                for chunk in stream:
+                    content = chunk if isinstance(chunk, str) else getattr(chunk, "content", "")
+                    usage = getattr(chunk, "usage_metadata", None)
+                    if usage:
+                        usage_tokens.append(usage.get("output_tokens", 0))
+                    if content:
+                        if not first_token:
+                            first_token.append(time.perf_counter() - start)
+                        chunks.put(content if isinstance(content, str) else str(content))
+            except BaseException as e:  # 在渲染线程中重新抛出
+                errors.append(e)
+            finally:
+                chunks.put(_DONE)
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+
+        parts: List[str] = []
+        display = Text.from_markup(self.prefix) if self.prefix else Text()
+        done = False
+        with Live(display, console=self.console, auto_refresh=False, vertical_overflow="ellipsis") as live:
+            while not done:
+                # 等待下一块，然后取走这一帧内到达的所有块
+                deadline = time.perf_counter() + self.frame_interval
+                batch: List[str] = []
+                while True:
+                    timeout = deadline - time.perf_counter()
+                    try:
+                        item = chunks.get(timeout=max(timeout, 0.0)) if timeout > 0 else chunks.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        done = True
+                        break
+                    batch.append(item)
+                if batch:
+                    parts.extend(batch)
+                    display.append("".join(batch))
+                    live.update(display, refresh=True)
+
+        reader.join()
+        total = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+
+        result = StreamResult(
+            text="".join(parts),
+            ttft=first_token[0] if first_token else None,
+            total_time=total,
+            output_tokens=usage_tokens[-1] if usage_tokens else len(parts),
+        )
+        if self.show_stats:
+            self.console.print(f"[dim]{result.summary()}[/dim]")
+        return result
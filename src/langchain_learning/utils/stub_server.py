@@ -0,0 +1,438 @@
+"""
+本地硅基流动替身服务
+
+实现 OpenAI 兼容的 /v1/chat/completions（流式、非流式、工具调用）、
+/v1/embeddings 和 /v1/models 接口，用于离线的负载和延迟测试。
+延迟、生成速度、错误率和 429 限流都可以配置。
+
+把 SILICONFLOW_BASE_URL 指向本服务即可让所有示例离线运行:
+
+    python -m langchain_learning.utils.stub_server --port 8765 --latency 0.2
+    SILICONFLOW_BASE_URL=http://127.0.0.1:8765/v1 python src/langchain_learning/examples/advanced_agent.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_learning.utils.tokens import estimate_tokens
+
+DEFAULT_MODELS = [
+    "Qwen/Qwen3-8B",
+    "deepseek-ai/DeepSeek-R1-0528-Qwen3-8B",
+    "THUDM/GLM-Z1-9B-0414",
+    "THUDM/glm-4-9b-chat",
+    "BAAI/bge-large-zh-v1.5",
+]
+
+# 回复文本按字切分为 token，模拟中文模型逐字输出
+DEFAULT_REPLY = "这是来自本地测试服务的回复，用于离线测试延迟和吞吐。"
+
+
+@dataclass
+class StubConfig:
+    """
+    替身服务的行为配置。
+
+    Attributes:
+        latency: 返回首个 token 之前的延迟（秒）
+        tokens_per_second: 流式输出速度，0 表示不限速
+        error_rate: 返回 500 错误的概率
+        rate_limit_rate: 返回 429 限流的概率
+        retry_after: 429 响应中 Retry-After 头的秒数
+        reply: 普通对话的回复文本
+        completion_tokens: 回复的 token 数，超过 reply 长度时循环填充
+        embedding_dims: 嵌入向量维度
+        models: /v1/models 返回的模型列表
+        seed: 错误注入的随机种子
+    """
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    reply: str = DEFAULT_REPLY
+    completion_tokens: int = 32
+    embedding_dims: int = 1024
+    models: List[str] = field(default_factory=lambda: list(DEFAULT_MODELS))
+    seed: Optional[int] = None
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    """取出消息中的文本内容"""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def _bigrams(text: str) -> set:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _choose_tool(tools: List[Dict[str, Any]], text: str) -> Optional[Dict[str, Any]]:
+    """
+    根据用户输入选择要调用的工具。
+
+    工具名直接出现在输入中优先，否则按描述和输入共有的二元字串打分，没有重叠时不调用工具。
+    """
+    best, best_score = None, 0
+    text_bigrams = _bigrams(text)
+    for tool in tools:
+        function = tool.get("function", {})
+        name = function.get("name", "")
+        if name and name in text:
+            return function
+        description = function.get("description", "").replace("工具", "").replace("模拟", "")
+        score = len(_bigrams(description) & text_bigrams)
+        if score > best_score:
+            best, best_score = function, score
+    return best
+
+
+def _tool_arguments(function: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """按照工具参数的 JSON Schema 构造必填参数"""
+    schema = function.get("parameters", {})
+    properties = schema.get("properties", {})
+    required = set(schema.get("required", properties))
+    arguments: Dict[str, Any] = {}
+    for name, spec in properties.items():
+        if name not in required:
+            continue
+        kind = spec.get("type")
+        if kind == "integer":
+            arguments[name] = 1
+        elif kind == "number":
+            arguments[name] = 1.0
+        elif kind == "boolean":
+            arguments[name] = True
+        else:
+            arguments[name] = text
+    return arguments
+
+
+class StubServer:
+    """
+    在后台线程中运行的替身服务。
+
+    也可以作为上下文管理器使用:
+
+        with StubServer(StubConfig(latency=0.1)) as server:
+            os.environ["SILICONFLOW_BASE_URL"] = server.base_url
+    """
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StubConfig()
+        self.stats: Dict[str, int] = {"requests": 0, "rate_limited": 0, "errors": 0}
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._started = int(time.time())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """客户端使用的 base_url"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubServer":
+        """在后台线程启动服务"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """在当前线程运行服务"""
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        """停止服务"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def inject_failure(self) -> Optional[int]:
+        """按配置的概率决定本次请求是否返回错误状态码"""
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._random.random()
+            if roll < self.config.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return 429
+            if roll < self.config.rate_limit_rate + self.config.error_rate:
+                self.stats["errors"] += 1
+                return 500
+        return None
+
+    def completion(self, request: Dict[str, Any]) -> Tuple[List[str], Optional[Dict[str, Any]], Dict[str, int]]:
+        """
+        根据请求生成回复。
+
+        Returns:
+            (回复 token 列表, 工具调用, token 用量)
+        """
+        messages = request.get("messages", [])
+        prompt_tokens = sum(estimate_tokens(_message_text(m)) for m in messages)
+        last = messages[-1] if messages else {}
+        user_text = _message_text(last)
+
+        tool_call = None
+        if request.get("tools") and last.get("role") == "user":
+            function = _choose_tool(request["tools"], user_text)
+            if function is not None:
+                tool_call = {
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {
+                        "name": function["name"],
+                        "arguments": json.dumps(_tool_arguments(function, user_text), ensure_ascii=False),
+                    },
+                }
+
+        if tool_call is not None:
+            tokens: List[str] = []
+            completion_tokens = estimate_tokens(tool_call["function"]["arguments"]) + 1
+        else:
+            reply = self.config.reply
+            if last.get("role") == "tool":
+                reply = f"已完成: {user_text}"
+            count = self.config.completion_tokens
+            max_tokens = request.get("max_tokens") or request.get("max_completion_tokens")
+            if max_tokens:
+                count = min(count, int(max_tokens))
+            tokens = [reply[i % len(reply)] for i in range(max(count, 1))]
+            completion_tokens = len(tokens)
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return tokens, tool_call, usage
+
+    def embedding(self, text: str, dims: int) -> List[float]:
+        """按文本内容生成确定性的单位向量"""
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(dims)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+def _make_handler(server: StubServer) -> type:
+    """创建绑定到指定服务实例的请求处理类"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            # 压测时不输出访问日志
+            pass
+
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.rstrip("/") != "/v1/models":
+                self._send_json(404, {"error": {"message": f"未知路径: {self.path}", "type": "not_found"}})
+                return
+            data = [{"id": m, "object": "model", "created": server._started, "owned_by": "stub"} for m in server.config.models]
+            # 模型列表不变时支持 ETag 条件请求
+            etag = '"' + hashlib.sha1(json.dumps(data).encode("utf-8")).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send_json(200, {"object": "list", "data": data}, headers={"ETag": etag})
+
+        def do_POST(self) -> None:  # noqa: N802
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "请求体不是有效的 JSON", "type": "invalid_request_error"}})
+                return
+
+            path = self.path.rstrip("/")
+            if path not in ("/v1/chat/completions", "/v1/embeddings"):
+                self._send_json(404, {"error": {"message": f"未知路径: {self.path}", "type": "not_found"}})
+                return
+
+            status = server.inject_failure()
+            if status == 429:
+                self._send_json(
+                    429,
+                    {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                    {"Retry-After": f"{server.config.retry_after:g}"},
+                )
+                return
+            if status == 500:
+                self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                return
+
+            if path == "/v1/embeddings":
+                self._embeddings(request)
+            elif request.get("stream"):
+                self._stream_completion(request)
+            else:
+                self._completion(request)
+
+        def _embeddings(self, request: Dict[str, Any]) -> None:
+            inputs = request.get("input", [])
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            dims = int(request.get("dimensions") or server.config.embedding_dims)
+            time.sleep(server.config.latency)
+            data = []
+            prompt_tokens = 0
+            for index, item in enumerate(inputs):
+                text = item if isinstance(item, str) else json.dumps(item)
+                prompt_tokens += estimate_tokens(text)
+                data.append({"object": "embedding", "index": index, "embedding": server.embedding(text, dims)})
+            self._send_json(
+                200,
+                {
+                    "object": "list",
+                    "data": data,
+                    "model": request.get("model", ""),
+                    "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+                },
+            )
+
+        def _completion(self, request: Dict[str, Any]) -> None:
+            tokens, tool_call, usage = server.completion(request)
+            rate = server.config.tokens_per_second
+            time.sleep(server.config.latency + (len(tokens) / rate if rate > 0 else 0.0))
+            message: Dict[str, Any] = {"role": "assistant", "content": "".join(tokens)}
+            if tool_call is not None:
+                message["tool_calls"] = [tool_call]
+            self._send_json(
+                200,
+                {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", ""),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": message,
+                            "finish_reason": "tool_calls" if tool_call else "stop",
+                        }
+                    ],
+                    "usage": usage,
+                },
+            )
+
+        def _stream_completion(self, request: Dict[str, Any]) -> None:
+            tokens, tool_call, usage = server.completion(request)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            model = request.get("model", "")
+
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+                return {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            time.sleep(server.config.latency)
+            self._send_event(chunk({"role": "assistant", "content": ""}))
+            if tool_call is not None:
+                self._send_event(chunk({"tool_calls": [{"index": 0, **tool_call}]}))
+            interval = 1.0 / server.config.tokens_per_second if server.config.tokens_per_second > 0 else 0.0
+            for token in tokens:
+                if interval:
+                    time.sleep(interval)
+                self._send_event(chunk({"content": token}))
+            self._send_event(chunk({}, "tool_calls" if tool_call else "stop"))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                final = chunk({})
+                final["choices"] = []
+                final["usage"] = usage
+                self._send_event(final)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _send_event(self, payload: Dict[str, Any]) -> None:
+            self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main() -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容的硅基流动替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="首个 token 前的延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="流式输出速度，0 表示不限速")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 错误的概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 限流的概率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After 秒数")
+    parser.add_argument("--completion-tokens", type=int, default=32, help="每次回复的 token 数")
+    parser.add_argument("--embedding-dims", type=int, default=1024, help="嵌入向量维度")
+    parser.add_argument("--seed", type=int, default=None, help="错误注入的随机种子")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        completion_tokens=args.completion_tokens,
+        embedding_dims=args.embedding_dims,
+        seed=args.seed,
+    )
+    server = StubServer(config, host=args.host, port=args.port)
+    print(f"替身服务已启动: {server.base_url}")
+    print(f"使用方式: SILICONFLOW_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+
+
+if __name__ == "__main__":
+    main()
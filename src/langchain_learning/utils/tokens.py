@@ -0,0 +1,19 @@
+"""
+不依赖分词器的 token 数估计
+"""
+
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估计文本的 token 数：中文按每字一个 token，其他字符按每 4 个一个 token。
+
+    Args:
+        text: 文本
+
+    Returns:
+        估计的 token 数
+    """
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿" or "　" <= ch <= "〿" or "＀" <= ch <= "￯")
+    return cjk + math.ceil((len(text) - cjk) / 4)
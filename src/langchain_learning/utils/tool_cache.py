@@ -0,0 +1,356 @@
+"""
+幂等工具的结果缓存
+
+cached_tool 装饰器放在 @tool 和函数之间，为结果只取决于参数（或变化缓慢）的工具加上缓存:
+
+    @tool
+    @cached_tool(ttl=600, normalize={"location": str.strip}, backend=get_tool_cache)
+    def weather_search(location: str) -> str:
+        ...
+
+参数先规范化（默认把字符串首尾空白去掉、连续空白合并），再计算缓存键；函数本身也以规范化后的参数调用。
+每个工具有自己的 TTL 和 LRU 内存缓存，可选的共享 SQLite 后端让不同会话、不同进程之间复用结果。
+同一时刻相同参数的并发调用只会执行一次，其余调用等待并共享结果。异常不会被缓存。
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar, Union
+
+from langchain_learning.utils.paths import get_cache_dir
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# 缓存未命中的标记（None 也可能是合法的工具结果）
+_MISSING = object()
+
+
+class ToolResultCache:
+    """
+    工具结果的共享 SQLite 缓存，可以被多个工具、多个会话和进程共用。
+
+    Args:
+        path: SQLite 文件路径，None 表示只保存在内存中
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path) if path is not None else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache ("
+            "key TEXT PRIMARY KEY, tool TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """
+        查找缓存的结果。
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            (结果, 过期时间)，未命中或已过期时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM tool_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                self._conn.execute("DELETE FROM tool_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return json.loads(value), expires_at
+
+    def put(self, key: str, tool: str, value: Any, expires_at: Optional[float]) -> bool:
+        """
+        写入结果，结果不能序列化为 JSON 时跳过。
+
+        Args:
+            key: 缓存键
+            tool: 工具名称
+            value: 工具结果
+            expires_at: 过期时间（time.time()），None 表示永不过期
+
+        Returns:
+            是否写入
+        """
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return False
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, tool, value, expires_at) VALUES (?, ?, ?, ?)",
+                (key, tool, payload, expires_at),
+            )
+            self._conn.commit()
+        return True
+
+    def prune(self) -> int:
+        """删除所有已过期的结果，返回删除的条数"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM tool_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self, tool: Optional[str] = None) -> None:
+        """
+        清空缓存。
+
+        Args:
+            tool: 只清空该工具的结果，None 表示全部清空
+        """
+        with self._lock:
+            if tool is None:
+                self._conn.execute("DELETE FROM tool_cache")
+            else:
+                self._conn.execute("DELETE FROM tool_cache WHERE tool = ?", (tool,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()[0]
+
+
+Backend = Union[ToolResultCache, Callable[[], ToolResultCache]]
+
+
+def normalize_text(value: Any) -> Any:
+    """默认的参数规范化：字符串去掉首尾空白并合并连续空白，其他值保持不变"""
+    return " ".join(value.split()) if isinstance(value, str) else value
+
+
+class _ToolCache:
+    """单个工具的 LRU 内存缓存、共享后端和命中统计"""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: Optional[float],
+        max_size: int,
+        backend: Optional[Backend],
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self._backend = backend
+        self._memory: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0}
+
+    @property
+    def backend(self) -> Optional[ToolResultCache]:
+        """共享后端，传入工厂函数时在第一次使用时创建"""
+        if self._backend is not None and not isinstance(self._backend, ToolResultCache):
+            self._backend = self._backend()
+        return self._backend  # type: ignore[return-value]
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["size"] = len(self._memory)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            for key in self._stats:
+                self._stats[key] = 0
+        backend = self.backend
+        if backend is not None:
+            backend.clear(self.name)
+
+    def lookup(self, key: str) -> Any:
+        """依次查找内存和共享后端，未命中返回 _MISSING"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+        backend = self.backend
+        if backend is not None:
+            found = backend.get(key)
+            if found is not None:
+                value, expires_at = found
+                with self._lock:
+                    self._remember(key, expires_at, value)
+                    self._stats["shared_hits"] += 1
+                return value
+        return _MISSING
+
+    def store(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._remember(key, expires_at, value)
+        backend = self.backend
+        if backend is not None:
+            backend.put(key, self.name, value, expires_at)
+
+    def _remember(self, key: str, expires_at: Optional[float], value: Any) -> None:
+        """在持有锁的情况下写入内存层并淘汰最久未使用的条目"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def call(self, key: str, compute: Callable[[], Any]) -> Any:
+        """带并发合并的同步调用：相同键同时只计算一次，其余调用等待后读取结果"""
+        while True:
+            value = self.lookup(key)
+            if value is not _MISSING:
+                return value
+            with self._lock:
+                if key in self._memory:
+                    continue  # 查找之后刚被其他线程写入
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    done = self._inflight[key] = threading.Event()
+                    self._stats["misses"] += 1
+                    break
+                self._stats["coalesced"] += 1
+            # 计算方失败时没有结果，下一轮由本线程重新计算
+            waiting.wait()
+
+        try:
+            value = compute()
+            self.store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            done.set()
+
+    async def acall(self, key: str, compute: Callable[[], Any]) -> Any:
+        """异步调用，不做并发合并"""
+        value = self.lookup(key)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            self._stats["misses"] += 1
+        value = await compute()
+        self.store(key, value)
+        return value
+
+
+# 所有被 cached_tool 装饰的工具，用于统一查看命中统计
+_registry: Dict[str, _ToolCache] = {}
+_registry_lock = threading.Lock()
+
+
+def cached_tool(
+    ttl: Optional[float] = 300.0,
+    max_size: int = 256,
+    normalize: Optional[Dict[str, Callable[[Any], Any]]] = None,
+    backend: Optional[Backend] = None,
+    name: Optional[str] = None,
+) -> Callable[[F], F]:
+    """
+    为工具函数加上结果缓存的装饰器，放在 @tool 之下。
+
+    Args:
+        ttl: 结果有效期（秒），None 表示永不过期
+        max_size: 内存缓存的最大条目数，超出时淘汰最久未使用的条目
+        normalize: 参数名到规范化函数的映射；未列出的参数使用 normalize_text
+        backend: 共享后端，或者返回共享后端的函数（例如 get_tool_cache，第一次调用时才创建）
+        name: 统计和共享后端中使用的工具名称，默认为函数名
+
+    Returns:
+        装饰器。被装饰的函数带有 cache_info() 和 cache_clear() 方法
+    """
+    normalizers = dict(normalize or {})
+
+    def decorator(func: F) -> F:
+        tool_name = name or func.__name__
+        cache = _ToolCache(tool_name, ttl, max_size, backend)
+        signature = inspect.signature(func)
+        qualname = f"{func.__module__}.{func.__qualname__}"
+
+        def normalized(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[str, inspect.BoundArguments]:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            for arg, value in bound.arguments.items():
+                bound.arguments[arg] = normalizers.get(arg, normalize_text)(value)
+            payload = json.dumps([qualname, bound.arguments], sort_keys=True, ensure_ascii=False, default=repr)
+            return hashlib.sha256(payload.encode("utf-8")).hexdigest(), bound
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                key, bound = normalized(args, kwargs)
+                return await cache.acall(key, lambda: func(*bound.args, **bound.kwargs))
+
+            wrapper: Any = async_wrapper
+        else:
+
+            @functools.wraps(func)
+            def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+                key, bound = normalized(args, kwargs)
+                return cache.call(key, lambda: func(*bound.args, **bound.kwargs))
+
+            wrapper = sync_wrapper
+
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        with _registry_lock:
+            _registry[tool_name] = cache
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def tool_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    所有被 cached_tool 装饰的工具的缓存统计。
+
+    Returns:
+        工具名称到统计信息的映射：内存命中、共享命中、未命中、等待并发中相同调用的次数（等待结束后读到结果计为内存命中）、
+        淘汰、过期、当前大小和命中率
+    """
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.name: cache.info() for cache in caches}
+
+
+_default_cache: Optional[ToolResultCache] = None
+_default_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """
+    获取示例共用的工具结果缓存，位于缓存目录下的 tool_cache.sqlite。
+
+    Returns:
+        共享的 ToolResultCache 实例
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ToolResultCache(get_cache_dir() / "tool_cache.sqlite")
+        return _default_cache
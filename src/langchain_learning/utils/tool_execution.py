@@ -0,0 +1,336 @@
+"""
+并行工具执行的并发限制、超时与耗时追踪
+
+create_agent 会把模型一次返回的多个工具调用并行执行（同步工具在线程池中，异步工具用 asyncio.gather），
+结果按工具调用的顺序返回。ToolExecutionMiddleware 在此基础上为每个工具加上并发上限和超时，
+并按智能体步骤记录每个工具调用的耗时，计算并行执行相对串行执行节省的墙钟时间。
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.types import Command
+
+ToolResult = Union[ToolMessage, Command]
+
+# 所有中间件共用的线程池，用于执行带超时的同步工具
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="tool-execution")
+        return _executor
+
+
+@dataclass
+class ToolCallTrace:
+    """
+    一次工具调用的耗时记录。
+
+    Attributes:
+        name: 工具名称
+        call_id: 工具调用ID
+        started: 开始执行的时间（time.perf_counter，不含等待并发名额的时间）
+        finished: 结束时间
+        status: success、error 或 timeout
+    """
+
+    name: str
+    call_id: str
+    started: float
+    finished: float
+    status: str = "success"
+
+    @property
+    def duration(self) -> float:
+        """执行耗时（秒）"""
+        return self.finished - self.started
+
+
+@dataclass
+class ToolStepTrace:
+    """
+    模型一次返回的所有工具调用（一个智能体步骤）的耗时记录。
+
+    Attributes:
+        calls: 各工具调用的记录，按开始时间排列
+    """
+
+    calls: List[ToolCallTrace] = field(default_factory=list)
+
+    @property
+    def wall_time(self) -> float:
+        """从第一个调用开始到最后一个调用结束的墙钟时间（秒）"""
+        return max(c.finished for c in self.calls) - min(c.started for c in self.calls)
+
+    @property
+    def serial_time(self) -> float:
+        """所有调用依次执行所需的时间（秒）"""
+        return sum(c.duration for c in self.calls)
+
+    @property
+    def saved_time(self) -> float:
+        """并行执行节省的墙钟时间（秒）"""
+        return max(0.0, self.serial_time - self.wall_time)
+
+    def summary(self) -> str:
+        """格式化的步骤耗时"""
+        calls = ", ".join(
+            f"{c.name} {c.duration * 1000:.0f}ms" + ("" if c.status == "success" else f" ({c.status})")
+            for c in self.calls
+        )
+        return (
+            f"{len(self.calls)} 个工具调用 [{calls}]: 墙钟 {self.wall_time * 1000:.0f}ms, "
+            f"串行 {self.serial_time * 1000:.0f}ms, 节省 {self.saved_time * 1000:.0f}ms"
+        )
+
+
+class ToolExecutionMiddleware(AgentMiddleware):
+    """
+    为每个工具限制并发数和执行时间，并记录每个步骤并行执行节省的时间。
+
+    超时的工具调用返回一条 status="error" 的 ToolMessage，模型可以据此改用其他方式回答。
+    同步工具超时后其线程无法被中断，会在后台执行完毕，但在此之前一直占用该工具的并发名额；
+    等待并发名额超过超时时间的调用同样按超时返回。带超时的同步工具在模块级共享的线程池中执行。
+
+    Args:
+        limits: 工具名称到最大并发调用数的映射
+        timeouts: 工具名称到超时时间（秒）的映射
+        default_limit: 未在 limits 中列出的工具的并发上限，None 表示不限制
+        default_timeout: 未在 timeouts 中列出的工具的超时时间，None 表示不限制
+        max_steps: 最多保留的步骤记录数
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_limit: Optional[int] = None,
+        default_timeout: Optional[float] = None,
+        max_steps: int = 100,
+    ):
+        super().__init__()
+        self.limits = dict(limits or {})
+        self.timeouts = dict(timeouts or {})
+        self.default_limit = default_limit
+        self.default_timeout = default_timeout
+        self.max_steps = max_steps
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        # asyncio.Semaphore 绑定到事件循环，每个事件循环各自一组
+        self._async_semaphores: "weakref.WeakKeyDictionary[Any, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+        self._steps: Dict[Tuple[Hashable, ...], ToolStepTrace] = {}
+
+    @property
+    def steps(self) -> List[ToolStepTrace]:
+        """各步骤的耗时记录，按执行顺序排列"""
+        with self._lock:
+            return list(self._steps.values())
+
+    def summary(self) -> str:
+        """所有步骤的耗时汇总"""
+        steps = self.steps
+        if not steps:
+            return "没有工具调用"
+        lines = [f"步骤 {i}: {step.summary()}" for i, step in enumerate(steps, 1)]
+        saved = sum(step.saved_time for step in steps)
+        lines.append(f"并行执行共节省 {saved * 1000:.0f}ms")
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        """清空耗时记录"""
+        with self._lock:
+            self._steps.clear()
+
+    def wrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], ToolResult],
+    ) -> ToolResult:
+        name = request.tool_call["name"]
+        semaphore = self._semaphore(name)
+        timeout = self.timeouts.get(name, self.default_timeout)
+
+        if timeout is None:
+            with semaphore or _UNLIMITED:
+                started = time.perf_counter()
+                try:
+                    result = handler(request)
+                except Exception:
+                    self._record(request, started, "error")
+                    raise
+            self._record(request, started, _status(result))
+            return result
+
+        # 在线程池中执行才能在超时后返回，拷贝上下文以保留回调和运行配置；
+        # 超时从拿到并发名额、真正开始执行时算起，等待名额的时间同样不超过 timeout
+        started_event = threading.Event()
+        started: List[float] = []
+        abandoned = False
+        start_lock = threading.Lock()
+
+        def run() -> Optional[ToolResult]:
+            if semaphore is not None and not semaphore.acquire(timeout=timeout):
+                return None
+            try:
+                with start_lock:
+                    if abandoned:
+                        return None
+                    started.append(time.perf_counter())
+                started_event.set()
+                return handler(request)
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+
+        future = _get_executor().submit(contextvars.copy_context().run, run)
+        if not started_event.wait(timeout):
+            with start_lock:
+                abandoned = not started
+            if abandoned:
+                # 名额被仍在后台执行的超时调用占满，或者线程池已满
+                future.cancel()
+                self._record(request, time.perf_counter(), "timeout")
+                return _timeout_message(request, timeout)
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._record(request, started[0], "timeout")
+            return _timeout_message(request, timeout)
+        except Exception:
+            self._record(request, started[0], "error")
+            raise
+        self._record(request, started[0], _status(result))  # type: ignore[arg-type]
+        return result  # type: ignore[return-value]
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolResult]],
+    ) -> ToolResult:
+        name = request.tool_call["name"]
+        semaphore = self._async_semaphore(name)
+        timeout = self.timeouts.get(name, self.default_timeout)
+
+        async with semaphore or _UNLIMITED:
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(handler(request), timeout)
+            except asyncio.TimeoutError:
+                self._record(request, started, "timeout")
+                return _timeout_message(request, timeout)  # type: ignore[arg-type]
+            except Exception:
+                self._record(request, started, "error")
+                raise
+        self._record(request, started, _status(result))
+        return result
+
+    def _limit(self, name: str) -> Optional[int]:
+        return self.limits.get(name, self.default_limit)
+
+    def _semaphore(self, name: str) -> Optional[threading.BoundedSemaphore]:
+        limit = self._limit(name)
+        if limit is None:
+            return None
+        with self._lock:
+            if name not in self._semaphores:
+                self._semaphores[name] = threading.BoundedSemaphore(limit)
+            return self._semaphores[name]
+
+    def _async_semaphore(self, name: str) -> Optional[asyncio.Semaphore]:
+        limit = self._limit(name)
+        if limit is None:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._async_semaphores.setdefault(loop, {})
+            if name not in semaphores:
+                semaphores[name] = asyncio.Semaphore(limit)
+            return semaphores[name]
+
+    def _record(self, request: ToolCallRequest, started: float, status: str) -> None:
+        call = ToolCallTrace(
+            name=request.tool_call["name"],
+            call_id=request.tool_call.get("id") or "",
+            started=started,
+            finished=time.perf_counter(),
+            status=status,
+        )
+        step_key = _step_key(request)
+        with self._lock:
+            step = self._steps.get(step_key)
+            if step is None:
+                step = self._steps[step_key] = ToolStepTrace()
+                while len(self._steps) > self.max_steps:
+                    self._steps.pop(next(iter(self._steps)))
+            step.calls.append(call)
+            step.calls.sort(key=lambda c: c.started)
+
+
+def _step_key(request: ToolCallRequest) -> Tuple[Hashable, ...]:
+    """
+    工具调用所属智能体步骤的标识。
+
+    同一步骤的工具调用在同一个检查点之后、同一个图步骤中执行；每次运行的检查点ID都不同，
+    因此不同轮次、不同运行中ID相同的工具调用不会被合并。没有运行配置时退回到同一条 AI 消息中所有工具调用的ID。
+    """
+    config = getattr(request.runtime, "config", None) or {}
+    checkpoints = (config.get("configurable") or {}).get("checkpoint_map")
+    step = (config.get("metadata") or {}).get("langgraph_step")
+    if checkpoints and step is not None:
+        return (*sorted(checkpoints.items()), step)
+
+    call_id = request.tool_call.get("id") or ""
+    state = request.state
+    messages = state.get("messages", []) if isinstance(state, dict) else getattr(state, "messages", state)
+    for message in reversed(messages or []):
+        if isinstance(message, AIMessage) and any(c.get("id") == call_id for c in message.tool_calls):
+            return tuple(c.get("id") or "" for c in message.tool_calls)
+    return (call_id,)
+
+
+def _status(result: ToolResult) -> str:
+    return "error" if isinstance(result, ToolMessage) and result.status == "error" else "success"
+
+
+def _timeout_message(request: ToolCallRequest, timeout: float) -> ToolMessage:
+    name = request.tool_call["name"]
+    return ToolMessage(
+        content=f"工具 {name} 执行超时（超过 {timeout:g} 秒），请稍后重试或换一种方式回答",
+        tool_call_id=request.tool_call.get("id") or "",
+        name=name,
+        status="error",
+    )
+
+
+class _Unlimited:
+    """不限制并发时使用的空上下文管理器（同时支持 with 和 async with）"""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+    async def __aenter__(self) -> None:
+        return None
+
+    async def __aexit__(self, *exc: object) -> None:
+        return None
+
+
+_UNLIMITED = _Unlimited()
@@ -0,0 +1,214 @@
+"""
+NumPy 矩阵向量索引
+
+一个命名空间的所有向量放在一块连续的 float32 矩阵中，容量不足时成倍扩容（均摊 O(1) 追加），
+删除只做墓碑标记，墓碑过多时再整体压缩。查询只需要一次矩阵-向量乘积加 argpartition，
+不需要逐条计算相似度。
+"""
+
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    按行 L2 归一化，零向量保持为零。
+
+    Args:
+        vectors: 形状为 (n, dims) 的矩阵
+
+    Returns:
+        归一化后的 float32 矩阵
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class MatrixIndex:
+    """
+    基于连续矩阵的余弦相似度索引。
+
+    一个键可以对应多行向量（例如一条记忆的多个字段），查询时取各行的最高分。
+
+    Args:
+        dims: 向量维度
+        capacity: 初始容量（行数）
+        compact_ratio: 墓碑占比超过该值时压缩矩阵
+    """
+
+    def __init__(self, dims: int, capacity: int = 1024, compact_ratio: float = 0.5):
+        self.dims = dims
+        self.compact_ratio = compact_ratio
+        self._matrix = np.zeros((capacity, dims), dtype=np.float32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._row_keys: List[Optional[str]] = []
+        self._rows: Dict[str, List[int]] = {}
+        self._size = 0
+        self._dead = 0
+        self._max_rows_per_key = 1
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    @property
+    def nbytes(self) -> int:
+        """矩阵占用的字节数"""
+        return self._matrix.nbytes
+
+    def add(self, key: str, vectors: Sequence[Sequence[float]]) -> None:
+        """
+        写入一个键的向量，已有的向量会被替换。
+
+        Args:
+            key: 键
+            vectors: 该键的一行或多行向量
+        """
+        self.add_batch([key] * len(vectors), vectors)
+
+    def add_batch(self, row_keys: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """
+        批量写入向量，每行对应 row_keys 中的一个键（同一个键可以出现多次）。
+
+        本批次涉及的键原有的向量会被替换。
+
+        Args:
+            row_keys: 每行向量所属的键
+            vectors: 形状为 (len(row_keys), dims) 的向量
+        """
+        if not row_keys:
+            return
+        matrix = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(row_keys), self.dims))
+        for key in set(row_keys):
+            self.remove(key)
+
+        self._reserve(len(row_keys))
+        start = self._size
+        end = start + len(row_keys)
+        self._matrix[start:end] = matrix
+        self._alive[start:end] = True
+        self._row_keys.extend(row_keys)
+        for row, key in enumerate(row_keys, start):
+            rows = self._rows.setdefault(key, [])
+            rows.append(row)
+            if len(rows) > self._max_rows_per_key:
+                self._max_rows_per_key = len(rows)
+        self._size = end
+
+    def remove(self, key: str) -> bool:
+        """
+        删除一个键的所有向量（墓碑标记）。
+
+        Args:
+            key: 键
+
+        Returns:
+            键是否存在
+        """
+        rows = self._rows.pop(key, None)
+        if rows is None:
+            return False
+        self._alive[rows] = False
+        for row in rows:
+            self._row_keys[row] = None
+        self._dead += len(rows)
+        if self._size >= 1024 and self._dead > self._size * self.compact_ratio:
+            self.compact()
+        return True
+
+    def search(
+        self,
+        query: Sequence[float],
+        limit: int = 10,
+        offset: int = 0,
+        allowed: Optional[Collection[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        按余弦相似度查询最相近的键。
+
+        Args:
+            query: 查询向量
+            limit: 返回的键数
+            offset: 跳过的键数
+            allowed: 只在这些键中查找，None 表示不限制
+
+        Returns:
+            (键, 相似度) 列表，按相似度从高到低排列
+        """
+        wanted = offset + limit
+        if self._size == 0 or wanted <= 0:
+            return []
+        q = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, self.dims))[0]
+        scores = self._matrix[:self._size] @ q
+
+        if allowed is not None:
+            rows = [row for key in allowed for row in self._rows.get(key, ())]
+            masked = np.full(self._size, -np.inf, dtype=np.float32)
+            masked[rows] = scores[rows]
+            scores, valid = masked, len(rows)
+        elif self._dead:
+            scores[~self._alive[:self._size]] = -np.inf
+            valid = self._size - self._dead
+        else:
+            valid = self._size
+        if valid == 0:
+            return []
+
+        # 每个键最多占 _max_rows_per_key 行，取这么多行一定能覆盖前 wanted 个键
+        needed = min(valid, wanted * self._max_rows_per_key)
+        if needed < self._size:
+            candidates = np.argpartition(-scores, needed - 1)[:needed]
+        else:
+            candidates = np.arange(self._size)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results: List[Tuple[str, float]] = []
+        seen = set()
+        for row in candidates.tolist():
+            score = float(scores[row])
+            if score == -np.inf:
+                break
+            key = self._row_keys[row]
+            if key is None or key in seen:
+                continue
+            seen.add(key)
+            results.append((key, score))
+            if len(results) >= wanted:
+                break
+        return results[offset:]
+
+    def compact(self) -> None:
+        """丢弃墓碑行，重新排列矩阵"""
+        alive = np.flatnonzero(self._alive[:self._size])
+        capacity = max(1024, len(alive) * 2)
+        matrix = np.zeros((capacity, self.dims), dtype=np.float32)
+        matrix[:len(alive)] = self._matrix[alive]
+        self._matrix = matrix
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[:len(alive)] = True
+        self._row_keys = [self._row_keys[row] for row in alive.tolist()]
+        self._rows = {}
+        for row, key in enumerate(self._row_keys):
+            self._rows.setdefault(key, []).append(row)  # type: ignore[arg-type]
+        self._max_rows_per_key = max((len(rows) for rows in self._rows.values()), default=1)
+        self._size = len(alive)
+        self._dead = 0
+
+    def _reserve(self, count: int) -> None:
+        """保证还能追加 count 行，容量不足时成倍扩容"""
+        required = self._size + count
+        capacity = len(self._matrix)
+        if required <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < required:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dims), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._matrix, self._alive = matrix, alive
@@ -0,0 +1,114 @@
+"""AgentStream 只执行一次智能体，保留与 invoke 相同的最终状态，并按顺序产出逐 token 事件"""
+
+import asyncio
+from typing import List
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import StructuredTool
+
+from benchmarks.fake_model import ScriptedChatModel, tool_call_script
+from langchain_learning.utils.agent_stream import AgentStream
+
+INPUTS = {"messages": [HumanMessage(content="查询北京")]}
+
+
+def _agent():
+    """返回智能体、脚本模型和工具的调用记录"""
+    calls: List[str] = []
+
+    def lookup(query: str) -> str:
+        calls.append(query)
+        return f"结果: {query}"
+
+    tool = StructuredTool.from_function(func=lookup, name="lookup", description="查询工具")
+    model = ScriptedChatModel(script=tool_call_script("lookup", {"query": "北京"}, answer="北京今天晴"))
+    return create_agent(model=model, tools=[tool]), model, calls
+
+
+def _contents(state) -> List[tuple]:
+    return [(m.type, m.text) for m in state["messages"]]
+
+
+def test_iteration_runs_once_and_keeps_final_state():
+    agent, _, calls = _agent()
+    run = AgentStream(agent, INPUTS)
+    nodes = [node for node, _ in run]
+
+    assert nodes == ["model", "tools", "model"]
+    assert calls == ["北京"]
+    assert run.steps == 3
+    assert run.final_text == "北京今天晴"
+    # result() 直接返回迭代时记录的状态，不会再执行一次
+    assert run.result() is run.state
+    assert calls == ["北京"]
+    with pytest.raises(RuntimeError):
+        list(run)
+
+
+def test_result_matches_invoke():
+    agent, model, calls = _agent()
+    expected = _contents(agent.invoke(INPUTS))
+    model.reset()
+
+    run = AgentStream(agent, INPUTS)
+    assert _contents(run.result()) == expected
+    assert len(calls) == 2
+    stats = run.stats()
+    assert stats.text == "北京今天晴" and stats.ttft is None and stats.total_time > 0
+
+
+def test_async_iteration():
+    agent, model, calls = _agent()
+    expected = _contents(agent.invoke(INPUTS))
+    model.reset()
+
+    async def run():
+        stream = AgentStream(agent, INPUTS)
+        nodes = [node async for node, _ in stream]
+        return nodes, await stream.aresult()
+
+    nodes, state = asyncio.run(run())
+    assert nodes == ["model", "tools", "model"]
+    assert _contents(state) == expected
+    assert len(calls) == 2
+
+
+def test_stats_before_running():
+    agent, _, _ = _agent()
+    with pytest.raises(RuntimeError):
+        AgentStream(agent, INPUTS).stats()
+
+
+def test_events_order_and_ttft():
+    agent, _, calls = _agent()
+    run = AgentStream(agent, INPUTS)
+    events = list(run.events())
+
+    assert [event.kind for event in events] == ["tool_call", "tool_result", "token"]
+    assert events[0].name == "lookup" and events[0].args == {"query": "北京"}
+    assert events[1].name == "lookup" and events[1].text == "结果: 北京"
+    assert events[2].text == "北京今天晴"
+    assert calls == ["北京"]
+
+    stats = run.stats()
+    assert run.ttft is not None and 0 < run.ttft <= stats.total_time
+    assert stats.ttft == run.ttft and stats.text == "北京今天晴"
+    assert stats.output_tokens == 1
+    assert run.result()["messages"][-1].text == "北京今天晴"
+
+
+def test_async_events():
+    agent, _, calls = _agent()
+
+    async def run():
+        stream = AgentStream(agent, INPUTS)
+        kinds = [event.kind async for event in stream.aevents()]
+        return kinds, stream
+
+    kinds, stream = asyncio.run(run())
+    assert kinds == ["tool_call", "tool_result", "token"]
+    assert stream.ttft is not None
+    assert stream.final_text == "北京今天晴"
+    assert calls == ["北京"]
@@ -0,0 +1,23 @@
+"""analyze_data 对“名称:数值”文本的解析"""
+
+from langchain_learning.utils.analytics import analyze_data, iter_records
+
+
+def test_pairs_keep_each_name_in_its_own_column():
+    summary = analyze_data("温度: 25.5, 湿度: 60%, 价格: 1,299")
+    assert summary.format == "pairs"
+    assert summary.rows == 1
+    assert {name: stats["sum"] for name, stats in summary.numeric.items()} == {"温度": 25.5, "湿度": 60, "价格": 1299}
+    assert "总和" not in summary.summary()
+
+
+def test_repeated_names_start_new_records():
+    text = "产品A: 100, 产品B: 2,000\n产品A: 120, 产品B: 1,800.5"
+    assert list(iter_records(text, "pairs")) == [{"产品A": 100, "产品B": 2000}, {"产品A": 120, "产品B": 1800.5}]
+    stats = analyze_data(text).numeric
+    assert (stats["产品A"]["sum"], stats["产品B"]["mean"]) == (220, 1900.25)
+
+
+def test_pairs_without_spaces_are_not_read_as_thousands():
+    assert list(iter_records("温度:25,湿度:60,价格:12,345", "pairs")) == [{"温度": 25, "湿度": 60, "价格": 12345}]
+    assert list(iter_records("a:1,2345", "pairs")) == [{"a": 1}]
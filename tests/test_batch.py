@@ -0,0 +1,131 @@
+"""批量执行的断点续跑、失败重跑和输入校验"""
+
+import asyncio
+import json
+from typing import List
+
+import pytest
+
+from langchain_learning.models.client import close_clients, get_chat_model
+from langchain_learning.utils.batch import arun_batch, completed_ids, read_prompts, run_batch
+from langchain_learning.utils.stub_server import DEFAULT_REPLY, StubConfig, StubServer
+
+
+def _write_prompts(path, prompts: List[str]) -> None:
+    lines = [json.dumps({"id": f"p{i}", "prompt": prompt}, ensure_ascii=False) for i, prompt in enumerate(prompts)]
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def _records(path) -> List[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+async def _echo(prompt: str) -> str:
+    return prompt.upper()
+
+
+def test_read_prompts_formats(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text('{"id": "a", "prompt": "x"}\n\n"y"\n{"input": "z"}\n', encoding="utf-8")
+    assert list(read_prompts(path)) == [("a", "x"), ("3", "y"), ("4", "z")]
+
+
+def test_partial_last_line_is_truncated(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_bytes(b'{"id": "p0", "output": "A"}\n{"id": "p1", "error": "E"}\n{"id": "p2", "out')
+    assert completed_ids(path) == {"p0"}
+    assert path.read_bytes() == b'{"id": "p0", "output": "A"}\n{"id": "p1", "error": "E"}\n'
+    assert completed_ids(tmp_path / "missing.jsonl") == set()
+
+
+def test_resume_skips_done_rows_and_reruns_failures(tmp_path):
+    input_path, output_path = tmp_path / "prompts.jsonl", tmp_path / "results.jsonl"
+    _write_prompts(input_path, ["a", "b", "c", "d"])
+    attempts: List[str] = []
+
+    async def flaky(prompt: str) -> str:
+        attempts.append(prompt)
+        if prompt == "c" and attempts.count("c") == 1:
+            raise RuntimeError("暂时失败")
+        return prompt.upper()
+
+    first = run_batch(flaky, input_path, output_path, concurrency=2)
+    assert (first.total, first.succeeded, first.failed, first.skipped) == (4, 3, 1, 0)
+
+    # 中断时写了一半的行被截掉，对应的行重新执行
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "p9", "outp')
+    second = run_batch(flaky, input_path, output_path, concurrency=2)
+    assert (second.total, second.succeeded, second.failed, second.skipped) == (4, 1, 0, 3)
+    assert sorted(attempts) == ["a", "b", "c", "c", "d"]
+
+    records = _records(output_path)
+    assert len(records) == 5
+    assert completed_ids(output_path) == {"p0", "p1", "p2", "p3"}
+    assert [r["output"] for r in records if r["id"] == "p2" and "output" in r] == ["C"]
+
+
+def test_resume_false_starts_over(tmp_path):
+    input_path, output_path = tmp_path / "prompts.jsonl", tmp_path / "results.jsonl"
+    _write_prompts(input_path, ["a", "b"])
+    run_batch(_echo, input_path, output_path)
+    report = run_batch(_echo, input_path, output_path, resume=False)
+    assert (report.succeeded, report.skipped) == (2, 0)
+    assert sorted(r["id"] for r in _records(output_path)) == ["p0", "p1"]
+
+
+def test_bad_input_line(tmp_path):
+    input_path, output_path = tmp_path / "prompts.jsonl", tmp_path / "results.jsonl"
+    input_path.write_text('{"id": "p0", "prompt": "a"}\n{"id": "p1", "prompt": \n', encoding="utf-8")
+    with pytest.raises(ValueError, match="第 2 行"):
+        run_batch(_echo, input_path, output_path, concurrency=1)
+    # 出错之前完成的行已经写入，修正输入后可以继续
+    assert completed_ids(output_path) == {"p0"}
+
+    input_path.write_text('{"id": "p0", "prompt": "a"}\n{"id": "p1", "text": "b"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="缺少 prompt"):
+        run_batch(_echo, input_path, output_path)
+
+
+def test_invalid_concurrency(tmp_path):
+    with pytest.raises(ValueError):
+        run_batch(_echo, tmp_path / "prompts.jsonl", tmp_path / "results.jsonl", concurrency=0)
+
+
+def test_run_batch_twice_with_shared_model(tmp_path, monkeypatch):
+    # 每次 run_batch 都在新的事件循环中执行，共享的模型实例需要在两个事件循环中都能使用
+    input_path = tmp_path / "prompts.jsonl"
+    _write_prompts(input_path, ["你好", "介绍一下你自己", "再见"])
+    with StubServer(StubConfig(completion_tokens=len(DEFAULT_REPLY), seed=1)) as server:
+        monkeypatch.setenv("SILICONFLOW_API_KEY", "stub")
+        monkeypatch.setenv("SILICONFLOW_BASE_URL", server.base_url)
+        try:
+            model = get_chat_model()
+
+            async def ask(prompt: str) -> str:
+                return (await model.ainvoke(prompt)).text
+
+            for i in range(2):
+                report = run_batch(ask, input_path, tmp_path / f"results{i}.jsonl", concurrency=2)
+                assert (report.succeeded, report.failed) == (3, 0)
+                assert {r["output"] for r in _records(tmp_path / f"results{i}.jsonl")} == {DEFAULT_REPLY}
+        finally:
+            close_clients()
+
+
+def test_progress_callback(tmp_path):
+    input_path, output_path = tmp_path / "prompts.jsonl", tmp_path / "results.jsonl"
+    _write_prompts(input_path, ["a", "b", "c"])
+    seen = []
+    report = run_batch(_echo, input_path, output_path, progress=lambda r: seen.append(r.processed), progress_interval=0)
+    assert seen == [1, 2, 3]
+    assert report.latency()["count"] == 3
+    assert "成功 3" in report.summary()
+
+
+def test_arun_batch(tmp_path):
+    input_path, output_path = tmp_path / "prompts.jsonl", tmp_path / "results.jsonl"
+    _write_prompts(input_path, ["a"])
+    report = asyncio.run(arun_batch(_echo, input_path, output_path))
+    assert report.succeeded == 1
+    assert _records(output_path)[0]["output"] == "A"
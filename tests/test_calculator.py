@@ -0,0 +1,96 @@
+"""SafeCalculator 的资源限制、错误处理和批量求值"""
+
+import pytest
+
+from langchain_learning.examples.agent_with_tools import calculator
+from langchain_learning.utils.calculator import CalculatorError, SafeCalculator
+
+# 长度不超过 1000 个字符、但嵌套很深的表达式
+DEEP = [
+    "+".join(["1"] * 499),
+    "-" * 990 + "1",
+    "(" * 300 + "1" + ")" * 300,
+    "2**" * 300 + "1",
+]
+
+
+@pytest.fixture
+def calc():
+    return SafeCalculator()
+
+
+def test_basic_arithmetic(calc):
+    assert calc.evaluate("1 + 2 * 3") == 7
+    assert calc.evaluate("(1 + 2) * 3") == 9
+    assert calc.evaluate("-2 ** 2") == -4
+    assert calc.evaluate("7 // 2") == 3
+    assert calc.evaluate("7 % 3") == 1
+    assert calc.evaluate("7 / 2") == 3.5
+
+
+def test_rejects_names_and_calls(calc):
+    for text in ["x + 1", "__import__('os')", "abs(-1)", "(1).real"]:
+        with pytest.raises(CalculatorError):
+            calc.evaluate(text)
+
+
+def test_power_tower_fails_fast(calc):
+    with pytest.raises(CalculatorError):
+        calc.evaluate("9**9**9")
+
+
+def test_int_size_limit():
+    calc = SafeCalculator(max_int_bits=64)
+    assert calc.evaluate("2 ** 63") == 2 ** 63
+    with pytest.raises(CalculatorError):
+        calc.evaluate("2 ** 65")
+    with pytest.raises(CalculatorError):
+        calc.evaluate("4294967296 * 4294967296 * 4294967296")
+
+
+def test_division_by_zero(calc):
+    for text in ["1 / 0", "1 // 0", "1 % 0", "1 / (2 - 2)"]:
+        with pytest.raises(CalculatorError):
+            calc.evaluate(text)
+
+
+def test_length_limit():
+    with pytest.raises(CalculatorError):
+        SafeCalculator(max_length=10).evaluate("1 + 1 + 1 + 1")
+
+
+@pytest.mark.parametrize("text", DEEP)
+def test_deep_nesting_is_calculator_error(calc, text):
+    assert len(text) <= calc.max_length
+    with pytest.raises(CalculatorError):
+        calc.evaluate(text)
+    assert isinstance(calc.evaluate_batch([text, "1 + 1"])[0], CalculatorError)
+
+
+def test_moderate_nesting_still_works(calc):
+    assert calc.evaluate("+".join(["1"] * 100)) == 100
+    assert calc.evaluate("-" * 100 + "1") == 1
+
+
+@pytest.mark.parametrize("text", DEEP)
+def test_tool_reports_error_instead_of_raising(text):
+    assert calculator.invoke({"expression": text}).startswith("计算错误")
+
+
+def test_batch_matches_scalar(calc):
+    # 同一模板超过向量化阈值，其中混入除零、大整数和浮点结果
+    texts = [f"{i} * {i} - {i} / {i % 7}" for i in range(200)]
+    texts += [f"{i} ** {i % 40} // 3" for i in range(200)]
+    texts += [f"{2 ** 60 + i} + {i}" for i in range(50)]
+    texts += ["9**9**9", "1 +", "+".join(["1"] * 499)]
+
+    batch = calc.evaluate_batch(texts)
+    assert len(batch) == len(texts)
+    for text, result in zip(texts, batch):
+        try:
+            expected = calc.evaluate(text)
+        except CalculatorError:
+            assert isinstance(result, CalculatorError), text
+            continue
+        assert result == expected, text
+        assert type(result) is type(expected), text
@@ -0,0 +1,94 @@
+"""ModelCatalog 的条件请求刷新和按 API 地址区分的缓存"""
+
+import json
+
+import httpx
+import pytest
+
+from langchain_learning.models import catalog as catalog_module
+from langchain_learning.models.catalog import ModelCatalog
+
+MODELS = {"data": [{"id": "Qwen/Qwen3-8B"}, {"id": "vendor/new-model"}]}
+
+
+class Server:
+    """记录请求头的 /v1/models，ETag 匹配时返回 304"""
+
+    def __init__(self):
+        self.etag = '"v1"'
+        self.models = MODELS
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304)
+        return httpx.Response(200, json=self.models, headers={"ETag": self.etag, "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = Server()
+    client = httpx.Client(transport=httpx.MockTransport(server.handler))
+    monkeypatch.setattr(catalog_module, "get_http_client", lambda: client)
+    monkeypatch.setenv("SILICONFLOW_API_KEY", "test")
+    monkeypatch.setenv("SILICONFLOW_BASE_URL", "http://a.test/v1")
+    return server
+
+
+def test_refresh_uses_etag_and_keeps_data_on_304(server, tmp_path):
+    catalog = ModelCatalog(tmp_path / "catalog.json", ttl=0)
+    assert catalog.refresh()
+    assert catalog.remote_ids() == ["Qwen/Qwen3-8B", "vendor/new-model"]
+    assert "If-None-Match" not in server.requests[0].headers
+
+    fetched_at = json.loads(catalog.path.read_text(encoding="utf-8"))["fetched_at"]
+    assert catalog.refresh()
+    conditional = server.requests[1].headers
+    assert (conditional["If-None-Match"], conditional["If-Modified-Since"]) == ('"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    saved = json.loads(catalog.path.read_text(encoding="utf-8"))
+    assert saved["data"] == MODELS["data"]
+    assert saved["fetched_at"] >= fetched_at
+
+
+def test_changed_etag_replaces_data(server, tmp_path):
+    catalog = ModelCatalog(tmp_path / "catalog.json")
+    catalog.refresh()
+    server.etag, server.models = '"v2"', {"data": [{"id": "Qwen/Qwen3-8B"}]}
+    assert catalog.refresh()
+    assert server.requests[-1].headers["If-None-Match"] == '"v1"'
+    assert catalog.remote_ids() == ["Qwen/Qwen3-8B"]
+    assert ModelCatalog(catalog.path).remote_ids() == ["Qwen/Qwen3-8B"]
+
+
+def test_cache_is_per_base_url(server, tmp_path, monkeypatch):
+    path = tmp_path / "catalog.json"
+    ModelCatalog(path).refresh()
+    assert ModelCatalog(path).is_fresh()
+
+    monkeypatch.setenv("SILICONFLOW_BASE_URL", "http://b.test/v1")
+    other = ModelCatalog(path)
+    assert other.remote_ids() is None
+    assert not other.is_fresh()
+    assert other.refresh()
+    assert "If-None-Match" not in server.requests[-1].headers
+    assert str(server.requests[-1].url) == "http://b.test/v1/models"
+
+
+def test_list_models_filters_by_remote_ids(server, tmp_path):
+    catalog = ModelCatalog(tmp_path / "catalog.json")
+    assert len(catalog.list_models(block=False)) > 2  # 后台刷新完成之前返回全部本地元数据
+    catalog.refresh_in_background().join()
+    assert [m.id for m in catalog.list_models()] == ["Qwen/Qwen3-8B"]
+    assert [m.id for m in catalog.list_models(include_remote_only=True)] == ["Qwen/Qwen3-8B", "vendor/new-model"]
+
+
+def test_failed_refresh_keeps_cache(server, tmp_path, monkeypatch):
+    catalog = ModelCatalog(tmp_path / "catalog.json")
+    catalog.refresh()
+    failing = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+    monkeypatch.setattr(catalog_module, "get_http_client", lambda: failing)
+    assert not catalog.refresh()
+    assert catalog.last_error
+    assert ModelCatalog(catalog.path).remote_ids() == ["Qwen/Qwen3-8B", "vendor/new-model"]
+    assert list(tmp_path.iterdir()) == [catalog.path]
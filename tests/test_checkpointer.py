@@ -0,0 +1,146 @@
+"""SQLiteCheckpointer 的增量存储、重新打开、分叉和清理"""
+
+from typing import List, Tuple
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from langchain_learning.utils import checkpointer as checkpointer_module
+from langchain_learning.utils.checkpointer import SQLiteCheckpointer
+
+THREAD = {"configurable": {"thread_id": "t"}}
+
+
+def _reply(state: MessagesState):
+    return {"messages": [AIMessage(content=f"回答{len(state['messages'])}")]}
+
+
+def _graph(saver):
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", _reply)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=saver)
+
+
+def _run(graph, turns: int, config=THREAD, start: int = 0):
+    for i in range(start, start + turns):
+        graph.invoke({"messages": [HumanMessage(content=f"问题{i}")]}, config)
+
+
+def _contents(state) -> List[Tuple[str, str]]:
+    return [(m.type, m.content) for m in state.values.get("messages", [])]
+
+
+def _history(graph, config=THREAD) -> List[List[Tuple[str, str]]]:
+    return [_contents(state) for state in graph.get_state_history(config)]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "checkpoints.sqlite"
+
+
+def test_reopen_resumes_thread(path):
+    saver = SQLiteCheckpointer(path)
+    graph = _graph(saver)
+    _run(graph, 3)
+    before = _contents(graph.get_state(THREAD))
+    saver.close()
+
+    graph = _graph(SQLiteCheckpointer(path))
+    assert _contents(graph.get_state(THREAD)) == before
+    _run(graph, 1, start=3)
+    assert _contents(graph.get_state(THREAD)) == before + [("human", "问题3"), ("ai", "回答7")]
+
+
+@pytest.mark.parametrize("max_depth", [64, 2])
+def test_deltas_rebuild_same_messages(path, monkeypatch, max_depth):
+    monkeypatch.setattr(checkpointer_module, "_MAX_DELTA_DEPTH", max_depth)
+    saver = SQLiteCheckpointer(path, max_checkpoints=None)
+    _run(_graph(saver), 10)
+    assert saver.storage_stats()["delta_blobs"] > 0
+    saver.close()
+
+    reference = _graph(InMemorySaver())
+    _run(reference, 10)
+    # 重新打开后内存中没有尾部缓存，每个检查点都要从数据库沿增量链拼接
+    assert _history(_graph(SQLiteCheckpointer(path, max_checkpoints=None))) == _history(reference)
+
+
+def test_fork_from_older_checkpoint(path):
+    saver = SQLiteCheckpointer(path)
+    graph = _graph(saver)
+    _run(graph, 3)
+    older = next(state for state in graph.get_state_history(THREAD) if len(state.values.get("messages", [])) == 2)
+    latest = graph.get_state(THREAD).config
+
+    graph.invoke({"messages": [HumanMessage(content="分叉")]}, older.config)
+    assert _contents(graph.get_state(THREAD))[2:] == [("human", "分叉"), ("ai", "回答3")]
+    # 分叉之后原来的分支仍然完整
+    assert len(_contents(graph.get_state(latest))) == 6
+
+    # 在分叉上继续追加，重新打开后两条分支都能正确读出
+    _run(graph, 1, start=9)
+    expected = _history(graph)
+    saver.close()
+    assert _history(_graph(SQLiteCheckpointer(path))) == expected
+
+
+def test_prune_keeps_needed_bases(path):
+    saver = SQLiteCheckpointer(path, max_checkpoints=None)
+    graph = _graph(saver)
+    _run(graph, 10)
+    history = _history(graph)
+    blobs = saver.storage_stats()["blobs"]
+
+    assert saver.prune(keep_last=2) == len(history) - 2
+    expected = history[:2]
+    stats = saver.storage_stats()
+    assert stats["checkpoints"] == 2
+    assert stats["blobs"] < blobs
+    assert _history(graph) == expected
+    saver.close()
+    assert _history(_graph(SQLiteCheckpointer(path, max_checkpoints=None))) == expected
+
+
+def test_write_after_prune(path):
+    saver = SQLiteCheckpointer(path, max_checkpoints=None)
+    graph = _graph(saver)
+    _run(graph, 5)
+    saver.prune(keep_last=1)
+    _run(graph, 2, start=5)
+    expected = _contents(graph.get_state(THREAD))
+    assert len(expected) == 14
+    saver.close()
+    assert _contents(_graph(SQLiteCheckpointer(path)).get_state(THREAD)) == expected
+
+
+def test_automatic_prune(path, monkeypatch):
+    monkeypatch.setattr(checkpointer_module, "_PRUNE_SLACK", 0)
+    saver = SQLiteCheckpointer(path, max_checkpoints=4)
+    graph = _graph(saver)
+    _run(graph, 10)
+    assert saver.storage_stats()["checkpoints"] <= 4
+    assert len(_contents(graph.get_state(THREAD))) == 20
+
+
+def test_delete_thread(path):
+    saver = SQLiteCheckpointer(path)
+    graph = _graph(saver)
+    other = {"configurable": {"thread_id": "other"}}
+    _run(graph, 2)
+    _run(graph, 2, config=other)
+    kept = _history(graph, other)
+
+    saver.delete_thread("t")
+    assert saver.get_tuple(THREAD) is None
+    assert list(saver.list(THREAD)) == []
+    assert saver.storage_stats("t") == {"checkpoints": 0, "blobs": 0, "delta_blobs": 0, "blob_bytes": 0}
+    assert _history(graph, other) == kept
+
+    # 删除后同一个 thread_id 从头开始
+    _run(graph, 1)
+    assert _contents(graph.get_state(THREAD)) == [("human", "问题0"), ("ai", "回答1")]
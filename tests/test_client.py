@@ -0,0 +1,72 @@
+"""共享客户端工厂的实例缓存和客户端生命周期"""
+
+import asyncio
+
+import pytest
+
+from langchain_learning.models import client
+from langchain_learning.models.client import (
+    PoolConfig,
+    aclose_clients,
+    close_clients,
+    configure_pool,
+    get_async_http_client,
+    get_chat_model,
+    get_http_client,
+)
+
+
+@pytest.fixture(autouse=True)
+def _clients(monkeypatch):
+    monkeypatch.setenv("SILICONFLOW_API_KEY", "test")
+    monkeypatch.setenv("SILICONFLOW_BASE_URL", "http://127.0.0.1:9/v1")
+    yield
+    configure_pool(PoolConfig())
+    close_clients()
+
+
+def test_unhashable_kwargs_are_cached_by_value():
+    llm = get_chat_model("m", model_kwargs={"top_k": 5}, extra_body={"enable_thinking": False})
+    assert get_chat_model("m", extra_body={"enable_thinking": False}, model_kwargs={"top_k": 5}) is llm
+    assert get_chat_model("m", model_kwargs={"top_k": 6}, extra_body={"enable_thinking": False}) is not llm
+
+
+def test_base_url_and_api_key_override_environment():
+    llm = get_chat_model("m", base_url="http://127.0.0.1:8/v1/", api_key="other")
+    assert llm.openai_api_base == "http://127.0.0.1:8/v1"
+    assert llm.openai_api_key.get_secret_value() == "other"
+    assert get_chat_model("m") is not llm
+    assert get_chat_model("m", base_url="http://127.0.0.1:8/v1", api_key="other") is llm
+
+
+@pytest.mark.parametrize("name", ["http_client", "http_async_client"])
+def test_rejects_managed_http_clients(name):
+    with pytest.raises(ValueError, match=name):
+        get_chat_model("m", **{name: get_http_client()})
+
+
+def test_configure_pool_keeps_issued_models_usable():
+    llm = get_chat_model("m")
+    configure_pool(max_connections=5)
+    assert not llm.http_client.is_closed
+    fresh = get_chat_model("m")
+    assert fresh is not llm
+    assert fresh.http_client is not llm.http_client
+
+
+def test_close_clients_closes_sync_client():
+    http_client = get_http_client()
+    close_clients()
+    assert http_client.is_closed
+    assert get_http_client() is not http_client
+
+
+def test_aclose_clients_closes_both_clients():
+    async def run():
+        clients = get_http_client(), get_async_http_client()
+        await aclose_clients()
+        return clients
+
+    http_client, async_client = asyncio.run(run())
+    assert http_client.is_closed and async_client.is_closed
+    assert client._http_async_client is None
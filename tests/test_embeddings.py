@@ -0,0 +1,82 @@
+"""pack_batches 和 BatchedEmbeddings 的去重、缓存、分批与错误处理"""
+
+import asyncio
+import threading
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from langchain_learning.models.embeddings import BatchedEmbeddings, HashedNGramEmbeddings, pack_batches
+from langchain_learning.utils.embedding_cache import EmbeddingCache, embedding_key
+
+
+class RecordingEmbeddings(Embeddings):
+    """记录每次请求的批次，可以模拟少返回向量"""
+
+    def __init__(self, drop: int = 0):
+        self.inner = HashedNGramEmbeddings(dims=8)
+        self.drop = drop
+        self.batches: List[List[str]] = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.batches.append(list(texts))
+        return self.inner.embed_documents(texts)[self.drop:]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def test_pack_batches_respects_token_and_size_limits():
+    texts = ["一二三", "四五六", "七八九", "十"]
+    assert pack_batches(texts, max_batch_tokens=6, max_batch_size=10) == [[0, 1], [2, 3]]
+    assert pack_batches(texts, max_batch_tokens=100, max_batch_size=3) == [[0, 1, 2], [3]]
+    assert pack_batches([], max_batch_tokens=6, max_batch_size=10) == []
+
+
+def test_pack_batches_puts_oversized_text_alone():
+    assert pack_batches(["一", "二" * 50, "三"], max_batch_tokens=10, max_batch_size=10) == [[0], [1], [2]]
+
+
+def test_deduplicates_and_batches():
+    inner = RecordingEmbeddings()
+    embeddings = BatchedEmbeddings(inner, "m", max_batch_size=2)
+    texts = ["甲", "乙", "甲", "丙", "丁"]
+    vectors = embeddings.embed_documents(texts)
+    assert vectors == [inner.inner.embed_query(text) for text in texts]
+    assert sorted(map(len, inner.batches)) == [2, 2]
+    stats = embeddings.stats
+    assert (stats["texts"], stats["duplicates"], stats["embedded"], stats["requests"]) == (5, 1, 4, 2)
+
+
+def test_cache_hits_skip_requests(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    first = BatchedEmbeddings(RecordingEmbeddings(), "m", cache=cache).embed_documents(["甲", "乙"])
+
+    inner = RecordingEmbeddings()
+    embeddings = BatchedEmbeddings(inner, "m", cache=EmbeddingCache(tmp_path / "embeddings.sqlite"))
+    assert embeddings.embed_documents(["乙", "丙", "甲"])[::2] == first[::-1]
+    assert inner.batches == [["丙"]]
+    assert embeddings.stats["cache_hits"] == 2
+
+
+def test_async_matches_sync():
+    texts = ["甲", "乙", "丙", "甲"]
+    expected = BatchedEmbeddings(RecordingEmbeddings(), "m").embed_documents(texts)
+    embeddings = BatchedEmbeddings(RecordingEmbeddings(), "m", max_batch_size=1)
+    assert asyncio.run(embeddings.aembed_documents(texts)) == expected
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_short_response_raises_clear_error(tmp_path, use_async):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    embeddings = BatchedEmbeddings(RecordingEmbeddings(drop=1), "m", cache=cache)
+    with pytest.raises(ValueError, match="2 条文本返回了 1 个向量"):
+        if use_async:
+            asyncio.run(embeddings.aembed_documents(["甲", "乙"]))
+        else:
+            embeddings.embed_documents(["甲", "乙"])
+    # 不完整的结果不写入缓存
+    assert cache.get_many([embedding_key("m", "甲"), embedding_key("m", "乙")]) == {}
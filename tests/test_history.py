@@ -0,0 +1,106 @@
+"""TokenBudgetHistory 的按轮淘汰、滚动摘要和摘要失败时的降级"""
+
+import logging
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from langchain_learning.utils.history import DEFAULT_PROMPT_TOKENS, TokenBudgetHistory
+
+
+def _count(message) -> int:
+    """每条消息按字符数计，便于精确控制预算"""
+    return len(message.content)
+
+
+def _history(budget: int, summarizer=None) -> TokenBudgetHistory:
+    return TokenBudgetHistory("系统", budget, summarizer=summarizer, token_counter=_count)
+
+
+def _add_turns(history: TokenBudgetHistory, count: int) -> None:
+    for i in range(count):
+        history.add_user_message(f"问题{i}")
+        history.add_ai_message(f"回答{i}")
+
+
+def _failing(_):
+    raise RuntimeError("摘要模型不可用")
+
+
+def test_evicts_whole_turns_within_budget():
+    history = _history(2 + 6 * 2)  # 系统提示加 2 轮，每轮 6 个字符
+    _add_turns(history, 5)
+    messages = history.messages()
+    assert [m.content for m in messages[1:]] == ["问题3", "回答3", "问题4", "回答4"]
+    assert isinstance(messages[1], HumanMessage)
+    assert history.evicted_turns == 3
+    assert history.last_prompt_tokens <= history.max_prompt_tokens
+
+
+def test_keeps_latest_message_even_over_budget():
+    history = _history(4)
+    history.add_user_message("一条很长的问题")
+    assert [m.content for m in history.messages()[1:]] == ["一条很长的问题"]
+
+
+def test_summarizes_evicted_turns():
+    summarizer = GenericFakeChatModel(messages=iter([AIMessage(content="概要")]))
+    history = _history(2 + 11 + 6 * 2, summarizer=summarizer)  # 系统提示、摘要加 2 轮
+    _add_turns(history, 4)
+    messages = history.messages()
+    assert "之前对话的摘要: 概要" in messages[0].content
+    assert history.summary is not None
+    assert history.last_prompt_tokens <= history.max_prompt_tokens
+
+
+def test_every_evicted_turn_reaches_summarizer():
+    seen = []
+
+    def summarize(messages):
+        seen.append(messages[-1].content)
+        return AIMessage(content="一段更长的摘要")  # 摘要变长，需要再淘汰一次
+
+    history = _history(2 + 11 + 6 * 2, summarizer=RunnableLambda(summarize))
+    _add_turns(history, 6)
+    messages = history.messages()
+
+    assert [m.content for m in messages[1:]] == ["问题5", "回答5"]
+    assert history.evicted_turns == 5
+    assert history.last_prompt_tokens <= history.max_prompt_tokens
+    assert len(seen) == 2
+    assert seen[1].startswith("已有摘要: ")
+    summarized = "\n".join(seen)
+    for i in range(5):
+        assert f"用户: 问题{i}\n助手: 回答{i}" in summarized
+
+
+def test_failed_summary_falls_back_to_eviction(caplog):
+    history = _history(2 + 6 * 2, summarizer=RunnableLambda(_failing))
+    _add_turns(history, 4)
+    with caplog.at_level(logging.WARNING, logger="langchain_learning.utils.history"):
+        messages = history.messages()
+    assert [m.content for m in messages[1:]] == ["问题2", "回答2", "问题3", "回答3"]
+    assert history.evicted_turns == 2
+    assert history.summary is None
+    assert history.last_prompt_tokens <= history.max_prompt_tokens
+    assert "摘要模型调用失败" in caplog.text
+
+    # 摘要模型恢复后，之后淘汰的轮次照常进入摘要
+    seen = []
+
+    def summarize(messages):
+        seen.append(messages[-1].content)
+        return AIMessage(content="概要")
+
+    history.summarizer = RunnableLambda(summarize)
+    _add_turns(history, 1)
+    history.messages()
+    assert seen[0].startswith("用户: 问题2\n助手: 回答2")
+    assert history.summary is not None
+
+
+def test_for_model_defaults_to_small_budget():
+    history = TokenBudgetHistory.for_model("Qwen/Qwen3-8B", "系统")
+    assert history.max_prompt_tokens == DEFAULT_PROMPT_TOKENS
+    assert TokenBudgetHistory.for_model("Qwen/Qwen3-8B", "系统", max_prompt_tokens=10**9).max_prompt_tokens < 131072
@@ -0,0 +1,91 @@
+"""sync_documents 的新增、更新、跳过和删除"""
+
+import uuid
+from typing import List
+
+import pytest
+from langchain_chroma import Chroma
+
+from langchain_learning.models.embeddings import HashedNGramEmbeddings
+from langchain_learning.utils.ingestion import HASH_KEY, SOURCE_KEY, sync_documents
+
+
+class CountingEmbeddings(HashedNGramEmbeddings):
+    """记录嵌入过的文本"""
+
+    def __init__(self):
+        super().__init__(dims=32)
+        self.embedded: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def store():
+    embeddings = CountingEmbeddings()
+    store = Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings)
+    yield store
+    store.delete_collection()
+
+
+def _embedded(store: Chroma) -> List[str]:
+    return store.embeddings.embedded  # type: ignore[union-attr]
+
+
+def test_first_sync_adds_everything(store):
+    report = sync_documents(store, ["甲", "乙"], ["a", "b"], source="notes")
+    assert (report.added, report.updated, report.unchanged, report.deleted) == (["a", "b"], [], [], [])
+    stored = store.get(ids=["a"], include=["metadatas"])["metadatas"][0]
+    assert stored[SOURCE_KEY] == "notes" and stored[HASH_KEY]
+
+
+def test_unchanged_corpus_embeds_nothing(store):
+    sync_documents(store, ["甲", "乙"], ["a", "b"])
+    _embedded(store).clear()
+    report = sync_documents(store, ["甲", "乙"], ["a", "b"])
+    assert report.unchanged == ["a", "b"]
+    assert report.embedded == 0
+    assert _embedded(store) == []
+
+
+def test_changed_text_or_metadata_is_updated(store):
+    sync_documents(store, ["甲", "乙", "丙"], ["a", "b", "c"], metadatas=[{"k": 1}, {"k": 1}, {"k": 1}])
+    _embedded(store).clear()
+    report = sync_documents(store, ["甲", "乙2", "丙"], ["a", "b", "c"], metadatas=[{"k": 1}, {"k": 1}, {"k": 2}])
+    assert (report.updated, report.unchanged) == (["b", "c"], ["a"])
+    assert sorted(_embedded(store)) == ["丙", "乙2"]
+    assert store.get(ids=["b"])["documents"] == ["乙2"]
+
+
+def test_stale_documents_are_deleted_within_source(store):
+    sync_documents(store, ["甲", "乙"], ["a", "b"], source="notes")
+    sync_documents(store, ["丙"], ["c"], source="faq")
+    store.add_texts(["手动写入"], ids=["manual"])
+
+    report = sync_documents(store, ["甲"], ["a"], source="notes")
+    assert report.deleted == ["b"]
+    assert sorted(store.get()["ids"]) == ["a", "c", "manual"]
+
+    # 不限来源时只删除带有内容哈希的文档
+    report = sync_documents(store, ["甲"], ["a"], source="notes", delete_stale=False)
+    assert report.deleted == []
+    report = sync_documents(store, ["甲"], ["a"])
+    assert (report.unchanged, report.deleted) == (["a"], ["c"])
+    assert "manual" in store.get()["ids"]
+
+
+def test_paging_and_batching(store):
+    texts = [f"文档{i}" for i in range(25)]
+    ids = [str(i) for i in range(25)]
+    assert len(sync_documents(store, texts, ids, batch_size=4, page_size=7).added) == 25
+    report = sync_documents(store, texts, ids, batch_size=4, page_size=7)
+    assert len(report.unchanged) == 25
+
+
+def test_rejects_mismatched_or_duplicate_ids(store):
+    with pytest.raises(ValueError):
+        sync_documents(store, ["甲", "乙"], ["a"])
+    with pytest.raises(ValueError):
+        sync_documents(store, ["甲", "乙"], ["a", "a"])
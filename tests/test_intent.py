@@ -0,0 +1,102 @@
+"""NGramIntentClassifier 在带标签样本上的准确率"""
+
+import pytest
+
+from langchain_learning.examples.advanced_agent import CONDITIONAL_DEMO_INPUTS
+from langchain_learning.utils.intent import NGramIntentClassifier, parse_intent
+
+# 意图明确、应当走快速路径的输入
+CLEAR = [
+    ("北京明天会下雨吗，气温多少度?", "weather"),
+    ("上海这周的天气预报，会不会下雪", "weather"),
+    ("今天湿度和风速是多少", "weather"),
+    ("show me the weather forecast for Tokyo", "weather"),
+    ("今天有什么头条新闻", "news"),
+    ("给我几条科技资讯和快讯", "news"),
+    ("latest news headline please", "news"),
+    ("请分析这段数据: {'sales': [100, 200, 150], 'profit': [10, 20, 15]}", "data"),
+    ("统计一下上个月的销量趋势", "data"),
+    ("帮我安排一个明天上午的会议", "task"),
+    ("提醒我下午三点的日程", "task"),
+    ("schedule a meeting with the team", "task"),
+    ("你好，请介绍一下你自己", "general"),
+    ("您好，你是谁", "general"),
+]
+
+# 只包含一个关键词、或者完全是别的话题的输入：不能被快速路径分错
+AMBIGUOUS = [
+    ("What is machine learning? Explain this.", "general"),
+    ("温度计的原理是什么", "general"),
+    ("晴天霹雳是什么意思", "general"),
+    ("给我讲讲分析哲学", "general"),
+    ("消息队列是什么", "general"),
+    ("北京今天天气怎么样?", "weather"),
+    ("最近有什么科技新闻?", "news"),
+    ("this is a great idea", "general"),
+    ("他的计划失败了，这是什么原因", "general"),
+]
+
+
+@pytest.fixture
+def classifier() -> NGramIntentClassifier:
+    return NGramIntentClassifier()
+
+
+def test_clear_inputs_take_fast_path(classifier):
+    predictions = [classifier.predict(text) for text, _ in CLEAR]
+    assert predictions == [label for _, label in CLEAR]
+
+
+def test_no_confident_misroutes(classifier):
+    """快速路径给出的意图要么正确，要么返回 None 交给 LLM"""
+    wrong = [
+        (text, prediction)
+        for text, label in CLEAR + AMBIGUOUS
+        if (prediction := classifier.predict(text)) is not None and prediction != label
+    ]
+    assert wrong == []
+
+
+def test_single_keyword_falls_back(classifier):
+    for text in ("温度计的原理是什么", "消息队列是什么", "晴天霹雳是什么意思"):
+        assert classifier.predict(text) is None
+    assert classifier.stats["fallbacks"] == 3
+
+
+def test_strong_keyword_resolves_on_single_hit(classifier):
+    assert classifier.predict("北京今天天气怎么样?") == "weather"
+    assert classifier.predict("最近有什么科技新闻?") == "news"
+    assert NGramIntentClassifier(strong_keywords={}).predict("北京今天天气怎么样?") is None
+
+    classifier.add_keywords("news", ["热搜"], strong=True)
+    assert classifier.predict("今天的热搜是什么") == "news"
+
+
+def test_conditional_demo_inputs_resolve_locally(classifier):
+    predictions = [classifier.predict(text) for text in CONDITIONAL_DEMO_INPUTS]
+    assert predictions == ["weather", "news", "data", "task", "general"]
+    assert classifier.stats["fallbacks"] == 0
+
+
+def test_english_keywords_match_whole_words(classifier):
+    assert classifier.scores("What is machine learning? Explain this.") == dict.fromkeys(classifier.scores(""), 0.0)
+    assert classifier.scores("hi there")["general"] > 0
+
+
+def test_min_hits_is_configurable():
+    assert NGramIntentClassifier(min_hits=1).predict("温度计的原理是什么") == "weather"
+
+
+def test_embedding_fallback(classifier):
+    vectors = {"明天要带伞吗": [1.0, 0.0], "最近发生了什么": [0.0, 1.0], "出门要不要带伞": [0.9, 0.1]}
+    classifier.fit_centroids(
+        {"weather": ["明天要带伞吗"], "news": ["最近发生了什么"]},
+        embed=lambda texts: [vectors[text] for text in texts],
+    )
+    assert classifier.predict("出门要不要带伞") == "weather"
+    assert classifier.stats["embedding_hits"] == 1
+
+
+def test_parse_intent():
+    assert parse_intent("Intent: WEATHER") == "weather"
+    assert parse_intent("不知道") == "general"
@@ -0,0 +1,74 @@
+"""TwoTierLLMCache 的内存命中、磁盘命中、重新打开和流式重放"""
+
+import time
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from langchain_learning.utils.llm_cache import TwoTierLLMCache
+
+REPLY = "北京 今天 晴朗 气温 二十 度"
+
+
+def _model(cache: TwoTierLLMCache) -> GenericFakeChatModel:
+    # 只准备一条回复，第二次调用必须命中缓存
+    return GenericFakeChatModel(messages=iter([AIMessage(content=REPLY)]), cache=cache)
+
+
+def _generations(text: str):
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def test_memory_hit():
+    cache = TwoTierLLMCache()
+    model = _model(cache)
+    assert model.invoke("北京天气").content == REPLY
+    assert model.invoke("北京天气").content == REPLY
+    stats = cache.stats
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 0, 1)
+
+
+def test_disk_hit_after_reopen(tmp_path):
+    path = tmp_path / "llm_cache.sqlite"
+    assert _model(TwoTierLLMCache(path)).invoke("北京天气").content == REPLY
+
+    reopened = TwoTierLLMCache(path)
+    model = _model(reopened)
+    next(model.messages)  # 耗尽回复，未命中缓存时调用会失败
+    assert model.invoke("北京天气").content == REPLY
+    assert model.invoke("北京天气").content == REPLY
+    stats = reopened.stats
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_memory_eviction_falls_back_to_disk(tmp_path):
+    cache = TwoTierLLMCache(tmp_path / "llm_cache.sqlite", max_memory_items=1)
+    cache.put("a", _generations("甲"))
+    cache.put("b", _generations("乙"))
+    assert cache.get("a")[0].message.content == "甲"
+    assert cache.stats["disk_hits"] == 1
+
+
+def test_expired_entries_miss(tmp_path):
+    path = tmp_path / "llm_cache.sqlite"
+    TwoTierLLMCache(path, ttl=0.01).put("a", _generations("甲"))
+    time.sleep(0.02)
+    cache = TwoTierLLMCache(path, ttl=0.01)
+    assert cache.get("a") is None
+    assert (cache.stats["expired"], cache.stats["misses"]) == (1, 1)
+
+
+def test_stream_replays_cached_reply():
+    cache = TwoTierLLMCache()
+    model = _model(cache)
+    first = list(cache.stream(model, "北京天气"))
+    assert "".join(chunk.content for chunk in first) == REPLY
+
+    replayed = list(cache.stream(model, "北京天气", chunk_size=4))
+    assert "".join(chunk.content for chunk in replayed) == REPLY
+    assert len(replayed) == -(-len(REPLY) // 4)
+    assert replayed[-1].response_metadata["cache_hit"] is True
+    # 流式写入的条目与 invoke 使用同一个键
+    assert model.invoke("北京天气").content == REPLY
+    assert cache.stats["memory_hits"] == 2
@@ -0,0 +1,190 @@
+"""MatrixStore、SQLiteStore 与 LangGraph 自带 InMemoryStore 的行为一致性，以及 SQLiteStore 的持久化"""
+
+from typing import Any, Callable, Dict, List
+
+import pytest
+from langgraph.store.base import BaseStore
+from langgraph.store.memory import InMemoryStore
+
+from langchain_learning.models.embeddings import HashedNGramEmbeddings
+from langchain_learning.utils.matrix_store import MatrixStore
+from langchain_learning.utils.sqlite_store import SQLiteStore
+
+DIMS = 64
+
+MEMORIES = [
+    (("u1", "memories"), "m1", {"text": "用户喜欢吃川菜，尤其是麻婆豆腐", "kind": "food", "rating": 5}),
+    (("u1", "memories"), "m2", {"text": "用户周末喜欢去爬山", "kind": "hobby", "rating": 3}),
+    (("u1", "memories"), "m3", {"text": "用户不喜欢吃香菜", "kind": "food", "rating": 1}),
+    (("u1", "profile"), "p1", {"text": "用户住在北京，是一名 Python 工程师", "kind": "profile", "rating": 0}),
+    (("u2", "memories"), "m1", {"text": "用户在学习 LangChain 和 LangGraph", "kind": "study", "rating": 4}),
+    (("u2", "memories", "archive"), "a1", {"text": "用户去年喜欢吃火锅", "kind": "food", "rating": 2}),
+    (("u2", "memories"), "m9", {"note": "没有 text 字段，不会被索引", "kind": "food", "rating": 0}),
+]
+
+
+class CountingEmbeddings:
+    """记录被嵌入的文本，用于检查没有变化的写入是否重新嵌入"""
+
+    def __init__(self):
+        self.inner = HashedNGramEmbeddings(dims=DIMS)
+        self.texts: List[str] = []
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        self.texts.extend(texts)
+        return self.inner.embed_documents(texts)
+
+
+def _index(embed: Callable[[List[str]], List[List[float]]]) -> Dict[str, Any]:
+    return {"embed": embed, "dims": DIMS, "fields": ["text"]}
+
+
+def _fill(store: BaseStore) -> BaseStore:
+    for namespace, key, value in MEMORIES:
+        store.put(namespace, key, value)
+    return store
+
+
+def _items(results) -> List[tuple]:
+    return [(item.namespace, item.key, item.value) for item in results]
+
+
+def _scored(results) -> List[tuple]:
+    return [(item.namespace, item.key, None if item.score is None else round(item.score, 4)) for item in results]
+
+
+@pytest.fixture
+def reference():
+    return _fill(InMemoryStore(index=_index(HashedNGramEmbeddings(dims=DIMS))))
+
+
+@pytest.fixture(params=["matrix", "sqlite"])
+def store(request, tmp_path):
+    index = _index(HashedNGramEmbeddings(dims=DIMS))
+    if request.param == "matrix":
+        yield _fill(MatrixStore(index=index))
+        return
+    store = SQLiteStore(tmp_path / "store.sqlite", index=index)
+    yield _fill(store)
+    store.close()
+
+
+def test_put_get_delete(store, reference):
+    for namespace, key, _ in MEMORIES:
+        assert store.get(namespace, key).value == reference.get(namespace, key).value
+    assert store.get(("u1", "memories"), "missing") is None
+
+    store.put(("u1", "memories"), "m1", {"text": "用户改成喜欢吃粤菜", "kind": "food", "rating": 4})
+    updated = store.get(("u1", "memories"), "m1")
+    assert updated.value["text"] == "用户改成喜欢吃粤菜"
+    assert updated.updated_at >= updated.created_at
+
+    store.delete(("u1", "memories"), "m1")
+    assert store.get(("u1", "memories"), "m1") is None
+    assert "m1" not in [item.key for item in store.search(("u1",), query="粤菜")]
+
+
+@pytest.mark.parametrize("prefix", [(), ("u1",), ("u2", "memories"), ("u3",)])
+def test_prefix_search(store, reference, prefix):
+    assert sorted(_items(store.search(prefix, limit=100))) == sorted(_items(reference.search(prefix, limit=100)))
+
+
+@pytest.mark.parametrize(
+    "filter",
+    [
+        {"kind": "food"},
+        {"rating": {"$gte": 3}},
+        {"rating": {"$lt": 3}, "kind": "food"},
+        {"kind": {"$ne": "food"}},
+    ],
+)
+def test_filters(store, reference, filter):
+    assert sorted(_items(store.search((), filter=filter, limit=100))) == sorted(
+        _items(reference.search((), filter=filter, limit=100))
+    )
+    assert _scored(store.search((), query="喜欢吃什么", filter=filter, limit=100)) == _scored(
+        reference.search((), query="喜欢吃什么", filter=filter, limit=100)
+    )
+
+
+@pytest.mark.parametrize("query", ["喜欢吃什么菜", "爬山", "LangGraph"])
+@pytest.mark.parametrize("offset,limit", [(0, 3), (1, 2), (0, 100)])
+def test_vector_search_scores(store, reference, query, offset, limit):
+    got = _scored(store.search(("u1",), query=query, offset=offset, limit=limit))
+    assert got == _scored(reference.search(("u1",), query=query, offset=offset, limit=limit))
+    # 没有向量的记忆排在最后
+    everything = _scored(store.search((), query=query, limit=100))
+    assert everything == _scored(reference.search((), query=query, limit=100))
+    assert everything[-1][1:] == ("m9", None)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"prefix": ("u2",)},
+        {"suffix": ("memories",)},
+        {"prefix": ("u2", "*", "archive")},
+        {"max_depth": 1},
+        {"limit": 2, "offset": 1},
+    ],
+)
+def test_list_namespaces(store, reference, kwargs):
+    assert store.list_namespaces(**kwargs) == reference.list_namespaces(**kwargs)
+
+
+@pytest.mark.parametrize("cls", [MatrixStore, SQLiteStore])
+def test_unindexed_store_has_no_scores(cls):
+    store = _fill(cls())
+    assert all(item.score is None for item in store.search((), query="喜欢吃什么", limit=100))
+    assert len(store.search((), limit=100)) == len(MEMORIES)
+
+
+@pytest.mark.parametrize("cls", [MatrixStore, SQLiteStore])
+def test_dims_mismatch_is_rejected_before_writing(cls):
+    store = cls(index=_index(HashedNGramEmbeddings(dims=DIMS // 2)))
+    with pytest.raises(ValueError, match="维度"):
+        store.put(("u1",), "k", {"text": "用户喜欢吃川菜"})
+    assert store.get(("u1",), "k") is None
+    assert store.index_stats()["keys"] == 0
+
+
+def test_sqlite_reopen_from_disk(tmp_path, reference):
+    path = tmp_path / "store.sqlite"
+    store = _fill(SQLiteStore(path, index=_index(HashedNGramEmbeddings(dims=DIMS))))
+    store.delete(("u1", "memories"), "m3")
+    reference.delete(("u1", "memories"), "m3")
+    store.close()
+
+    embeddings = CountingEmbeddings()
+    reopened = SQLiteStore(path, index=_index(embeddings))
+    assert reopened.list_namespaces() == reference.list_namespaces()
+    assert sorted(_items(reopened.search((), limit=100))) == sorted(_items(reference.search((), limit=100)))
+    assert _scored(reopened.search((), query="喜欢吃什么", limit=100)) == _scored(
+        reference.search((), query="喜欢吃什么", limit=100)
+    )
+    # 向量从数据库读取，只有查询需要嵌入
+    assert embeddings.texts == ["喜欢吃什么"]
+
+
+def test_sqlite_skips_reembedding_unchanged_puts(tmp_path):
+    embeddings = CountingEmbeddings()
+    store = _fill(SQLiteStore(tmp_path / "store.sqlite", index=_index(embeddings)))
+    embedded = len(embeddings.texts)
+
+    _fill(store)
+    assert len(embeddings.texts) == embedded
+
+    # 值变化或索引字段变化的写入重新嵌入
+    store.put(("u1", "memories"), "m2", {"text": "用户周末喜欢去游泳", "kind": "hobby", "rating": 3})
+    assert embeddings.texts[embedded:] == ["用户周末喜欢去游泳"]
+    store.put(("u1", "memories"), "m2", {"text": "用户周末喜欢去游泳", "kind": "hobby", "rating": 3}, index=["kind"])
+    assert embeddings.texts[embedded + 1:] == ["hobby"]
+    assert store.search(("u1",), query="hobby", limit=1)[0].key == "m2"
+
+
+def test_sqlite_dims_mismatch_on_reopen(tmp_path):
+    path = tmp_path / "store.sqlite"
+    SQLiteStore(path, index=_index(HashedNGramEmbeddings(dims=DIMS))).close()
+    with pytest.raises(ValueError, match="维度"):
+        SQLiteStore(path, index={"embed": HashedNGramEmbeddings(dims=32), "dims": 32})
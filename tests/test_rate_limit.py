@@ -0,0 +1,126 @@
+"""AdaptiveRateLimiter 的 Retry-After 暂停、AIMD 调整和令牌桶等待"""
+
+import itertools
+import json
+import time
+
+import httpx
+import pytest
+
+from langchain_learning.models.rate_limit import (
+    AdaptiveRateLimiter,
+    RateLimitConfig,
+    RateLimitedTransport,
+    RateLimiterGroup,
+)
+
+URL = "http://stub/v1/chat/completions"
+BODY = json.dumps({"model": "m", "messages": [{"role": "user", "content": "你好"}]}).encode()
+SSE = b'data: {"choices": []}\n\ndata: [DONE]\n\n'
+
+
+def _client(handler, **config) -> tuple:
+    limiters = RateLimiterGroup(RateLimitConfig(**{"requests_per_minute": None, "tokens_per_minute": None, **config}))
+    return httpx.Client(transport=RateLimitedTransport(httpx.MockTransport(handler), limiters)), limiters
+
+
+def test_retry_after_pauses_new_requests():
+    counter = itertools.count()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if next(counter) == 0:
+            return httpx.Response(429, headers={"retry-after": "0.3"})
+        return httpx.Response(200, json={})
+
+    client, limiters = _client(handler)
+    assert client.post(URL, content=BODY).status_code == 429
+    assert limiters.stats()["m"]["paused_for"] > 0.2
+    started = time.monotonic()
+    assert client.post(URL, content=BODY).status_code == 200
+    assert time.monotonic() - started >= 0.25
+
+
+def test_overload_halves_limit_once_per_cooldown():
+    client, limiters = _client(lambda request: httpx.Response(503), initial_concurrency=8)
+    for _ in range(3):
+        client.post(URL, content=BODY)
+    stats = limiters.stats()["m"]
+    assert (stats["concurrency_limit"], stats["decreases"], stats["overloaded"]) == (4, 1, 3)
+
+
+def test_additive_increase_when_limit_is_saturated():
+    limiter = AdaptiveRateLimiter(RateLimitConfig(initial_concurrency=2, max_concurrency=4))
+    for _ in range(4):
+        permits = [limiter.acquire() for _ in range(limiter.concurrency_limit)]
+        for permit in permits:
+            permit.status = 200
+            limiter.release(permit)
+    assert limiter.concurrency_limit == 3
+
+
+def test_additive_increase_needs_saturation():
+    limiter = AdaptiveRateLimiter(RateLimitConfig(initial_concurrency=2, max_concurrency=4))
+    for _ in range(10):
+        permit = limiter.acquire()
+        permit.status = 200
+        limiter.release(permit)
+    assert limiter.concurrency_limit == 2
+
+
+def _slowing(content_type: str, body: bytes):
+    """前 5 个请求 5ms 返回响应头，之后 50ms"""
+    counter = itertools.count()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(0.005 if next(counter) < 5 else 0.05)
+        return httpx.Response(200, content=body, headers={"content-type": content_type})
+
+    return handler
+
+
+def test_streaming_latency_increase_decreases_limit():
+    client, limiters = _client(_slowing("text/event-stream", SSE), initial_concurrency=8)
+    for _ in range(10):
+        client.post(URL, content=BODY)
+    stats = limiters.stats()["m"]
+    assert stats["decreases"] == 1
+    assert stats["concurrency_limit"] == 4
+
+
+def test_non_streaming_latency_is_ignored():
+    """非流式响应的响应头要等生成结束，时间长短反映的是输出长度"""
+    client, limiters = _client(_slowing("application/json", b"{}"), initial_concurrency=8)
+    for _ in range(10):
+        client.post(URL, content=BODY)
+    stats = limiters.stats()["m"]
+    assert (stats["decreases"], stats["latency"]) == (0, None)
+
+
+def test_request_bucket_waits():
+    # 每秒 10 个请求，容量 1 个
+    limiter = AdaptiveRateLimiter(RateLimitConfig(requests_per_minute=600, tokens_per_minute=None, burst_seconds=0.1))
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.release(limiter.acquire())
+    assert time.monotonic() - started == pytest.approx(0.2, abs=0.05)
+
+
+def test_token_bucket_waits_and_refunds():
+    # 每秒 100 个 token，容量 100 个
+    limiter = AdaptiveRateLimiter(RateLimitConfig(requests_per_minute=None, tokens_per_minute=6000, burst_seconds=1.0))
+    # 预扣 100，实际只用 50，退回的 50 够下一个请求立即执行
+    limiter.release(limiter.acquire(100), used_tokens=50)
+    started = time.monotonic()
+    limiter.release(limiter.acquire(40), used_tokens=40)
+    assert time.monotonic() - started < 0.05
+    # 余量约 10，预扣 30 需要等约 0.2 秒
+    limiter.release(limiter.acquire(30), used_tokens=30)
+    assert time.monotonic() - started == pytest.approx(0.2, abs=0.05)
+
+
+def test_deadline_rejects_long_token_wait():
+    limiter = AdaptiveRateLimiter(RateLimitConfig(requests_per_minute=None, tokens_per_minute=60, burst_seconds=1.0))
+    limiter.release(limiter.acquire(1), used_tokens=1)
+    with pytest.raises(httpx.TimeoutException):
+        limiter.acquire(10, timeout=0.1)
+    assert limiter.stats()["in_flight"] == 0
@@ -0,0 +1,138 @@
+"""ResilientTransport 的重试、时限和对冲"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from langchain_learning.models.metadata import ResiliencePolicy
+from langchain_learning.models.rate_limit import (
+    AsyncRateLimitedTransport,
+    RateLimitConfig,
+    RateLimitedTransport,
+    RateLimiterGroup,
+)
+from langchain_learning.models.resilience import (
+    AsyncResilientTransport,
+    DeadlineExceeded,
+    ResilienceGroup,
+    ResilientTransport,
+)
+
+URL = "http://stub/v1/chat/completions"
+BODY = json.dumps({"model": "m", "messages": [{"role": "user", "content": "你好"}]}).encode()
+OK = {"choices": [], "usage": {"total_tokens": 42}}
+
+
+def _group(**policy) -> ResilienceGroup:
+    return ResilienceGroup(lambda model: ResiliencePolicy(**{"backoff_base": 0.01, **policy}))
+
+
+def _flaky(status: int):
+    """前两次返回 status，之后返回 200"""
+    counter = itertools.count()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if next(counter) < 2:
+            return httpx.Response(status, headers={"retry-after": "0"})
+        return httpx.Response(200, json=OK)
+
+    return handler
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_retryable_status(status):
+    group = _group()
+    client = httpx.Client(transport=ResilientTransport(httpx.MockTransport(_flaky(status)), group))
+    assert client.post(URL, content=BODY).status_code == 200
+    stats = group.stats()["m"]
+    assert (stats["attempts"], stats["retries"]) == (3, 2)
+
+
+def test_gives_up_after_max_attempts():
+    group = _group(max_attempts=2)
+    client = httpx.Client(transport=ResilientTransport(httpx.MockTransport(_flaky(500)), group))
+    assert client.post(URL, content=BODY).status_code == 500
+    assert group.stats()["m"]["attempts"] == 2
+
+
+def test_does_not_retry_client_errors():
+    group = _group()
+    transport = httpx.MockTransport(lambda request: httpx.Response(400, json={}))
+    client = httpx.Client(transport=ResilientTransport(transport, group))
+    assert client.post(URL, content=BODY).status_code == 400
+    assert group.stats()["m"]["retries"] == 0
+
+
+def _held_limiter():
+    """并发上限为 1、后端耗时 1 秒的限流层"""
+    limiters = RateLimiterGroup(RateLimitConfig(initial_concurrency=1, max_concurrency=1))
+
+    def slow(request: httpx.Request) -> httpx.Response:
+        time.sleep(1.0)
+        return httpx.Response(200, json=OK)
+
+    async def aslow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1.0)
+        return httpx.Response(200, json=OK)
+
+    return limiters, slow, aslow
+
+
+def test_sync_deadline_bounds_rate_limiter_queue():
+    """排在限流队列中的同步请求在时限到达时失败，而不是等前一个请求结束"""
+    limiters, slow, _ = _held_limiter()
+    group = _group(deadline=0.3)
+    client = httpx.Client(transport=ResilientTransport(RateLimitedTransport(httpx.MockTransport(slow), limiters), group))
+    holder = threading.Thread(target=client.post, args=(URL,), kwargs={"content": BODY})
+    holder.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        client.post(URL, content=BODY)
+    assert time.perf_counter() - started < 0.6
+    holder.join()
+    stats = limiters.stats()["m"]
+    assert (stats["in_flight"], stats["queued"]) == (0, 0)
+
+
+def test_async_deadline_bounds_rate_limiter_queue():
+    limiters, _, aslow = _held_limiter()
+    group = _group(deadline=0.3)
+
+    async def run():
+        transport = AsyncResilientTransport(AsyncRateLimitedTransport(httpx.MockTransport(aslow), limiters), group)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await asyncio.gather(client.post(URL, content=BODY), client.post(URL, content=BODY), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, DeadlineExceeded) for result in results)
+    assert limiters.stats()["m"]["in_flight"] == 0
+
+
+def test_async_hedge_wins_and_counts_extra_tokens():
+    """延迟样本足够后，慢请求被对冲，落后的请求计入额外 token"""
+    counter = itertools.count()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        # 第 25 个请求很慢，对冲请求很快
+        await asyncio.sleep(1.0 if next(counter) == 24 else 0.001)
+        return httpx.Response(200, json=OK)
+
+    group = _group(hedge=True, hedge_min_samples=20, hedge_min_delay=0.02)
+
+    async def run():
+        async with httpx.AsyncClient(transport=AsyncResilientTransport(httpx.MockTransport(handler), group)) as client:
+            for _ in range(30):
+                await client.post(URL, content=BODY)
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    assert time.perf_counter() - started < 1.0
+    stats = group.stats()["m"]
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+    assert stats["extra_tokens"] > 0
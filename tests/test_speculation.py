@@ -0,0 +1,102 @@
+"""SpeculativeRouter 的猜中、猜错、推测先于分类结束和推测出错"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from langchain_learning.utils.speculation import IntentSpeculator, SpeculativeRouter
+
+INPUT = {"input": "北京今天天气怎么样?"}
+
+
+def _chain(text: str) -> Runnable:
+    """用按空格切分逐块输出固定回复的模型组成的处理链"""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=text)] * 4))
+    return RunnableLambda(lambda x: x["input"]) | model | StrOutputParser()
+
+
+def _classifier(intent: str, delay: float = 0.0) -> RunnableLambda:
+    def classify(_: dict) -> str:
+        time.sleep(delay)
+        return intent
+
+    async def aclassify(_: dict) -> str:
+        await asyncio.sleep(delay)
+        return intent
+
+    return RunnableLambda(classify, afunc=aclassify)
+
+
+def _failing(_: dict) -> str:
+    raise RuntimeError("推测分支出错")
+
+
+def _router(intent: str, guess: str, delay: float = 0.0, weather=None) -> SpeculativeRouter:
+    routes = {
+        "weather": weather or _chain("北京 今天 晴朗 气温 二十 度"),
+        "general": _chain("你好"),
+    }
+    return SpeculativeRouter(_classifier(intent, delay), routes, IntentSpeculator(priors={guess: 1}))
+
+
+def _run(router: SpeculativeRouter, use_async: bool) -> str:
+    if use_async:
+        return asyncio.run(router.ainvoke(INPUT))
+    return router.invoke(INPUT)
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_correct_guess(use_async):
+    router = _router("weather", guess="weather")
+    assert _run(router, use_async) == "北京 今天 晴朗 气温 二十 度"
+    stats = router.speculator.stats
+    assert (stats["hits"], stats["misses"], stats["wasted_tokens"]) == (1, 0, 0)
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_wrong_guess(use_async):
+    router = _router("general", guess="weather", delay=0.01)
+    assert _run(router, use_async) == "你好"
+    stats = router.speculator.stats
+    assert (stats["hits"], stats["misses"]) == (0, 1)
+    assert stats["wasted_tokens"] > 0
+
+
+def test_branch_finished_before_classification_counts_same_waste():
+    """猜错的推测在分类返回之前已经结束时，同步和异步记录的浪费相同"""
+    wasted = []
+    for use_async in (False, True):
+        router = _router("general", guess="weather", delay=0.2)
+        assert _run(router, use_async) == "你好"
+        wasted.append(router.speculator.stats["wasted_tokens"])
+    assert wasted[0] == wasted[1] > 0
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_failing_branch_on_correct_guess_raises(use_async):
+    router = _router("weather", guess="weather", weather=RunnableLambda(_failing))
+    with pytest.raises(RuntimeError, match="推测分支出错"):
+        _run(router, use_async)
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_failing_branch_on_wrong_guess_is_discarded(use_async):
+    """猜错的推测分支出错时不影响正确分支的输出，输入仍然计为浪费"""
+    router = _router("general", guess="weather", delay=0.05, weather=RunnableLambda(_failing))
+    assert _run(router, use_async) == "你好"
+    stats = router.speculator.stats
+    assert stats["misses"] == 1
+    assert stats["wasted_tokens"] > 0
+
+
+def test_classifier_error_discards_speculation():
+    router = _router("weather", guess="weather", delay=0.05)
+    router.classifier = RunnableLambda(_failing)
+    with pytest.raises(RuntimeError):
+        router.invoke(INPUT)
+    assert router.speculator.stats["speculations"] == 0
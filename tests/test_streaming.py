@@ -0,0 +1,49 @@
+"""StreamRenderer 的限帧渲染和最终输出"""
+
+import io
+import time
+
+import pytest
+from rich.console import Console
+
+from langchain_learning.utils.streaming import StreamRenderer
+
+LINES = [f"第{i:02d}行\n" for i in range(40)]
+
+
+def _console() -> Console:
+    return Console(file=io.StringIO(), force_terminal=True, width=40, height=8)
+
+
+def _stream(lines, error=None):
+    for line in lines:
+        time.sleep(0.002)
+        yield line
+    if error is not None:
+        raise error
+
+
+def test_long_reply_is_printed_once():
+    """超出终端高度的回复不会在每一帧重复打印"""
+    console = _console()
+    result = StreamRenderer(console, fps=200, show_stats=False).render(_stream(LINES))
+    assert result.text == "".join(LINES)
+    output = console.file.getvalue()
+    # 超出屏幕的行只在结束时打印一次
+    for line in LINES[8:]:
+        assert output.count(line.strip()) == 1
+
+
+def test_error_prints_partial_reply_and_raises():
+    console = _console()
+    with pytest.raises(RuntimeError, match="断开"):
+        StreamRenderer(console, show_stats=False).render(_stream(LINES[:3], RuntimeError("连接断开")))
+    assert "第02行" in console.file.getvalue()
+
+
+def test_stats_count_chunks_without_usage():
+    console = _console()
+    result = StreamRenderer(console).render(iter(["你好", "世界"]))
+    assert (result.text, result.output_tokens) == ("你好世界", 2)
+    assert result.ttft is not None
+    assert "tok/s" in console.file.getvalue()
@@ -0,0 +1,78 @@
+"""通过 get_chat_model / get_embeddings 驱动本地替身服务"""
+
+import asyncio
+
+import pytest
+from langchain_core.tools import tool
+
+from langchain_learning.models.client import DEFAULT_MODEL, close_clients, configure_resilience, get_chat_model
+from langchain_learning.models.embeddings import get_embeddings
+from langchain_learning.models.metadata import ResiliencePolicy
+from langchain_learning.utils.stub_server import DEFAULT_REPLY, StubConfig, StubServer
+from langchain_learning.utils.tokens import estimate_tokens
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with StubServer(StubConfig(completion_tokens=len(DEFAULT_REPLY), seed=1)) as server:
+        monkeypatch.setenv("SILICONFLOW_API_KEY", "stub")
+        monkeypatch.setenv("SILICONFLOW_BASE_URL", server.base_url)
+        yield server
+        configure_resilience(per_model={})
+        close_clients()
+
+
+@tool
+def weather_search(location: str) -> str:
+    """天气搜索工具：查询城市的天气"""
+    return f"{location} 晴"
+
+
+def test_invoke_reports_usage(server):
+    reply = get_chat_model().invoke("你好，请介绍一下你自己")
+    assert reply.content == DEFAULT_REPLY
+    usage = reply.usage_metadata
+    assert usage["input_tokens"] == estimate_tokens("你好，请介绍一下你自己")
+    assert usage["output_tokens"] == len(DEFAULT_REPLY)
+
+
+def test_stream(server):
+    chunks = [chunk.content for chunk in get_chat_model().stream("你好")]
+    assert len(chunks) > 1
+    assert "".join(chunks) == DEFAULT_REPLY
+
+
+def test_async_invoke(server):
+    async def run():
+        return await get_chat_model().ainvoke("你好")
+
+    assert asyncio.run(run()).content == DEFAULT_REPLY
+
+
+def test_async_invoke_across_event_loops(server):
+    # 同一个模型实例和共享异步客户端在第二个事件循环中也能使用
+    model = get_chat_model()
+    assert asyncio.run(model.ainvoke("你好")).content == DEFAULT_REPLY
+    assert asyncio.run(model.ainvoke("你好")).content == DEFAULT_REPLY
+    assert server.stats["requests"] == 2
+
+
+def test_tool_call(server):
+    reply = get_chat_model().bind_tools([weather_search]).invoke("北京天气怎么样")
+    assert [call["name"] for call in reply.tool_calls] == ["weather_search"]
+
+
+def test_rate_limited_requests_are_retried(server):
+    server.config.rate_limit_rate = 0.5
+    server.config.retry_after = 0.0
+    configure_resilience(per_model={DEFAULT_MODEL: ResiliencePolicy(max_attempts=10, backoff_base=0.01)})
+    llm = get_chat_model()
+    for _ in range(4):
+        assert llm.invoke("你好").content == DEFAULT_REPLY
+    assert server.stats["rate_limited"] > 0
+
+
+def test_embeddings(server):
+    vectors = get_embeddings(cache=False).embed_documents(["你好", "世界", "你好"])
+    assert len(vectors) == 3 and len(vectors[0]) == server.config.embedding_dims
+    assert vectors[0] == vectors[2] != vectors[1]
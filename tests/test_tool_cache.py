@@ -0,0 +1,162 @@
+"""cached_tool 的参数规范化、TTL、LRU、共享后端、并发合并和 @tool 兼容性"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.tools import tool
+
+from langchain_learning.utils.tool_cache import ToolResultCache, cached_tool
+
+
+def _counting(**options):
+    """返回被缓存的工具函数和它的实际调用记录"""
+    calls = []
+
+    @cached_tool(**options)
+    def lookup(location: str, days: int = 1) -> str:
+        calls.append((location, days))
+        return f"{location} {days} 天: 晴"
+
+    return lookup, calls
+
+
+def test_whitespace_is_normalized():
+    lookup, calls = _counting()
+    assert lookup(" 北京 ") == "北京 1 天: 晴"
+    assert lookup("北京") == "北京 1 天: 晴"
+    assert lookup("北京", days=1) == "北京 1 天: 晴"
+    assert lookup("New   York") == lookup(" New York ")
+    # 函数本身也收到规范化后的参数
+    assert calls == [("北京", 1), ("New York", 1)]
+    assert lookup.cache_info()["hits"] == 3
+
+
+def test_custom_normalizer():
+    lookup, calls = _counting(normalize={"location": str.lower})
+    lookup("Tokyo")
+    lookup("TOKYO")
+    assert calls == [("tokyo", 1)]
+
+
+def test_ttl_expiry():
+    lookup, calls = _counting(ttl=0.05)
+    lookup("北京")
+    lookup("北京")
+    time.sleep(0.1)
+    lookup("北京")
+    assert len(calls) == 2
+    assert lookup.cache_info()["expired"] == 1
+
+
+def test_lru_eviction():
+    lookup, calls = _counting(max_size=2)
+    lookup("北京")
+    lookup("上海")
+    lookup("北京")  # 上海变成最久未使用
+    lookup("广州")
+    lookup("北京")
+    lookup("上海")
+    assert calls == [("北京", 1), ("上海", 1), ("广州", 1), ("上海", 1)]
+    info = lookup.cache_info()
+    assert info["evictions"] == 2 and info["size"] == 2
+
+
+def test_shared_backend_across_decorator_instances(tmp_path):
+    path = tmp_path / "tool_cache.sqlite"
+    first, first_calls = _counting(backend=ToolResultCache(path))
+    first("北京")
+
+    # 另一个装饰器实例（相当于另一个会话或进程）从共享后端读到结果
+    second, second_calls = _counting(backend=ToolResultCache(path))
+    assert second("北京") == "北京 1 天: 晴"
+    assert second_calls == []
+    assert second.cache_info()["shared_hits"] == 1
+
+    # 参数不同时不共享
+    second("上海")
+    assert second_calls == [("上海", 1)]
+
+
+def test_backend_factory_is_created_lazily():
+    created = []
+
+    def factory():
+        created.append(ToolResultCache())
+        return created[-1]
+
+    lookup, _ = _counting(backend=factory)
+    assert created == []
+    lookup("北京")
+    assert len(created) == 1 and len(created[0]) == 1
+
+
+def test_concurrent_calls_are_coalesced():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    @cached_tool()
+    def slow(location: str) -> str:
+        calls.append(location)
+        time.sleep(0.1)
+        return f"{location}: 晴"
+
+    def call():
+        barrier.wait()
+        return slow("北京")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: call(), range(8)))
+
+    assert results == ["北京: 晴"] * 8
+    assert calls == ["北京"]
+    info = slow.cache_info()
+    assert info["misses"] == 1 and info["coalesced"] == 7
+
+
+def test_exceptions_are_not_cached():
+    attempts = []
+
+    @cached_tool()
+    def flaky(location: str) -> str:
+        attempts.append(location)
+        if len(attempts) == 1:
+            raise RuntimeError("服务暂时不可用")
+        return f"{location}: 晴"
+
+    with pytest.raises(RuntimeError):
+        flaky("北京")
+    assert flaky("北京") == "北京: 晴"
+    assert flaky("北京") == "北京: 晴"
+    assert attempts == ["北京", "北京"]
+
+
+def test_async_tool():
+    calls = []
+
+    @cached_tool()
+    async def alookup(location: str) -> str:
+        calls.append(location)
+        return f"{location}: 晴"
+
+    async def run():
+        return [await alookup(" 北京"), await alookup("北京 ")]
+
+    assert asyncio.run(run()) == ["北京: 晴", "北京: 晴"]
+    assert calls == ["北京"]
+
+
+def test_tool_schema_is_unchanged():
+    def weather(location: str, days: int = 1) -> str:
+        """查询城市未来几天的天气"""
+        return f"{location}: 晴"
+
+    plain = tool(weather)
+    cached = tool(cached_tool()(weather))
+    assert cached.name == plain.name
+    assert cached.description == plain.description
+    assert cached.args == plain.args
+    assert cached.tool_call_schema.model_json_schema() == plain.tool_call_schema.model_json_schema()
+    assert cached.invoke({"location": " 北京 "}) == "北京: 晴"
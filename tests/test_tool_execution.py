@@ -0,0 +1,127 @@
+"""ToolExecutionMiddleware 在同步和异步路径上的超时、并发上限和步骤耗时记录"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, List
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+
+from benchmarks.fake_model import ScriptedChatModel
+from langchain_learning.utils.tool_execution import ToolExecutionMiddleware
+
+DELAY = 0.05
+
+
+class Tracker:
+    """记录工具调用的最大并发数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def enter(self) -> None:
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def exit(self) -> None:
+        with self.lock:
+            self.running -= 1
+
+
+def _lookup_tool(tracker: Tracker, delays: Dict[str, float]) -> StructuredTool:
+    def lookup(city: str) -> str:
+        tracker.enter()
+        try:
+            time.sleep(delays.get(city, DELAY))
+        finally:
+            tracker.exit()
+        return f"结果: {city}"
+
+    async def alookup(city: str) -> str:
+        tracker.enter()
+        try:
+            await asyncio.sleep(delays.get(city, DELAY))
+        finally:
+            tracker.exit()
+        return f"结果: {city}"
+
+    return StructuredTool.from_function(func=lookup, coroutine=alookup, name="lookup", description="查询城市")
+
+
+def _calls(cities: List[str], prefix: str = "call") -> AIMessage:
+    return AIMessage(
+        content="",
+        tool_calls=[
+            {"name": "lookup", "args": {"city": city}, "id": f"{prefix}_{i}", "type": "tool_call"}
+            for i, city in enumerate(cities)
+        ],
+    )
+
+
+def _run(middleware: ToolExecutionMiddleware, script: List[AIMessage], mode: str, delays=None):
+    tracker = Tracker()
+    model = ScriptedChatModel(script=[*script, AIMessage(content="完成")])
+    agent = create_agent(model=model, tools=[_lookup_tool(tracker, delays or {})], middleware=[middleware])
+    inputs = {"messages": [HumanMessage(content="查询")]}
+    result = agent.invoke(inputs) if mode == "sync" else asyncio.run(agent.ainvoke(inputs))
+    return result["messages"], tracker
+
+
+MODES = pytest.mark.parametrize("mode", ["sync", "async"])
+
+
+@MODES
+def test_timeout_returns_error_message(mode):
+    middleware = ToolExecutionMiddleware(timeouts={"lookup": 0.05})
+    messages, _ = _run(middleware, [_calls(["北京", "上海"])], mode, delays={"北京": 1.0, "上海": 0.0})
+
+    results = [m for m in messages if isinstance(m, ToolMessage)]
+    assert results[0].status == "error" and "超时" in results[0].content
+    assert results[1].status == "success" and results[1].content == "结果: 上海"
+    assert messages[-1].content == "完成"
+    assert [c.status for c in sorted(middleware.steps[0].calls, key=lambda c: c.call_id)] == ["timeout", "success"]
+
+
+@MODES
+@pytest.mark.parametrize("limit,expected_peak", [(1, 1), (2, 2)])
+def test_limit_bounds_concurrency(mode, limit, expected_peak):
+    middleware = ToolExecutionMiddleware(limits={"lookup": limit}, default_timeout=5.0)
+    messages, tracker = _run(middleware, [_calls([f"城市{i}" for i in range(4)])], mode)
+
+    # 工具结果仍然按调用顺序返回
+    assert [m.content for m in messages if isinstance(m, ToolMessage)] == [f"结果: 城市{i}" for i in range(4)]
+    assert tracker.peak == expected_peak
+
+
+@MODES
+def test_calls_are_grouped_by_step(mode):
+    middleware = ToolExecutionMiddleware()
+    script = [_calls(["北京", "上海"], "first"), _calls(["广州"], "second")]
+    _run(middleware, script, mode, delays={"北京": 0.0, "上海": 0.0, "广州": 0.0})
+
+    steps = middleware.steps
+    assert [sorted(c.call_id for c in step.calls) for step in steps] == [["first_0", "first_1"], ["second_0"]]
+    assert "步骤 2" in middleware.summary()
+
+    middleware.reset()
+    assert middleware.steps == []
+
+
+@MODES
+def test_saved_time(mode):
+    parallel = ToolExecutionMiddleware(default_timeout=5.0)
+    _run(parallel, [_calls([f"城市{i}" for i in range(4)])], mode)
+    step = parallel.steps[0]
+    assert step.serial_time >= 4 * DELAY
+    assert step.saved_time > 2 * DELAY
+    assert step.saved_time == pytest.approx(step.serial_time - step.wall_time)
+
+    serial = ToolExecutionMiddleware(default_limit=1, default_timeout=5.0)
+    _run(serial, [_calls([f"城市{i}" for i in range(4)])], mode)
+    assert serial.steps[0].saved_time < DELAY